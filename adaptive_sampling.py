@@ -0,0 +1,253 @@
+import math
+import os
+import threading
+from collections import defaultdict
+from review_scores import SCORE_RANGES, extract_scores_from_text
+
+
+def _t_central_probability(theta: float, df: int) -> float:
+    # P(|T| < sqrt(df) * tan(theta)) for integer df, by the finite series of
+    # Abramowitz and Stegun 26.7.3 and 26.7.4
+    sin, cos = math.sin(theta), math.cos(theta)
+    if df % 2 == 1:
+        term, total = cos, 0.0
+        for k in range(1, df - 1, 2):
+            total += term
+            term *= cos * cos * (k + 1) / (k + 2)
+        return 2 / math.pi * (theta + sin * total) if df > 1 else 2 / math.pi * theta
+    term, total = 1.0, 0.0
+    for k in range(1, df, 2):
+        total += term
+        term *= cos * cos * k / (k + 1)
+    return sin * total
+
+
+def t_quantile(probability: float, df: int) -> float:
+    """
+    Quantile of Student's t distribution.
+
+    Inverts the exact distribution function for integer df by bisection on the
+    angle arctan(t / sqrt(df)), so small samples get exact interval widths.
+    """
+    if probability < 0.5:
+        return -t_quantile(1 - probability, df)
+    target = 2 * probability - 1
+    low, high = 0.0, math.pi / 2
+    for _ in range(60):
+        theta = (low + high) / 2
+        if _t_central_probability(theta, df) < target:
+            low = theta
+        else:
+            high = theta
+    return math.sqrt(df) * math.tan((low + high) / 2)
+
+
+def mean_confidence_interval(values: list, confidence: float = 0.95) -> tuple:
+    """
+    Student's t confidence interval of the mean of a sample.
+
+    Returns:
+        (mean, low, high); low and high are None for fewer than two values
+    """
+    n = len(values)
+    mean = sum(values) / n
+    if n < 2:
+        return mean, None, None
+    std = math.sqrt(sum((value - mean) ** 2 for value in values) / (n - 1))
+    half_width = t_quantile(0.5 + confidence / 2, n - 1) * std / math.sqrt(n)
+    return mean, mean - half_width, mean + half_width
+
+
+class AdaptiveSampler:
+    """
+    Decides how many attempts each (model, paper) needs.
+
+    Every (model, paper) starts with min_tries attempts in flight. Each finished
+    attempt is parsed with the shared score rules; once min_tries have finished,
+    attempts are released one at a time while the confidence interval of the mean
+    score is wider than ci_width, so at most one call per group is spent after the
+    estimate has converged. Attempts that are never released are reported as
+    "converged".
+
+    Outputs already on disk (or in the result store) count towards a group, so a
+    resumed run picks up the estimate where the previous run left it.
+    """
+
+    def __init__(self, total_tries: int, min_tries: int = 3, ci_width: float = 1.0,
+                 confidence: float = 0.95, score_type: str = "rating", result_store=None):
+        """
+        Args:
+            total_tries: Maximum number of attempts per (model, paper)
+            min_tries: Attempts per (model, paper) before convergence is checked (default: 3)
+            ci_width: Stop once the confidence interval of the mean score is narrower than
+                this (default: 1.0)
+            confidence: Confidence level of the interval (default: 0.95)
+            score_type: Score field the interval is computed on (default: "rating")
+            result_store: Optional ResultStore the reviews are saved to instead of files
+        """
+        self.total_tries = total_tries
+        self.min_tries = max(2, min(min_tries, total_tries))
+        self.ci_width = ci_width
+        self.confidence = confidence
+        self.score_type = score_type
+        self.result_store = result_store
+
+        self._values = defaultdict(list)
+        self._finished = defaultdict(int)
+        self._held = defaultdict(list)
+        self._in_flight = defaultdict(int)
+        self._converged = set()
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _group(job: dict) -> tuple:
+        return job["api_name"], job["model_name"], job["pdf_name"]
+
+    def _read_score(self, job: dict):
+        # Score of a finished attempt from the result store or its output file, if any
+        if self.result_store is not None:
+            record = self.result_store.get(job["model_name"], job["pdf_name"], job["attempt"])
+            return (record["scores"] or {}).get(self.score_type) if record else None
+        try:
+            with open(job["output_file_path"], "r", encoding="utf-8") as f:
+                return extract_scores_from_text(f.read()).get(self.score_type)
+        except FileNotFoundError:
+            return None
+
+    def _load_history(self, group: tuple, jobs: list):
+        # Count outputs of earlier runs, for the attempts that are not part of these jobs
+        attempts = {job["attempt"] for job in jobs}
+        output_dir = os.path.dirname(jobs[0]["output_file_path"])
+        _, model_name, pdf_name = group
+        for attempt in range(self.total_tries):
+            if attempt in attempts:
+                continue
+            job = {"model_name": model_name, "pdf_name": pdf_name, "attempt": attempt,
+                   "output_file_path": os.path.join(output_dir, f"{model_name}_{pdf_name}_{attempt}.txt")}
+            score = self._read_score(job)
+            if score is not None:
+                self._values[group].append(score)
+                self._finished[group] += 1
+
+    def _is_converged(self, group: tuple) -> bool:
+        values = self._values[group]
+        if self._finished[group] < self.min_tries or len(values) < 2:
+            return False
+        _, low, high = mean_confidence_interval(values, self.confidence)
+        return high - low <= self.ci_width
+
+    def initial_jobs(self, jobs: list) -> list:
+        """
+        Hold back the attempts beyond each group's first min_tries.
+
+        Args:
+            jobs: Job dicts of any number of (model, paper) groups
+
+        Returns:
+            The jobs to start with; the rest are released by on_finished
+        """
+        groups = defaultdict(list)
+        for job in jobs:
+            groups[self._group(job)].append(job)
+
+        initial = []
+        with self._lock:
+            for group, group_jobs in groups.items():
+                group_jobs.sort(key=lambda job: job["attempt"])
+                if group not in self._seen:
+                    self._seen.add(group)
+                    self._load_history(group, group_jobs)
+                if group in self._converged or self._is_converged(group):
+                    self._converged.add(group)
+                    continue
+                start = self._target_in_flight(group)
+                initial.extend(group_jobs[:start])
+                self._held[group].extend(group_jobs[start:])
+                self._in_flight[group] += len(group_jobs[:start])
+        return initial
+
+    def _target_in_flight(self, group: tuple) -> int:
+        # min_tries attempts in parallel until they have finished, then one at a time
+        return max(1, self.min_tries - self._finished[group])
+
+    def on_finished(self, job: dict, status: str) -> list:
+        """
+        Record a finished attempt and decide whether its group needs another one.
+
+        Args:
+            job: The finished job
+            status: Its status from run_review_job
+
+        Returns:
+            The jobs to start next (at most one)
+        """
+        score = self._read_score(job) if status != "error" else None
+        group = self._group(job)
+        with self._lock:
+            self._in_flight[group] -= 1
+            if status != "error":
+                self._finished[group] += 1
+                if score is not None:
+                    self._values[group].append(score)
+            if group in self._converged:
+                return []
+            if self._is_converged(group):
+                self._converged.add(group)
+                self._held.pop(group, None)
+                return []
+            held = self._held.get(group)
+            if not held or self._in_flight[group] >= self._target_in_flight(group):
+                return []
+            self._in_flight[group] += 1
+            return [held.pop(0)]
+
+    def summary(self) -> dict:
+        """
+        Summarize the sampling per (api_name, model_name, pdf_name).
+
+        Returns:
+            Mapping from group to a dict with finished attempts, scored attempts, mean,
+            CI low and high, and whether the group converged
+        """
+        summary = {}
+        with self._lock:
+            for group in sorted(self._seen):
+                values = self._values[group]
+                mean, low, high = mean_confidence_interval(values, self.confidence) if values else (None, None, None)
+                summary[group] = {
+                    "finished": self._finished[group],
+                    "scored": len(values),
+                    "mean": mean,
+                    "ci_low": low,
+                    "ci_high": high,
+                    "converged": group in self._converged,
+                }
+        return summary
+
+    def print_summary(self):
+        """
+        Print the attempts used and the score interval of every (model, paper).
+        """
+        summary = self.summary()
+        if not summary:
+            return
+
+        print(f"\n{'='*60}")
+        print(f"ADAPTIVE SAMPLING ({self.score_type}, {self.confidence:.0%} CI width <= {self.ci_width})")
+        print(f"{'='*60}")
+        # With few tries the t interval can reach past the scale; show it clipped to the scale
+        low_end, high_end = SCORE_RANGES.get(self.score_type, (float("-inf"), float("inf")))
+        for (api_name, model_name, pdf_name), stats in summary.items():
+            if stats["ci_low"] is not None:
+                interval = (f"{stats['mean']:.2f} [{max(stats['ci_low'], low_end):.2f}, "
+                            f"{min(stats['ci_high'], high_end):.2f}]")
+            elif stats["mean"] is not None:
+                interval = f"{stats['mean']:.2f}"
+            else:
+                interval = "-"
+            state = "converged" if stats["converged"] else "not converged"
+            print(f"  [{api_name.upper()}] {model_name} {pdf_name}: {stats['finished']}/{self.total_tries} tries, "
+                  f"{self.score_type}={interval}, {state}")
+        finished = sum(stats["finished"] for stats in summary.values())
+        print(f"  Attempts used: {finished} of {len(summary) * self.total_tries}")
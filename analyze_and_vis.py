@@ -1,8 +1,12 @@
 import os
-import re
 import numpy as np
-import matplotlib.pyplot as plt
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from review_index import DEFAULT_INDEX_PATH, ReviewIndex, print_search_results
+from review_scores import SCORE_TYPES, extract_scores_from_text
+from score_index import ScoreIndex
+from score_stats import group_rows
+from score_table import build_score_table
 
 
 def extract_scores_from_review(file_path):
@@ -15,40 +19,76 @@ def extract_scores_from_review(file_path):
     with open(file_path, "r", encoding="utf-8") as f:
         content = f.read()
     
-    scores = {}
-    
-    # Pattern 1: "## Soundness: 3" (with ##)
-    # Pattern 2: "Soundness: 3" (without ##, standalone line)
-    
-    # Extract Soundness score
-    soundness_match = re.search(r"(?:##\s*)?Soundness:\s*(\d+)", content, re.IGNORECASE)
-    if soundness_match:
-        scores['soundness'] = int(soundness_match.group(1))
+    return extract_scores_from_text(content)
+
+
+def get_figure_name(output_dir=None, model_name=None, pdf_name=None, image_format="png"):
+    """
+    Generate the figure file name based on model and pdf names.
+    """
+    if model_name and pdf_name:
+        return f"{model_name}_{pdf_name}.{image_format}"
+    if model_name:
+        return f"{model_name}_all.{image_format}"
+    if pdf_name:
+        return f"all_models_{pdf_name}.{image_format}"
+    return f"{os.path.basename(output_dir)}_all.{image_format}"
+
+
+def render_score_figure(plot_data, title, output_file, dpi=300):
+    """
+    Draw the 2x3 score distribution figure and save it.
     
-    # Extract Presentation score
-    presentation_match = re.search(r"(?:##\s*)?Presentation:\s*(\d+)", content, re.IGNORECASE)
-    if presentation_match:
-        scores['presentation'] = int(presentation_match.group(1))
+    Args:
+        plot_data: Dictionary mapping score types to arrays of scores
+        title: Figure title
+        output_file: Image path; the format follows its extension (e.g. .png, .svg, .pdf)
+        dpi: Resolution of raster formats
+    """
+    # Imported here so score extraction and statistics never pay matplotlib's startup cost
+    import matplotlib.pyplot as plt
+        
+    fig, axes = plt.subplots(2, 3, figsize=(15, 10))
+    fig.suptitle(title, fontsize=16, fontweight='bold')
     
-    # Extract Contribution score
-    contribution_match = re.search(r"(?:##\s*)?Contribution:\s*(\d+)", content, re.IGNORECASE)
-    if contribution_match:
-        scores['contribution'] = int(contribution_match.group(1))
+    # Flatten axes for easier indexing
+    axes = axes.flatten()
     
-    # Extract Rating score
-    rating_match = re.search(r"(?:##\s*)?Rating:\s*\*?\*?(\d+)\*?\*?", content, re.IGNORECASE)
-    if rating_match:
-        scores['rating'] = int(rating_match.group(1))
+    for idx, score_type in enumerate(SCORE_TYPES):
+        if score_type in plot_data:
+            values = plot_data[score_type]
+            ax = axes[idx]
+            
+            # Create histogram with distribution
+            unique_vals, counts = np.unique(values, return_counts=True)
+            ax.bar(unique_vals, counts, alpha=0.7, color='steelblue', edgecolor='black')
+            
+            # Add statistics text
+            mean_val = np.mean(values)
+            std_val = np.std(values, ddof=1)
+            median_val = np.median(values)
+            
+            stats_text = f'Mean: {mean_val:.2f}\nStd: {std_val:.2f}\nMedian: {median_val:.1f}\nCount: {len(values)}'
+            ax.text(0.95, 0.95, stats_text, transform=ax.transAxes, 
+                   fontsize=9, verticalalignment='top', horizontalalignment='right',
+                   bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+            
+            # Formatting
+            ax.set_xlabel('Score', fontsize=11)
+            ax.set_ylabel('Frequency', fontsize=11)
+            ax.set_title(f'{score_type.capitalize()} Distribution', fontsize=12, fontweight='bold')
+            ax.grid(axis='y', alpha=0.3, linestyle='--')
+            ax.set_xticks(unique_vals)
     
-    # Extract Confidence score
-    confidence_match = re.search(r"(?:##\s*)?Confidence:\s*\*?\*?(\d+)\*?\*?", content, re.IGNORECASE)
-    if confidence_match:
-        scores['confidence'] = int(confidence_match.group(1))
+    # Hide the last subplot (6th position) since we only have 5 plots
+    axes[5].set_visible(False)
     
-    return scores
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
 
 
-def analyze_reviews(output_dir, model_name=None, pdf_name=None):
+def analyze_reviews(output_dir, model_name=None, pdf_name=None, dpi=300, image_format="png"):
     """
     Analyze review files in the output directory, optionally filtered by model and PDF name.
     
@@ -56,22 +96,20 @@ def analyze_reviews(output_dir, model_name=None, pdf_name=None):
         output_dir: Directory containing review text files
         model_name: Optional filter for specific model (e.g., "gpt-5-mini", "claude-haiku-4-5")
         pdf_name: Optional filter for specific PDF file (e.g., "a0kq0tJwwn")
+        dpi: Resolution of the saved figure
+        image_format: Image format of the saved figure (e.g., "png", "svg", "pdf")
     """
     # Collect all scores
     all_scores = defaultdict(list)
     
-    # Get all .txt files
-    all_files = sorted([f for f in os.listdir(output_dir) if f.endswith('.txt')])
-    
-    # Filter files based on model_name and pdf_name
-    files = []
-    for f in all_files:
-        # File format: {model_name}_{pdf_name}_{attempt}.txt
-        if model_name and not f.startswith(model_name):
-            continue
-        if pdf_name and f"_{pdf_name}_" not in f:
-            continue
-        files.append(f)
+    # Bring the directory's score index up to date (only new or changed files are parsed)
+    # and answer the model/pdf filter from it
+    index = ScoreIndex(output_dir)
+    counts = index.update()
+    files = index.query(model_name=model_name, pdf_name=pdf_name)
+    index.close()
+    print(f"Score index: {counts['added']} added, {counts['changed']} changed, "
+          f"{counts['removed']} removed, {counts['unchanged']} unchanged")
     
     if not files:
         print(f"No matching files found in {output_dir} for model={model_name}, pdf={pdf_name}")
@@ -79,11 +117,7 @@ def analyze_reviews(output_dir, model_name=None, pdf_name=None):
     
     print(f"Found {len(files)} review files in {output_dir}")
     
-    # Extract scores from each file
-    for file_name in files:
-        file_path = os.path.join(output_dir, file_name)
-        scores = extract_scores_from_review(file_path)
-        
+    for file_name, _, _, _, scores in files:
         print(f"File: {file_name}")
         for score_type, value in scores.items():
             print(f"  {score_type}: {value}")
@@ -96,7 +130,7 @@ def analyze_reviews(output_dir, model_name=None, pdf_name=None):
     print("=" * 60)
     
     # Prepare data for plotting
-    score_types = ['soundness', 'presentation', 'contribution', 'rating', 'confidence']
+    score_types = SCORE_TYPES
     plot_data = {}
     
     for score_type in score_types:
@@ -118,68 +152,138 @@ def analyze_reviews(output_dir, model_name=None, pdf_name=None):
     
     # Create visualization
     if plot_data:
-        fig, axes = plt.subplots(2, 3, figsize=(15, 10))
-        fig.suptitle(f'Review Scores Distribution Analysis - {output_dir}', fontsize=16, fontweight='bold')
-        
-        # Flatten axes for easier indexing
-        axes = axes.flatten()
-        
-        for idx, score_type in enumerate(score_types):
-            if score_type in plot_data:
-                values = plot_data[score_type]
-                ax = axes[idx]
-                
-                # Create histogram with distribution
-                unique_vals, counts = np.unique(values, return_counts=True)
-                ax.bar(unique_vals, counts, alpha=0.7, color='steelblue', edgecolor='black')
-                
-                # Add statistics text
-                mean_val = np.mean(values)
-                std_val = np.std(values, ddof=1)
-                median_val = np.median(values)
-                
-                stats_text = f'Mean: {mean_val:.2f}\nStd: {std_val:.2f}\nMedian: {median_val:.1f}\nCount: {len(values)}'
-                ax.text(0.95, 0.95, stats_text, transform=ax.transAxes, 
-                       fontsize=9, verticalalignment='top', horizontalalignment='right',
-                       bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-                
-                # Formatting
-                ax.set_xlabel('Score', fontsize=11)
-                ax.set_ylabel('Frequency', fontsize=11)
-                ax.set_title(f'{score_type.capitalize()} Distribution', fontsize=12, fontweight='bold')
-                ax.grid(axis='y', alpha=0.3, linestyle='--')
-                ax.set_xticks(unique_vals)
-        
-        # Hide the last subplot (6th position) since we only have 5 plots
-        axes[5].set_visible(False)
-        
-        plt.tight_layout()
-        
         # Create output directory for analysis images
         analyze_dir = "analyze_image"
         os.makedirs(analyze_dir, exist_ok=True)
         
-        # Generate output filename based on model and pdf names
-        if model_name and pdf_name:
-            output_filename = f"{model_name}_{pdf_name}.png"
-        elif model_name:
-            output_filename = f"{model_name}_all.png"
-        elif pdf_name:
-            output_filename = f"all_models_{pdf_name}.png"
-        else:
-            output_filename = f"{os.path.basename(output_dir)}_all.png"
-        
-        output_file = os.path.join(analyze_dir, output_filename)
-        plt.savefig(output_file, dpi=300, bbox_inches='tight')
+        output_file = os.path.join(analyze_dir, get_figure_name(output_dir, model_name, pdf_name, image_format))
+        render_score_figure(plot_data, f'Review Scores Distribution Analysis - {output_dir}', output_file, dpi=dpi)
         print(f"\nVisualization saved to: {output_file}")
-        plt.close()
         
         return output_file, plot_data
     
     return None, None
 
+# Grouping keys a report can split figures by
+REPORT_GROUP_COLUMNS = ("model", "paper")
+
+
+def _init_report_worker():
+    # Headless backend, selected before pyplot is first imported in the worker
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _render_figure_task(task):
+    render_score_figure(*task)
+    return task[2]
+
+
+def generate_report(output_dirs, group_by=("model", "paper"), analyze_dir="analyze_image",
+                    dpi=150, image_format="png", num_workers=None):
+    """
+    Render one score distribution figure per model/paper group, in a process pool.
+    
+    Scores come from the output directories' score indexes, so only new or changed
+    review files are parsed. Figures are drawn with the Agg backend in worker processes.
+    
+    Args:
+        output_dirs: Output directory or list of directories holding review files
+        group_by: Columns to split figures by: ("model", "paper"), ("model",) or ("paper",)
+        analyze_dir: Directory for the figures
+        dpi: Resolution of raster formats
+        image_format: Image format of the figures (e.g., "png", "svg", "pdf")
+        num_workers: Number of rendering processes (default: CPU count); 1 renders in-process
+    
+    Returns:
+        list: Paths of the saved figures
+    """
+    group_by = tuple(group_by)
+    if not group_by or any(column not in REPORT_GROUP_COLUMNS for column in group_by):
+        raise ValueError(f"group_by must be taken from {REPORT_GROUP_COLUMNS}, got {group_by}")
+    
+    table = build_score_table(output_dirs, use_index=True)
+    codes, first_rows = group_rows(table, group_by)
+    order = np.argsort(codes, kind="stable")
+    group_members = np.split(order, np.flatnonzero(np.diff(codes[order])) + 1)
+    
+    os.makedirs(analyze_dir, exist_ok=True)
+    tasks = []
+    for members, first_row in zip(group_members, first_rows):
+        model_name = str(table["model"][first_row]) if "model" in group_by else None
+        pdf_name = str(table["paper"][first_row]) if "paper" in group_by else None
+        plot_data = {}
+        for score_type in SCORE_TYPES:
+            values = table[score_type][members]
+            values = values[~np.isnan(values)]
+            if len(values) > 0:
+                plot_data[score_type] = values.astype(np.int64)
+        if not plot_data:
+            continue
+        title = f'Review Scores Distribution Analysis - {model_name or "all models"} / {pdf_name or "all papers"}'
+        output_file = os.path.join(analyze_dir, get_figure_name(None, model_name, pdf_name, image_format))
+        tasks.append((plot_data, title, output_file, dpi))
+    
+    if num_workers == 1 or len(tasks) <= 1:
+        output_files = [_render_figure_task(task) for task in tasks]
+    else:
+        workers = num_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_report_worker) as executor:
+            output_files = list(executor.map(_render_figure_task, tasks,
+                                             chunksize=max(1, len(tasks) // (workers * 4))))
+    
+    print(f"Rendered {len(output_files)} figures to {analyze_dir}/")
+    return output_files
+
+
+def search_reviews(query, output_dirs, section=None, model_name=None, pdf_name=None, limit=20,
+                   index_path=DEFAULT_INDEX_PATH):
+    """
+    Full-text search over the Summary, Strengths, Weaknesses and Questions sections of reviews.
+    
+    The on-disk ReviewIndex is first brought up to date with the output directories,
+    so only review files that are new or changed since the last search are read.
+    
+    Args:
+        query: Search words, all of which must occur; "quoted words" must occur as a phrase
+        output_dirs: Output directory or list of directories holding review files
+        section: Optional section to search (e.g., "weaknesses"; default: all four)
+        model_name: Optional filter for specific model
+        pdf_name: Optional filter for specific PDF file
+        limit: Maximum number of ranked hits
+        index_path: Index file shared by all output directories
+    
+    Returns:
+        dict: Search results with "total", ranked "hits", and "models" and "papers" facets
+            (see ReviewIndex.search)
+    """
+    index = ReviewIndex(index_path)
+    counts = index.update(output_dirs)
+    print(f"Review index: {counts['added']} added, {counts['changed']} changed, "
+          f"{counts['removed']} removed, {counts['unchanged']} unchanged")
+    results = index.search(query, section=section, model_name=model_name, pdf_name=pdf_name, limit=limit)
+    index.close()
+    print_search_results(results)
+    return results
+
 
 if __name__ == "__main__":
+    # Example 0: Parse every review of all output directories into one score table
+    # table = build_score_table(["output_openai", "output_claude", "output_gemini"], use_index=True)
+    # from score_table import save_score_table
+    # save_score_table(table, "scores.npz")
+    
+    # Example 0b: Statistics with bootstrap CIs for every (model, paper) group, or per model
+    # from score_stats import grouped_statistics, print_grouped_statistics
+    # stats = grouped_statistics(table, group_by=("model", "paper"), seed=0)
+    # print_grouped_statistics(grouped_statistics(table, group_by=("model",), seed=0), group_by=("model",))
+    
+    # Example 0c: Render one figure per (model, paper) in parallel, as SVG
+    # generate_report(["output_openai", "output_claude", "output_gemini"], group_by=("model", "paper"), image_format="svg")
+    
+    # Example 0d: Which papers most often get a weakness, from which models
+    # search_reviews('"no human evaluation"', ["output_openai", "output_claude", "output_gemini"], section="weaknesses")
+    
     # Example 1: Analyze all files in output_gemini
     # analyze_reviews("output_gemini")
     
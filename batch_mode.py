@@ -0,0 +1,289 @@
+import json
+import os
+import time
+from collections import defaultdict
+from clients import get_client
+from documents import prepare_document
+
+
+# Batch state file written in the batch directory
+BATCH_STATE_FILE = "batch_state.json"
+
+# Terminal states reported by each provider's batch API
+OPENAI_FINAL_STATES = ("completed", "failed", "expired", "cancelled")
+GEMINI_FINAL_STATES = ("JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED")
+
+
+def load_batch_state(batch_dir: str) -> list:
+    """
+    Load the list of batches recorded in a batch directory.
+    """
+    state_path = os.path.join(batch_dir, BATCH_STATE_FILE)
+    if not os.path.exists(state_path):
+        return []
+    with open(state_path, "r") as f:
+        return json.load(f)
+
+
+def save_batch_state(batch_dir: str, batches: list):
+    """
+    Atomically write the list of batches to a batch directory.
+    """
+    state_path = os.path.join(batch_dir, BATCH_STATE_FILE)
+    with open(state_path + ".tmp", "w") as f:
+        json.dump(batches, f, indent=2)
+    os.replace(state_path + ".tmp", state_path)
+
+
+def _build_request_line(api_name: str, custom_id: str, document, reviewer_guidance: str,
+                        user_prompt: str, model_name: str) -> dict:
+    # Import the provider module lazily so building one provider's batch loads only its SDK
+    if api_name == "openai":
+        from generate_openai import build_review_request_openai
+        body = build_review_request_openai(document, reviewer_guidance, user_prompt, model_name)
+        return {"custom_id": custom_id, "method": "POST", "url": "/v1/responses", "body": body}
+    if api_name == "claude":
+        from generate_claude import build_review_request_claude
+        params = build_review_request_claude(document, reviewer_guidance, user_prompt, model_name)
+        return {"custom_id": custom_id, "params": params}
+    if api_name == "gemini":
+        from generate_gemini import build_batch_request_gemini
+        request = build_batch_request_gemini(document, reviewer_guidance, user_prompt)
+        return {"key": custom_id, "request": request}
+    raise ValueError(f"Unknown provider: {api_name}")
+
+
+def build_batches(jobs: list, reviewer_guidance: str, user_prompt: str, batch_dir: str,
+                  max_requests_per_batch: int = 100) -> list:
+    """
+    Stage 1: write batch request files for all jobs whose output does not exist yet.
+
+    Jobs are grouped per (provider, model), since batch APIs take one model per batch,
+    and split into files of at most max_requests_per_batch requests.
+
+    Args:
+        jobs: Job dicts from build_paper_jobs
+        reviewer_guidance: System guidance for the reviewer
+        user_prompt: User prompt for the review
+        batch_dir: Directory for request files and the batch state file
+        max_requests_per_batch: Maximum number of requests per batch file (default: 100)
+
+    Returns:
+        The updated batch state
+    """
+    os.makedirs(batch_dir, exist_ok=True)
+    batches = load_batch_state(batch_dir)
+
+    # Outputs already queued in a batch that has not been collected yet
+    queued_outputs = {
+        output_file_path
+        for batch in batches if batch["status"] != "collected"
+        for output_file_path in batch["outputs"].values()
+    }
+
+    grouped_jobs = defaultdict(list)
+    for job in jobs:
+        if os.path.exists(job["output_file_path"]) or job["output_file_path"] in queued_outputs:
+            continue
+        grouped_jobs[(job["api_name"], job["model_name"])].append(job)
+
+    for (api_name, model_name), group in grouped_jobs.items():
+        for start in range(0, len(group), max_requests_per_batch):
+            chunk = group[start:start + max_requests_per_batch]
+            batch_index = len(batches)
+            request_file = os.path.join(batch_dir, f"batch_{batch_index:05d}_{api_name}_{model_name}.jsonl")
+
+            # Short ids satisfy every provider's custom id format; the state maps them back
+            outputs = {}
+            with open(request_file, "w") as f:
+                for job_index, job in enumerate(chunk):
+                    custom_id = f"job-{job_index}"
+                    document = prepare_document(job["pdf_file_path"])
+                    line = _build_request_line(api_name, custom_id, document, reviewer_guidance,
+                                               user_prompt, model_name)
+                    f.write(json.dumps(line) + "\n")
+                    outputs[custom_id] = job["output_file_path"]
+
+            batches.append({
+                "api_name": api_name,
+                "model_name": model_name,
+                "request_file": request_file,
+                "outputs": outputs,
+                "batch_id": None,
+                "status": "built",
+            })
+            print(f"[{api_name.upper()}] {model_name}: built {request_file} ({len(outputs)} requests)")
+
+    save_batch_state(batch_dir, batches)
+    return batches
+
+
+def _submit_openai(client, batch: dict) -> str:
+    with open(batch["request_file"], "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    created = client.batches.create(input_file_id=input_file.id, endpoint="/v1/responses",
+                                    completion_window="24h")
+    return created.id
+
+
+def _poll_openai(client, batch_id: str):
+    retrieved = client.batches.retrieve(batch_id)
+    return retrieved.status in OPENAI_FINAL_STATES, retrieved.status, retrieved
+
+
+def _results_openai(client, handle):
+    from generate_openai import extract_output_text_openai
+
+    for file_id in (handle.output_file_id, handle.error_file_id):
+        if not file_id:
+            continue
+        for line in client.files.content(file_id).text.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                yield result["custom_id"], None, result.get("error") or response.get("body")
+            else:
+                yield result["custom_id"], extract_output_text_openai(response["body"]), None
+
+
+def _submit_claude(client, batch: dict) -> str:
+    with open(batch["request_file"], "r") as f:
+        requests = [json.loads(line) for line in f if line.strip()]
+    return client.messages.batches.create(requests=requests).id
+
+
+def _poll_claude(client, batch_id: str):
+    retrieved = client.messages.batches.retrieve(batch_id)
+    return retrieved.processing_status == "ended", retrieved.processing_status, batch_id
+
+
+def _results_claude(client, handle):
+    for entry in client.messages.batches.results(handle):
+        if entry.result.type == "succeeded":
+            yield entry.custom_id, entry.result.message.content[0].text, None
+        else:
+            yield entry.custom_id, None, getattr(entry.result, "error", entry.result.type)
+
+
+def _submit_gemini(client, batch: dict) -> str:
+    from google.genai import types
+
+    uploaded = client.files.upload(
+        file=batch["request_file"],
+        config=types.UploadFileConfig(display_name=os.path.basename(batch["request_file"]), mime_type="jsonl"),
+    )
+    return client.batches.create(model=batch["model_name"], src=uploaded.name).name
+
+
+def _poll_gemini(client, batch_id: str):
+    retrieved = client.batches.get(name=batch_id)
+    state = getattr(retrieved.state, "name", str(retrieved.state))
+    return state in GEMINI_FINAL_STATES, state, retrieved
+
+
+def _results_gemini(client, handle):
+    from generate_gemini import extract_output_text_gemini
+
+    if handle.dest is None or not handle.dest.file_name:
+        return
+    content = client.files.download(file=handle.dest.file_name)
+    for line in content.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        if "response" in result:
+            yield result["key"], extract_output_text_gemini(result["response"]), None
+        else:
+            yield result["key"], None, result.get("error")
+
+
+_batch_backends = {
+    "openai": (_submit_openai, _poll_openai, _results_openai),
+    "claude": (_submit_claude, _poll_claude, _results_claude),
+    "gemini": (_submit_gemini, _poll_gemini, _results_gemini),
+}
+
+
+def submit_batches(batch_dir: str) -> list:
+    """
+    Stage 2: submit every built batch to its provider's batch API.
+
+    The state is saved after each submission, so an interrupted submit never
+    submits the same batch twice.
+
+    Returns:
+        The updated batch state
+    """
+    batches = load_batch_state(batch_dir)
+    for batch in batches:
+        if batch["status"] != "built":
+            continue
+        submit, _, _ = _batch_backends[batch["api_name"]]
+        batch["batch_id"] = submit(get_client(batch["api_name"]), batch)
+        batch["status"] = "submitted"
+        save_batch_state(batch_dir, batches)
+        print(f"[{batch['api_name'].upper()}] {batch['model_name']}: submitted {batch['batch_id']}")
+    return batches
+
+
+def _write_review(output_file_path: str, review_text: str):
+    os.makedirs(os.path.dirname(output_file_path) or ".", exist_ok=True)
+    with open(output_file_path + ".tmp", "w") as f:
+        f.write(review_text)
+    os.replace(output_file_path + ".tmp", output_file_path)
+
+
+def collect_batches(batch_dir: str, poll_interval: float = 60, wait: bool = True) -> list:
+    """
+    Stage 3: poll submitted batches and write finished results as review files.
+
+    Results go to the usual {model}_{pdf}_{attempt}.txt paths. Failed requests are
+    reported and left without an output file, so a later build picks them up again.
+
+    Args:
+        batch_dir: Directory holding the batch state file
+        poll_interval: Seconds between polls while waiting (default: 60)
+        wait: Keep polling until every batch has finished (default: True)
+
+    Returns:
+        The updated batch state
+    """
+    batches = load_batch_state(batch_dir)
+    while True:
+        pending = 0
+        for batch in batches:
+            if batch["status"] != "submitted":
+                continue
+            _, poll, results = _batch_backends[batch["api_name"]]
+            client = get_client(batch["api_name"])
+            finished, provider_status, handle = poll(client, batch["batch_id"])
+            if not finished:
+                pending += 1
+                continue
+
+            written, failed = 0, 0
+            for custom_id, review_text, error in results(client, handle):
+                output_file_path = batch["outputs"].get(custom_id)
+                if output_file_path is None:
+                    continue
+                if review_text is None:
+                    failed += 1
+                    print(f"[{batch['api_name'].upper()}] {os.path.basename(output_file_path)}: Error: {error}")
+                    continue
+                _write_review(output_file_path, review_text)
+                written += 1
+
+            batch["status"] = "collected"
+            batch["provider_status"] = provider_status
+            save_batch_state(batch_dir, batches)
+            print(f"[{batch['api_name'].upper()}] {batch['model_name']}: {batch['batch_id']} {provider_status}, "
+                  f"{written} written, {failed} failed")
+
+        if pending == 0 or not wait:
+            break
+        print(f"{pending} batches still running, polling again in {poll_interval}s...")
+        time.sleep(poll_interval)
+
+    return batches
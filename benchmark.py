@@ -0,0 +1,582 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import re
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Fake keys so the SDKs construct clients without real credentials
+MOCK_API_KEYS = {
+    "OPENAI_API_KEY": "mock-openai-key",
+    "ANTHROPIC_API_KEY": "mock-anthropic-key",
+    "GEMINI_API_KEY": "mock-gemini-key",
+}
+
+# Number of text chunks a streamed mock response is split into
+STREAM_CHUNKS = 20
+
+# Share of a mock response's delay spent before its first token when streaming
+FIRST_TOKEN_SHARE = 0.2
+
+
+def make_review_text(num_chars: int, rng: random.Random) -> str:
+    """
+    Build a review of about num_chars characters carrying every score field.
+    """
+    header = (f"Soundness: {rng.randint(1, 4)}\nPresentation: {rng.randint(1, 4)}\n"
+              f"Contribution: {rng.randint(1, 4)}\n")
+    footer = f"\nRating: {rng.choice([2, 4, 6, 8])}\nConfidence: {rng.randint(1, 5)}\n"
+    filler = "The paper studies a relevant problem and the experiments are mostly convincing. "
+    body_chars = max(0, num_chars - len(header) - len(footer))
+    body = (filler * (body_chars // len(filler) + 1))[:body_chars]
+    return header + body + footer
+
+
+def _openai_response(text: str, input_tokens: int, output_tokens: int) -> dict:
+    # Responses API body of a finished mock review
+    return {
+        "id": "resp_mock",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": "mock",
+        "status": "completed",
+        "output": [{
+            "type": "message",
+            "id": "msg_mock",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+def _claude_message(text: str, input_tokens: int, output_tokens: int) -> dict:
+    # Messages API body of a finished mock review
+    usage = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+             "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0}
+    return {"id": "msg_mock", "type": "message", "role": "assistant", "model": "mock",
+            "content": [{"type": "text", "text": text}], "stop_reason": "end_turn",
+            "stop_sequence": None, "usage": usage}
+
+
+def _gemini_response(texts: list, input_tokens: int, output_tokens: int) -> dict:
+    # GenerateContentResponse body with one candidate per mock review
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP",
+                        "index": index} for index, text in enumerate(texts)],
+        "usageMetadata": {"promptTokenCount": input_tokens, "candidatesTokenCount": output_tokens,
+                          "totalTokenCount": input_tokens + output_tokens, "cachedContentTokenCount": 0},
+    }
+
+
+class MockProviderHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the OpenAI Responses, Anthropic Messages and Gemini generateContent
+    endpoints, streamed or not. Each request sleeps for a lognormal delay, fails with
+    a 429 or 500 at the configured error rate, and returns a review of the configured size.
+
+    The file upload endpoints of the three providers (OpenAI and Anthropic /v1/files,
+    Gemini's resumable upload) answer right away and count every upload per provider
+    and file name in the "uploads" stats. So do the batch endpoints (create, retrieve
+    and result download): a batch is running when created, has finished by the first
+    retrieve, and has a review for every request of its input.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _send_event(self, data: dict, event: str = None):
+        message = (f"event: {event}\n" if event else "") + f"data: {json.dumps(data)}\n\n"
+        payload = message.encode("utf-8")
+        self.wfile.write(f"{len(payload):x}\r\n".encode("ascii") + payload + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/_stats":
+            with self.server.stats_lock:
+                self._send_json(200, dict(self.server.stats))
+        elif not self._handle_batch(b"", "GET"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        # Read the whole request, PDF payload included, as a real endpoint would
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self._handle_upload(body) or self._handle_batch(body, "POST"):
+            return
+        config = self.server.config
+        rng = random.Random()
+
+        delay = rng.lognormvariate(0, config["latency_sigma"]) * config["latency_ms"] / 1000.0
+        with self.server.stats_lock:
+            stats = self.server.stats
+            stats["requests"] += 1
+            stats["request_bytes"] += len(body)
+
+        if rng.random() < config["error_rate"]:
+            with self.server.stats_lock:
+                self.server.stats["errors"] += 1
+            if rng.random() < 0.5:
+                self._send_json(429, {"error": {"type": "rate_limit_error", "message": "Mock rate limit"}},
+                                headers={"retry-after-ms": str(config["retry_after_ms"])})
+            else:
+                self._send_json(500, {"error": {"type": "api_error", "message": "Mock server error"}})
+            return
+
+        text = make_review_text(config["response_chars"], rng)
+        input_tokens = len(body) // 4
+        output_tokens = len(text) // 4
+        stream = b'"stream": true' in body or b'"stream":true' in body or "alt=sse" in self.path
+
+        with self.server.stats_lock:
+            self.server.stats["delay_seconds"] += delay
+            self.server.stats["completed"] += 1
+
+        if "/responses" in self.path:
+            self._respond_openai(text, input_tokens, output_tokens, delay, stream)
+        elif "/messages" in self.path:
+            self._respond_claude(text, input_tokens, output_tokens, delay, stream)
+        elif "generatecontent" in self.path.lower():
+            # candidate_count asks for several independent reviews in one response
+            match = re.search(rb'"candidateCount":\s*(\d+)', body)
+            texts = [text] + [make_review_text(config["response_chars"], rng)
+                              for _ in range(int(match.group(1)) - 1 if match else 0)]
+            self._respond_gemini(texts, input_tokens, output_tokens * len(texts), delay, stream)
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def _record_upload(self, api_name: str, filename: str, num_bytes: int):
+        with self.server.stats_lock:
+            uploads = self.server.stats["uploads"]
+            key = f"{api_name}:{filename}"
+            uploads[key] = uploads.get(key, 0) + 1
+            self.server.stats["request_bytes"] += num_bytes
+
+    def _handle_upload(self, body: bytes) -> bool:
+        # Answer a file upload request; False if the request is not one
+        path = self.path.split("?", 1)[0]
+        if path == "/v1/files":
+            match = re.search(rb'filename="([^"]*)"', body)
+            filename = match.group(1).decode("utf-8") if match else ""
+            with self.server.stats_lock:
+                self.server.upload_count += 1
+                file_id = f"file-mock-{self.server.upload_count}"
+                self.server.files[file_id] = body
+            if self.headers.get("anthropic-version"):
+                self._record_upload("claude", filename, len(body))
+                self._send_json(200, {"id": file_id, "type": "file", "filename": filename,
+                                      "mime_type": "application/pdf", "size_bytes": len(body),
+                                      "created_at": "2025-01-01T00:00:00Z", "downloadable": False})
+            else:
+                self._record_upload("openai", filename, len(body))
+                self._send_json(200, {"id": file_id, "object": "file", "bytes": len(body),
+                                      "created_at": int(time.time()), "filename": filename,
+                                      "purpose": "user_data", "status": "processed"})
+            return True
+
+        if path == "/upload/v1beta/files":
+            # Gemini resumable upload: the start request returns the URL the bytes go to
+            file = json.loads(body or b"{}").get("file", {})
+            with self.server.stats_lock:
+                self.server.upload_count += 1
+                file_id = f"mock-{self.server.upload_count}"
+                self.server.pending_uploads[file_id] = {"file": file, "chunks": []}
+            upload_url = f"http://{self.headers.get('Host')}/_upload/{file_id}"
+            self._send_json(200, {}, headers={"x-goog-upload-url": upload_url, "x-goog-upload-status": "active"})
+            return True
+
+        if path.startswith("/_upload/"):
+            file_id = path[len("/_upload/"):]
+            finalize = "finalize" in self.headers.get("X-Goog-Upload-Command", "")
+            with self.server.stats_lock:
+                upload = self.server.pending_uploads[file_id]
+                upload["chunks"].append(body)
+                if finalize:
+                    del self.server.pending_uploads[file_id]
+                    self.server.files[file_id] = b"".join(upload["chunks"])
+            if not finalize:
+                self._send_json(200, {}, headers={"x-goog-upload-status": "active"})
+                return True
+            # The SDK sends the file metadata with snake_case keys
+            display_name = upload["file"].get("display_name", "")
+            size = len(self.server.files[file_id])
+            self._record_upload("gemini", display_name, size)
+            self._send_json(200, {"file": {
+                "name": f"files/{file_id}", "displayName": display_name,
+                "mimeType": upload["file"].get("mime_type", "application/pdf"), "sizeBytes": str(size),
+                "uri": f"http://{self.headers.get('Host')}/v1beta/files/{file_id}", "state": "ACTIVE",
+            }}, headers={"x-goog-upload-status": "final"})
+            return True
+        return False
+
+    def _create_batch(self, api_name: str, requests: list) -> dict:
+        # Answer every request of a batch up front; the results are served once it is retrieved
+        rng = random.Random()
+        results = []
+        for custom_id, request in requests:
+            text = make_review_text(self.server.config["response_chars"], rng)
+            input_tokens = len(json.dumps(request)) // 4
+            output_tokens = len(text) // 4
+            if api_name == "openai":
+                results.append({"id": f"batch_req_{custom_id}", "custom_id": custom_id, "error": None,
+                                "response": {"status_code": 200, "request_id": f"req_{custom_id}",
+                                             "body": _openai_response(text, input_tokens, output_tokens)}})
+            elif api_name == "claude":
+                results.append({"custom_id": custom_id, "result": {
+                    "type": "succeeded", "message": _claude_message(text, input_tokens, output_tokens)}})
+            else:
+                results.append({"key": custom_id,
+                                "response": _gemini_response([text], input_tokens, output_tokens)})
+        with self.server.stats_lock:
+            self.server.batch_count += 1
+            batch = {"id": f"mock-batch-{self.server.batch_count}", "api_name": api_name, "retrieved": False,
+                     "results": "".join(json.dumps(result) + "\n" for result in results).encode("utf-8")}
+            self.server.batches[batch["id"]] = batch
+            self.server.files[f"{batch['id']}-output"] = batch["results"]
+            self.server.stats["batch_requests"] += len(results)
+        return batch
+
+    def _batch_body(self, batch: dict) -> dict:
+        # The provider's view of a batch: running until the first retrieve, then finished
+        finished = batch["retrieved"]
+        output_file_id = f"{batch['id']}-output"
+        if batch["api_name"] == "openai":
+            return {"id": batch["id"], "object": "batch", "endpoint": "/v1/responses", "input_file_id": "",
+                    "completion_window": "24h", "created_at": int(time.time()),
+                    "status": "completed" if finished else "in_progress",
+                    "output_file_id": output_file_id if finished else None, "error_file_id": None}
+        if batch["api_name"] == "claude":
+            return {"id": batch["id"], "type": "message_batch",
+                    "processing_status": "ended" if finished else "in_progress",
+                    "request_counts": {"processing": 0, "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0},
+                    "created_at": "2025-01-01T00:00:00Z", "expires_at": "2025-01-02T00:00:00Z",
+                    "ended_at": None, "archived_at": None, "cancel_initiated_at": None,
+                    "results_url": f"http://{self.headers.get('Host')}/v1/messages/batches/{batch['id']}/results"
+                    if finished else None}
+        metadata = {"state": "BATCH_STATE_SUCCEEDED" if finished else "BATCH_STATE_RUNNING"}
+        if finished:
+            metadata["output"] = {"responsesFile": f"files/{output_file_id}"}
+        return {"name": f"batches/{batch['id']}", "metadata": metadata}
+
+    def _send_jsonl(self, payload: bytes):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/jsonl")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle_batch(self, body: bytes, method: str) -> bool:
+        # Answer a batch create, retrieve or result download request; False if the request is not one
+        path = self.path.split("?", 1)[0]
+        if method == "POST" and path == "/v1/batches":
+            with self.server.stats_lock:
+                input_file = self.server.files[json.loads(body)["input_file_id"]]
+            lines = [json.loads(line) for line in input_file.splitlines() if line.startswith(b"{")]
+            batch = self._create_batch("openai", [(line["custom_id"], line["body"]) for line in lines])
+            self._send_json(200, self._batch_body(batch))
+            return True
+        if method == "POST" and path == "/v1/messages/batches":
+            requests = json.loads(body)["requests"]
+            batch = self._create_batch("claude", [(request["custom_id"], request["params"]) for request in requests])
+            self._send_json(200, self._batch_body(batch))
+            return True
+        if method == "POST" and path.endswith(":batchGenerateContent"):
+            file_name = json.loads(body)["batch"]["inputConfig"]["fileName"]
+            with self.server.stats_lock:
+                input_file = self.server.files[file_name[len("files/"):]]
+            lines = [json.loads(line) for line in input_file.splitlines() if line.strip()]
+            batch = self._create_batch("gemini", [(line["key"], line["request"]) for line in lines])
+            self._send_json(200, self._batch_body(batch))
+            return True
+
+        if method != "GET":
+            return False
+        match = re.fullmatch(r"/v1/files/(?P<id>[^/]+)/content"
+                             r"|(?:/download)?/v1beta/files/(?P<gemini_id>[^/]+):download", path)
+        if match:
+            with self.server.stats_lock:
+                payload = self.server.files.get(match.group("id") or match.group("gemini_id"))
+            if payload is None:
+                self._send_json(404, {"error": {"message": f"Unknown file {path}"}})
+            else:
+                self._send_jsonl(payload)
+            return True
+        match = re.fullmatch(r"/v1/batches/(?P<id>[^/]+)"
+                             r"|/v1/messages/batches/(?P<claude_id>[^/]+)(?P<results>/results)?"
+                             r"|/v1beta/batches/(?P<gemini_id>[^/]+)", path)
+        if match:
+            batch_id = match.group("id") or match.group("claude_id") or match.group("gemini_id")
+            with self.server.stats_lock:
+                batch = self.server.batches.get(batch_id)
+            if batch is None:
+                self._send_json(404, {"error": {"message": f"Unknown batch {batch_id}"}})
+            elif match.group("results"):
+                self._send_jsonl(batch["results"])
+            else:
+                batch["retrieved"] = True
+                self._send_json(200, self._batch_body(batch))
+            return True
+        return False
+
+    def _stream_chunks(self, text: str, delay: float):
+        # Sleep until the first token, then spread the rest of the delay over the chunks
+        time.sleep(delay * FIRST_TOKEN_SHARE)
+        chunk_size = max(1, len(text) // STREAM_CHUNKS + 1)
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        for index, chunk in enumerate(chunks):
+            if index:
+                time.sleep(delay * (1 - FIRST_TOKEN_SHARE) / len(chunks))
+            yield chunk
+
+    def _respond_openai(self, text: str, input_tokens: int, output_tokens: int, delay: float, stream: bool):
+        response = _openai_response(text, input_tokens, output_tokens)
+        if not stream:
+            time.sleep(delay)
+            self._send_json(200, response)
+            return
+        self._start_stream()
+        for sequence_number, chunk in enumerate(self._stream_chunks(text, delay)):
+            self._send_event({"type": "response.output_text.delta", "item_id": "msg_mock", "output_index": 0,
+                              "content_index": 0, "delta": chunk, "sequence_number": sequence_number},
+                             event="response.output_text.delta")
+        self._send_event({"type": "response.completed", "response": response, "sequence_number": 0},
+                         event="response.completed")
+        self._end_stream()
+
+    def _respond_claude(self, text: str, input_tokens: int, output_tokens: int, delay: float, stream: bool):
+        message = _claude_message(text, input_tokens, output_tokens)
+        usage = message["usage"]
+        if not stream:
+            time.sleep(delay)
+            self._send_json(200, message)
+            return
+        self._start_stream()
+        self._send_event({"type": "message_start", "message": {**message, "content": [], "stop_reason": None,
+                                                               "usage": {**usage, "output_tokens": 0}}},
+                         event="message_start")
+        self._send_event({"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+                         event="content_block_start")
+        for chunk in self._stream_chunks(text, delay):
+            self._send_event({"type": "content_block_delta", "index": 0,
+                              "delta": {"type": "text_delta", "text": chunk}}, event="content_block_delta")
+        self._send_event({"type": "content_block_stop", "index": 0}, event="content_block_stop")
+        self._send_event({"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                          "usage": {"output_tokens": output_tokens}}, event="message_delta")
+        self._send_event({"type": "message_stop"}, event="message_stop")
+        self._end_stream()
+
+    def _respond_gemini(self, texts: list, input_tokens: int, output_tokens: int, delay: float, stream: bool):
+        response = _gemini_response(texts, input_tokens, output_tokens)
+        usage = response["usageMetadata"]
+        if not stream:
+            time.sleep(delay)
+            self._send_json(200, response)
+            return
+        self._start_stream()
+        for chunk in self._stream_chunks(texts[0], delay):
+            self._send_event({"candidates": [{"content": {"role": "model", "parts": [{"text": chunk}]}}],
+                              "usageMetadata": usage})
+        self._end_stream()
+
+
+def _serve_mock_provider(config: dict, port_queue):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockProviderHandler)
+    server.daemon_threads = True
+    server.config = config
+    server.stats = {"requests": 0, "completed": 0, "errors": 0, "request_bytes": 0, "delay_seconds": 0.0,
+                    "uploads": {}, "batch_requests": 0}
+    server.stats_lock = threading.Lock()
+    # Uploaded and batch output files by id, and batches by id
+    server.files = {}
+    server.upload_count = 0
+    server.pending_uploads = {}
+    server.batches = {}
+    server.batch_count = 0
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_mock_server(latency_ms: float = 2000, latency_sigma: float = 0.5, error_rate: float = 0.0,
+                      response_chars: int = 6000, retry_after_ms: int = 100):
+    """
+    Start the mock provider server in a separate process, so its work does not
+    count towards the pipeline's CPU and memory.
+
+    Args:
+        latency_ms: Median response delay in milliseconds
+        latency_sigma: Sigma of the lognormal delay distribution (0 makes it constant)
+        error_rate: Share of requests answered with a 429 or a 500
+        response_chars: Length of each review in characters
+        retry_after_ms: Retry-After sent with mock 429 responses
+
+    Returns:
+        (process, base_url) of the running server
+    """
+    config = {"latency_ms": latency_ms, "latency_sigma": latency_sigma, "error_rate": error_rate,
+              "response_chars": response_chars, "retry_after_ms": retry_after_ms}
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve_mock_provider, args=(config, port_queue), daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{port_queue.get(timeout=30)}"
+
+
+def get_mock_stats(base_url: str) -> dict:
+    """
+    Get the request, error and delay counters of a mock server, and its uploads per
+    "api_name:file name".
+    """
+    import httpx
+
+    return httpx.get(f"{base_url}/_stats").json()
+
+
+def run_benchmark(pdf_file_path: str, reviewer_guidance_path: str = "reviewer_guidance.txt", total_tries: int = 10,
+                  max_workers: int = 8, stream: bool = False, latency_ms: float = 2000, latency_sigma: float = 0.5,
+                  error_rate: float = 0.0, response_chars: int = 6000, providers: list = None) -> dict:
+    """
+    Drive generate_reviews_for_paper against a local mock of all three providers.
+
+    Returns:
+        dict with jobs, wall time, jobs per second, peak RSS, mean client-side call
+        latency, mean mock server delay, and the per-call overhead between the two
+    """
+    from clients import close_clients, set_base_url
+    from generate_all import generate_reviews_for_paper
+
+    process, base_url = start_mock_server(latency_ms, latency_sigma, error_rate, response_chars)
+    output_base_dir = tempfile.mkdtemp(prefix="review_benchmark_")
+    try:
+        for name, value in MOCK_API_KEYS.items():
+            os.environ.setdefault(name, value)
+        set_base_url("openai", f"{base_url}/v1")
+        set_base_url("claude", base_url)
+        set_base_url("gemini", base_url)
+        close_clients()
+
+        metrics_path = os.path.join(output_base_dir, "metrics.jsonl")
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started_at = time.perf_counter()
+        generate_reviews_for_paper(pdf_file_path, reviewer_guidance_path, total_tries, output_base_dir,
+                                   max_workers=max_workers, stream=stream, providers=providers,
+                                   metrics_path=metrics_path)
+        wall_time = time.perf_counter() - started_at
+        rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        with open(metrics_path, "r") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        latencies = [record["latency"] for record in records if record["status"] == "done"]
+        mock_stats = get_mock_stats(base_url)
+    finally:
+        for api_name in ("openai", "claude", "gemini"):
+            set_base_url(api_name, None)
+        close_clients()
+        process.terminate()
+        shutil.rmtree(output_base_dir, ignore_errors=True)
+
+    done = sum(record["status"] == "done" for record in records)
+    mean_latency = sum(latencies) / len(latencies) if latencies else 0.0
+    mean_delay = mock_stats["delay_seconds"] / mock_stats["completed"] if mock_stats["completed"] else 0.0
+    return {
+        "jobs": len(records),
+        "done": done,
+        "failed": sum(record["status"] == "error" for record in records),
+        "requests": mock_stats["requests"],
+        "wall_time": wall_time,
+        "jobs_per_second": done / wall_time if wall_time else 0.0,
+        # Upper bound if the pipeline added no overhead at all
+        "ideal_jobs_per_second": max_workers / mean_delay if mean_delay else 0.0,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": rss_peak / 1024,
+        "rss_growth_mb": (rss_peak - rss_before) / 1024,
+        "mean_call_latency": mean_latency,
+        "mean_server_delay": mean_delay,
+        "mean_call_overhead": mean_latency - mean_delay,
+        "request_mb": mock_stats["request_bytes"] / 1024 ** 2,
+    }
+
+
+def print_benchmark_report(results: dict):
+    """
+    Print the results of run_benchmark.
+    """
+    print(f"\n{'='*60}")
+    print("BENCHMARK")
+    print(f"{'='*60}")
+    print(f"  Jobs: {results['jobs']} ({results['done']} done, {results['failed']} failed), "
+          f"{results['requests']} requests, {results['request_mb']:.1f} MB sent")
+    print(f"  Wall time: {results['wall_time']:.2f}s")
+    print(f"  Throughput: {results['jobs_per_second']:.2f} jobs/s "
+          f"(ideal {results['ideal_jobs_per_second']:.2f} jobs/s at this concurrency)")
+    print(f"  Peak RSS: {results['peak_rss_mb']:.1f} MB (+{results['rss_growth_mb']:.1f} MB during the run)")
+    print(f"  Call latency: {results['mean_call_latency'] * 1000:.1f} ms mean, "
+          f"server delay {results['mean_server_delay'] * 1000:.1f} ms, "
+          f"overhead {results['mean_call_overhead'] * 1000:.1f} ms per call")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the generation pipeline against local mock providers")
+    parser.add_argument("--pdf_path", type=str, default="example_pdfs/a0kq0tJwwn.pdf",
+                        help="PDF file sent with every request (default: example_pdfs/a0kq0tJwwn.pdf)")
+    parser.add_argument("--guidance", type=str, default="reviewer_guidance.txt",
+                        help="Path to reviewer guidance file (default: reviewer_guidance.txt)")
+    parser.add_argument("--tries", type=int, default=10,
+                        help="Number of reviews per model (default: 10)")
+    parser.add_argument("--max_workers", type=int, default=8,
+                        help="Maximum number of concurrent calls (default: 8)")
+    parser.add_argument("--providers", type=str, default="",
+                        help="Comma-separated providers to benchmark (default: all)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Benchmark the streaming path")
+    parser.add_argument("--latency_ms", type=float, default=2000,
+                        help="Median mock response delay in milliseconds (default: 2000)")
+    parser.add_argument("--latency_sigma", type=float, default=0.5,
+                        help="Sigma of the lognormal delay distribution; 0 for constant delays (default: 0.5)")
+    parser.add_argument("--error_rate", type=float, default=0.0,
+                        help="Share of requests answered with a 429 or 500 (default: 0.0)")
+    parser.add_argument("--response_chars", type=int, default=6000,
+                        help="Length of each mock review in characters (default: 6000)")
+
+    args = parser.parse_args()
+
+    from generate_all import parse_name_list
+
+    results = run_benchmark(args.pdf_path, args.guidance, args.tries, max_workers=args.max_workers,
+                            stream=args.stream, latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+                            error_rate=args.error_rate, response_chars=args.response_chars,
+                            providers=parse_name_list(args.providers))
+    print_benchmark_report(results)
@@ -0,0 +1,140 @@
+import threading
+
+
+# One long-lived SDK client per (api_name, api_key), shared across all review calls
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Connection pool size for newly created clients; set to the run's concurrency
+_max_connections = 20
+
+# Optional endpoint overrides per provider, e.g. local stand-in servers
+_base_urls = {}
+
+# Optional API keys per provider, used instead of the SDK's environment variable
+_api_keys = {}
+
+# Default timeouts of every pooled client, in seconds; review calls may pass a shorter
+# per-request timeout (e.g. the hedging hard timeout)
+CONNECT_TIMEOUT = 10.0
+REQUEST_TIMEOUT = 600.0
+
+
+def configure_client_pool(max_connections: int):
+    """
+    Set the HTTP connection pool size used by clients created from now on.
+
+    Args:
+        max_connections: Maximum number of pooled keep-alive connections per client,
+            usually the run's maximum number of concurrent calls
+    """
+    global _max_connections
+    _max_connections = max(1, int(max_connections))
+
+
+def set_base_url(api_name: str, base_url: str = None):
+    """
+    Point clients created from now on at a different API endpoint.
+
+    Args:
+        api_name: Provider name ("openai", "claude" or "gemini")
+        base_url: Endpoint URL, e.g. a local stand-in server; None restores the SDK default
+    """
+    if base_url is None:
+        _base_urls.pop(api_name, None)
+    else:
+        _base_urls[api_name] = base_url
+
+
+def set_api_key(api_name: str, api_key: str = None):
+    """
+    Set the API key that get_client uses for a provider when none is passed.
+
+    Args:
+        api_name: Provider name ("openai", "claude" or "gemini")
+        api_key: API key; None restores the SDK's environment variable
+    """
+    if api_key is None:
+        _api_keys.pop(api_name, None)
+    else:
+        _api_keys[api_name] = api_key
+
+
+def _pool_limits():
+    # Connection pool shared by the HTTP clients of every provider
+    import httpx
+
+    return httpx.Limits(max_connections=_max_connections, max_keepalive_connections=_max_connections)
+
+
+# Every client is built with its options set explicitly rather than inheriting SDK
+# defaults. SDK-level retries are disabled: call_with_retries, with its shared rate
+# limiter backoff, is the only retry policy, so one failure is never retried twice over
+
+
+def _build_openai_client(api_key: str = None):
+    import openai
+
+    timeout = openai.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+    return openai.OpenAI(api_key=api_key, base_url=_base_urls.get("openai"), max_retries=0, timeout=timeout,
+                         http_client=openai.DefaultHttpxClient(limits=_pool_limits(), timeout=timeout))
+
+
+def _build_claude_client(api_key: str = None):
+    import anthropic
+
+    # The SDK bundles its own HTTP library, so the timeout uses its Timeout type
+    timeout = anthropic.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+    return anthropic.Anthropic(api_key=api_key, base_url=_base_urls.get("claude"), max_retries=0, timeout=timeout,
+                               http_client=anthropic.DefaultHttpxClient(limits=_pool_limits(), timeout=timeout))
+
+
+def _build_gemini_client(api_key: str = None):
+    from google import genai
+    from google.genai import types
+
+    # genai takes a single request timeout, in milliseconds
+    return genai.Client(api_key=api_key, http_options=types.HttpOptions(
+        base_url=_base_urls.get("gemini"), timeout=int(REQUEST_TIMEOUT * 1000),
+        client_args={"limits": _pool_limits()}, retry_options=types.HttpRetryOptions(attempts=1)))
+
+
+_client_builders = {
+    "openai": _build_openai_client,
+    "claude": _build_claude_client,
+    "gemini": _build_gemini_client,
+}
+
+
+def get_client(api_name: str, api_key: str = None):
+    """
+    Get the shared SDK client for a provider, creating it on first use.
+
+    Args:
+        api_name: Provider name ("openai", "claude" or "gemini")
+        api_key: Optional API key; None uses the key from set_api_key, or else the
+            SDK's environment variable
+
+    Returns:
+        The pooled SDK client for this provider and API key
+    """
+    api_key = api_key or _api_keys.get(api_name)
+    key = (api_name, api_key)
+    with _clients_lock:
+        if key not in _clients:
+            if api_name not in _client_builders:
+                raise ValueError(f"Unknown provider: {api_name}")
+            _clients[key] = _client_builders[api_name](api_key)
+        return _clients[key]
+
+
+def close_clients():
+    """
+    Close every pooled client and release its connections.
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            close = getattr(client, "close", None)
+            if close is not None:
+                close()
+        _clients.clear()
@@ -0,0 +1,169 @@
+import base64
+import hashlib
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+
+# Files at least this large are encoded from a memory map in chunks
+MMAP_THRESHOLD = 4 * 1024 * 1024
+
+# Chunk size for streaming base64 encoding; must be a multiple of 3
+ENCODE_CHUNK_SIZE = 3 * 1024 * 1024
+
+# Maximum number of prepared documents kept in memory at once
+MAX_CACHED_DOCUMENTS = 32
+
+
+class PreparedDocument:
+    """
+    A PDF that is read, encoded and uploaded at most once per run.
+
+    The raw bytes, the base64 payload and the per-provider uploaded file
+    references are all computed lazily on first use and then reused by
+    every attempt and every model that reviews this PDF.
+    """
+
+    def __init__(self, pdf_file_path: str):
+        self.path = pdf_file_path
+        self.filename = os.path.basename(pdf_file_path)
+        # Preprocessing can replace a PDF with its extracted text (see preprocessing.py)
+        self.mime_type = "text/plain" if pdf_file_path.endswith(".txt") else "application/pdf"
+        stat = os.stat(pdf_file_path)
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+
+        self._data = None
+        self._base64 = None
+        self._sha256 = None
+        self._file_refs = {}
+        self._upload_locks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def data(self) -> bytes:
+        """Raw PDF bytes, read from disk once."""
+        with self._lock:
+            if self._data is None:
+                with open(self.path, "rb") as f:
+                    self._data = f.read()
+            return self._data
+
+    @property
+    def is_text(self) -> bool:
+        """Whether the document is extracted text rather than a PDF."""
+        return self.mime_type == "text/plain"
+
+    @property
+    def text(self) -> str:
+        """Decoded contents of a text document."""
+        return self.data.decode("utf-8")
+
+    @property
+    def base64(self) -> str:
+        """Base64-encoded PDF, encoded once."""
+        with self._lock:
+            if self._base64 is None:
+                self._base64 = self._encode_base64()
+            return self._base64
+
+    @property
+    def sha256(self) -> str:
+        """SHA-256 hex digest of the PDF bytes, hashed once."""
+        with self._lock:
+            if self._sha256 is None:
+                digest = hashlib.sha256()
+                if self._data is not None:
+                    digest.update(self._data)
+                else:
+                    with open(self.path, "rb") as f:
+                        for chunk in iter(lambda: f.read(ENCODE_CHUNK_SIZE), b""):
+                            digest.update(chunk)
+                self._sha256 = digest.hexdigest()
+            return self._sha256
+
+    def _encode_base64(self) -> str:
+        # Reuse the raw bytes if another provider has already read them
+        if self._data is not None:
+            return base64.b64encode(self._data).decode("ascii")
+
+        with open(self.path, "rb") as f:
+            if self.size < MMAP_THRESHOLD:
+                return base64.b64encode(f.read()).decode("ascii")
+
+            # Encode large files chunk by chunk from a memory map, so the full
+            # raw file is never held in memory next to its encoding
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                chunks = [base64.b64encode(mm[i:i + ENCODE_CHUNK_SIZE])
+                          for i in range(0, self.size, ENCODE_CHUNK_SIZE)]
+        return b"".join(chunks).decode("ascii")
+
+    def get_file_ref(self, api_name: str, client, upload_function, usage: dict = None):
+        """
+        Get the provider's uploaded file reference, uploading the PDF on first use.
+
+        Args:
+            api_name: Provider name ("openai", "claude" or "gemini"), or any name
+                identifying a provider-side resource derived from this PDF
+            client: SDK client the file is uploaded with
+            upload_function: Callable (client, document) -> file reference
+            usage: Optional usage dict of the calling review; the PDF size is added to
+                its "bytes_uploaded" if this call performs the upload
+
+        Returns:
+            The file reference returned by upload_function
+        """
+        key = (api_name, id(client))
+        # Uploads are slow, so serialize them separately from the byte cache
+        with self._upload_lock(key):
+            if key not in self._file_refs:
+                self._file_refs[key] = upload_function(client, self)
+                add_bytes_uploaded(usage, self.size)
+            return self._file_refs[key]
+
+    def _upload_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._upload_locks.setdefault(key, threading.Lock())
+
+
+def add_bytes_uploaded(usage: dict, num_bytes: int):
+    """
+    Add the bytes a review call sent for its PDF to the call's usage dict, if any.
+    """
+    if usage is not None:
+        usage["bytes_uploaded"] = usage.get("bytes_uploaded", 0) + num_bytes
+
+
+_documents = OrderedDict()
+_documents_lock = threading.Lock()
+
+
+def prepare_document(pdf_file_path) -> PreparedDocument:
+    """
+    Get the shared PreparedDocument for a PDF path.
+
+    Documents are cached per path and invalidated when the file changes on disk.
+    The least recently used documents are dropped beyond MAX_CACHED_DOCUMENTS.
+
+    Args:
+        pdf_file_path: Path to the PDF file, or an already prepared document
+
+    Returns:
+        The PreparedDocument for this PDF
+    """
+    if isinstance(pdf_file_path, PreparedDocument):
+        return pdf_file_path
+
+    key = os.path.abspath(pdf_file_path)
+    with _documents_lock:
+        document = _documents.get(key)
+        if document is not None and document.mtime == os.stat(key).st_mtime:
+            _documents.move_to_end(key)
+            return document
+
+        document = PreparedDocument(pdf_file_path)
+        _documents[key] = document
+        while len(_documents) > MAX_CACHED_DOCUMENTS:
+            _documents.popitem(last=False)
+        return document
@@ -1,21 +1,673 @@
-from generate_claude import review_paper_claude
-from generate_gemini import review_paper_gemini
-from generate_openai import review_paper_openai
+from clients import configure_client_pool, set_api_key
+from adaptive_sampling import AdaptiveSampler
+from documents import prepare_document
+from hedging import CallTimeout, HedgingPolicy
+from job_queue import JobQueue
+from metrics import MetricsRecorder
+from preprocessing import PdfPreprocessor
+from providers import cleanup_providers, get_api_configs, get_api_key_pool
+from batch_mode import build_batches, collect_batches, submit_batches
+from response_cache import ResponseCache
+from result_store import ResultStore
+from rate_limit import backoff_delay, build_rate_limiters, get_retry_after, is_rate_limit_error, is_retryable_error
 import os
 import argparse
+import functools
+import hashlib
+import socket
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+
+# Serializes progress output from concurrent jobs
+_print_lock = threading.Lock()
+
+
+def log(message: str):
+    """
+    Print a progress line without interleaving with other threads.
+    """
+    with _print_lock:
+        print(message, flush=True)
+
+
+def get_pdf_name(pdf_file_path: str) -> str:
+    """
+    Get the PDF name used in output file names.
+    """
+    return os.path.splitext(os.path.basename(pdf_file_path))[0]
+
+
+def build_paper_jobs(pdf_file_path: str, total_tries: int, api_configs: list, variant: str = None) -> list:
+    """
+    Expand one paper into a job for every (provider, model, attempt).
+
+    Reviews of a preprocessed variant are named "{pdf_name}@{variant}", so they never
+    overwrite or mix with the reviews of the raw PDF.
+    """
+    pdf_name = get_pdf_name(pdf_file_path)
+    if variant is not None:
+        pdf_name = f"{pdf_name}@{variant}"
+    jobs = []
+    for api_config in api_configs:
+        output_dir = api_config["output_dir"]
+        for model_name in api_config["models"]:
+            for attempt in range(total_tries):
+                jobs.append({
+                    "api_name": api_config["api_name"],
+                    "model_name": model_name,
+                    "attempt": attempt,
+                    "pdf_name": pdf_name,
+                    "pdf_file_path": pdf_file_path,
+                    "output_file_path": os.path.join(output_dir, f"{model_name}_{pdf_name}_{attempt}.txt"),
+                })
+    return jobs
+
+
+@functools.lru_cache(maxsize=16)
+def text_sha256(text: str) -> str:
+    """
+    SHA-256 hex digest of a text, memoized for the guidance and prompt.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def get_response_cache_key(job: dict, document, reviewer_guidance: str, user_prompt: str) -> str:
+    """
+    Build the response cache key of a job from the inputs that determine its response.
+    """
+    params = {
+        "user_prompt_sha256": text_sha256(user_prompt),
+        # A generation cut short after the scores is not a full review
+        "stop_when_scored": bool(job["review_kwargs"].get("stop_when_scored")),
+    }
+    return ResponseCache.make_key(document.sha256, text_sha256(reviewer_guidance), job["model_name"],
+                                  params, job["attempt"])
+
+
+def save_review(job: dict, review_text: str, result_store: ResultStore = None, metadata: dict = None):
+    """
+    Save a finished review to the result store, or atomically to its output file.
+    """
+    if result_store is not None:
+        result_store.append(job["api_name"], job["model_name"], job["pdf_name"], job["attempt"],
+                            review_text, metadata=metadata)
+        return
+    output_file_path = job["output_file_path"]
+    with open(output_file_path + ".tmp", "w") as f:
+        f.write(review_text)
+    os.replace(output_file_path + ".tmp", output_file_path)
+
+
+def get_job_tag(job: dict) -> str:
+    """
+    Get the progress log prefix of a job.
+    """
+    return f"[{job['api_name'].upper()}] {job['model_name']} {job['pdf_name']} attempt {job['attempt'] + 1}"
+
+
+def output_exists(job: dict, result_store: ResultStore = None) -> bool:
+    """
+    Whether a job's review is already in the result store, or on disk without one.
+    """
+    if result_store is not None:
+        return result_store.contains(job["model_name"], job["pdf_name"], job["attempt"])
+    return os.path.exists(job["output_file_path"])
+
+
+def load_job_document(job: dict, preprocessor: PdfPreprocessor = None):
+    """
+    Get the shared PreparedDocument of a job's PDF, or of its preprocessed variant.
+    """
+    # The PDF is preprocessed, read and encoded once per run and shared by all its jobs
+    pdf_file_path = job["pdf_file_path"]
+    if preprocessor is not None:
+        pdf_file_path = preprocessor.process(pdf_file_path)
+    return prepare_document(pdf_file_path)
+
+
+def check_response_cache(job: dict, document, reviewer_guidance: str, user_prompt: str,
+                         response_cache: ResponseCache, result_store: ResultStore = None):
+    """
+    Look a job up in the response cache and set its cache_key.
+
+    Returns:
+        "skipped" if its existing output came from the same inputs, "cached" if the
+        review was served from the cache, or None if the provider has to be called
+    """
+    tag = get_job_tag(job)
+    cache_key = job["cache_key"] = get_response_cache_key(job, document, reviewer_guidance, user_prompt)
+    
+    # Keep existing outputs unless the cache knows they came from different inputs
+    if output_exists(job, result_store):
+        recorded_key = response_cache.output_key(job["output_file_path"])
+        if recorded_key is None or recorded_key == cache_key:
+            log(f"{tag}: Already exists, skipping.")
+            return "skipped"
+        log(f"{tag}: Existing output is stale, regenerating.")
+    
+    cached_text = response_cache.get(cache_key)
+    if cached_text is not None:
+        save_review(job, cached_text, result_store, metadata={"cache_key": cache_key, "cached": True})
+        response_cache.record_output(job["output_file_path"], cache_key)
+        log(f"{tag}: From cache.")
+        return "cached"
+    return None
+
+
+def call_with_retries(job: dict, rate_limiters: dict, max_retries: int, call,
+                      hedging: HedgingPolicy = None, num_samples: int = 1, hedge: bool = True):
+    """
+    Call a job's review function under its provider's rate limiter, retrying
+    rate-limit and transient errors with backoff.
+
+    Args:
+        job: Job whose usage, latency and retries are updated
+        rate_limiters: Mapping from api_name to its ProviderRateLimiter
+        max_retries: Number of retries on rate-limit and transient errors
+        call: Callable taking the usage dict to fill, which performs the provider call
+        hedging: Optional HedgingPolicy that hedges slow calls and enforces the hard
+            timeout; CallTimeout is raised to the caller instead of retried
+        num_samples: Reviews generated by the call, part of its latency budget key
+        hedge: Whether the call runs under the hedging policy; streamed calls do not,
+            so they are neither duplicated nor abandoned (default: True)
+
+    Returns:
+        The result of call
+    """
+    rate_limiter = rate_limiters[job["api_name"]]
+    estimated_tokens = rate_limiter.estimate_tokens(job["model_name"])
+    
+    @contextmanager
+    def attempt_slot(started_at: list):
+        # The latency is counted from the moment the first attempt holds its slot
+        with rate_limiter.slot(estimated_tokens):
+            if not started_at:
+                started_at.append(time.perf_counter())
+            yield
+
+    for retry in range(max_retries + 1):
+        try:
+            if hedging is None or not hedge:
+                with rate_limiter.slot(estimated_tokens):
+                    started_at = time.perf_counter()
+                    try:
+                        result = call(job["usage"])
+                    finally:
+                        job["latency"] = time.perf_counter() - started_at
+            else:
+                # Every attempt, the hedged duplicate included, takes its own slot and tokens
+                started_at = []
+                try:
+                    result = hedging.call(
+                        (job["api_name"], job["model_name"], num_samples), call, usage=job["usage"],
+                        on_hedge=lambda budget: hedged(job, budget), slot=lambda: attempt_slot(started_at))
+                finally:
+                    job["latency"] = time.perf_counter() - started_at[0] if started_at else None
+            rate_limiter.on_success(job["model_name"], estimated_tokens, job["usage"])
+            return result
+        except Exception as e:
+            # Timed-out jobs are requeued by run_jobs rather than retried in place
+            if retry == max_retries or not is_retryable_error(e) or isinstance(e, CallTimeout):
+                raise
+            retry_after = get_retry_after(e)
+            if is_rate_limit_error(e):
+                rate_limiter.on_rate_limited(retry_after)
+            delay = backoff_delay(retry, retry_after=retry_after)
+            job["retries"] += 1
+            log(f"{get_job_tag(job)}: {e}; retrying in {delay:.1f}s ({retry + 1}/{max_retries})")
+            time.sleep(delay)
+
+
+def hedged(job: dict, budget: float):
+    """
+    Note on a job that its call outran the model's latency budget and was duplicated.
+    """
+    job["hedged"] = True
+    log(f"{get_job_tag(job)}: No response after {budget:.1f}s (budget), sending a hedged request.")
+
+
+def finish_review(job: dict, review_text: str, document, reviewer_guidance: str,
+                  response_cache: ResponseCache = None, result_store: ResultStore = None,
+                  preprocessor: PdfPreprocessor = None, streamed: bool = False, metadata: dict = None):
+    """
+    Save a review returned by the provider and add it to the response cache.
+
+    Args:
+        job: The finished job
+        review_text: Review text
+        document: PreparedDocument the review was generated from
+        reviewer_guidance: System guidance for the reviewer
+        response_cache: Optional ResponseCache receiving the review
+        result_store: Optional ResultStore receiving the review and its call metadata
+        preprocessor: Optional PdfPreprocessor the document came from
+        streamed: Whether the review function already wrote the output file
+        metadata: Extra call metadata for the result store
+    """
+    cache_key = job.get("cache_key")
+    if result_store is not None:
+        save_review(job, review_text, result_store, metadata={
+            "latency": job["latency"],
+            "usage": dict(job["usage"]),
+            "retries": job["retries"],
+            "params": dict(job["review_kwargs"]),
+            "pdf_sha256": document.sha256,
+            "preprocess": preprocessor.variant if preprocessor is not None else None,
+            "guidance_sha256": text_sha256(reviewer_guidance),
+            "cache_key": cache_key,
+            **(metadata or {}),
+        })
+    elif not streamed:
+        save_review(job, review_text)
+    
+    if response_cache is not None:
+        response_cache.put(cache_key, review_text, model_name=job["model_name"],
+                           pdf_sha256=document.sha256, sample_index=job["attempt"])
+        response_cache.record_output(job["output_file_path"], cache_key)
+
+
+def run_review_job(job: dict, reviewer_guidance: str, user_prompt: str,
+                   rate_limiters: dict, max_retries: int = 5, response_cache: ResponseCache = None,
+                   result_store: ResultStore = None, preprocessor: PdfPreprocessor = None,
+                   hedging: HedgingPolicy = None) -> str:
+    """
+    Run a single (provider, model, attempt) review job.
+
+    Args:
+        job: Job description with api_name, model_name, attempt, function, pdf_file_path,
+            review_kwargs and output_file_path; its usage dict is filled with token usage,
+            its latency with the wall-clock seconds of the last call and its error field
+            with the exception message on failure
+        reviewer_guidance: System guidance for the reviewer
+        user_prompt: User prompt for the review
+        rate_limiters: Mapping from api_name to its ProviderRateLimiter
+        max_retries: Number of retries on rate-limit and transient errors (default: 5)
+        response_cache: Optional content-addressed ResponseCache consulted before calling
+            the provider; it also detects outputs written from different inputs
+        result_store: Optional ResultStore that receives the review with its scores and
+            call metadata instead of the output file
+        preprocessor: Optional PdfPreprocessor whose variant of the PDF is sent instead
+            of the original
+        hedging: Optional HedgingPolicy that hedges calls slower than the model's latency
+            budget (except streamed ones) and enforces the hard timeout
+
+    Returns:
+        Job status: "skipped", "cached", "done", "timeout" or "error"
+    """
+    tag = get_job_tag(job)
+    job["cache_key"] = None
+    
+    # Skip if file already exists (without a cache, the filename check is all there is)
+    if response_cache is None and output_exists(job, result_store):
+        log(f"{tag}: Already exists, skipping.")
+        return "skipped"
+
+    try:
+        document = load_job_document(job, preprocessor)
+        
+        if response_cache is not None:
+            status = check_response_cache(job, document, reviewer_guidance, user_prompt, response_cache,
+                                          result_store)
+            if status is not None:
+                return status
+
+        # Streamed reviews are written incrementally by the review function itself; with a
+        # result store the stream goes to a scratch file and the finished review to the store
+        review_kwargs = dict(job["review_kwargs"])
+        stream = review_kwargs.pop("stream", False)
+        stream_path = job["output_file_path"]
+        if stream:
+            if result_store is not None:
+                stream_path = os.path.join(result_store.store_dir, "partial", os.path.basename(stream_path))
+                os.makedirs(os.path.dirname(stream_path), exist_ok=True)
+            review_kwargs["stream_to"] = stream_path
+        
+        # An abandoned stream would keep writing its partial file, so streamed calls are
+        # neither hedged nor cut off by the hard timeout; the SDK timeout still ends a
+        # stream that stalls
+        review_text = call_with_retries(
+            job, rate_limiters, max_retries,
+            lambda usage: job["function"](document, reviewer_guidance, user_prompt,
+                                          model_name=job["model_name"], usage=usage, **review_kwargs),
+            hedging=hedging, hedge=not stream)
+
+        # Save to text file (or the result store)
+        if stream and result_store is not None:
+            os.remove(stream_path)
+        finish_review(job, review_text, document, reviewer_guidance, response_cache, result_store,
+                      preprocessor, streamed=stream)
+
+        log(f"{tag}: Done.")
+        return "done"
+
+    except CallTimeout as e:
+        job["error"] = str(e)
+        job["timeouts"] += 1
+        log(f"{tag}: {e}")
+        return "timeout"
+
+    except Exception as e:
+        job["error"] = str(e)
+        log(f"{tag}: Error: {e}")
+        return "error"
+
+
+def run_sample_group(group: dict, reviewer_guidance: str, user_prompt: str,
+                     rate_limiters: dict, max_retries: int = 5, response_cache: ResponseCache = None,
+                     result_store: ResultStore = None, preprocessor: PdfPreprocessor = None,
+                     hedging: HedgingPolicy = None) -> list:
+    """
+    Run several attempts of one (provider, model, paper) with a single multi-sample request.
+
+    Attempts whose output exists or is cached are resolved first; the rest are
+    requested together with num_samples and each returned review is saved to its
+    own attempt. The request's usage, latency and number of samples are recorded on
+    the first requested attempt only, so metrics count the request once; every
+    stored review still carries the request's latency in its metadata.
+
+    Args:
+        group: Group job from group_sample_jobs, with the attempts' jobs as members
+        (other arguments as for run_review_job)
+
+    Returns:
+        List of (job, status) for every member
+    """
+    members = group["members"]
+    statuses = {}
+    pending = []
+    for job in members:
+        job["cache_key"] = None
+        if response_cache is None and output_exists(job, result_store):
+            log(f"{get_job_tag(job)}: Already exists, skipping.")
+            statuses[id(job)] = "skipped"
+        else:
+            pending.append(job)
+
+    try:
+        if pending:
+            document = load_job_document(pending[0], preprocessor)
+        if pending and response_cache is not None:
+            requested = []
+            for job in pending:
+                status = check_response_cache(job, document, reviewer_guidance, user_prompt, response_cache,
+                                              result_store)
+                if status is not None:
+                    statuses[id(job)] = status
+                else:
+                    requested.append(job)
+            pending = requested
+
+        if pending:
+            first = pending[0]
+            # Groups are only formed when not streaming
+            review_kwargs = dict(first["review_kwargs"])
+            review_kwargs.pop("stream", None)
+            review_texts = call_with_retries(
+                first, rate_limiters, max_retries,
+                lambda usage: first["function"](document, reviewer_guidance, user_prompt,
+                                                model_name=first["model_name"], usage=usage,
+                                                num_samples=len(pending), **review_kwargs),
+                hedging=hedging, num_samples=len(pending))
+            first["samples"] = len(pending)
+            # A provider may return fewer candidates than requested (e.g. when one is blocked)
+            for index, job in enumerate(pending):
+                if index >= len(review_texts):
+                    job["error"] = f"Only {len(review_texts)} of {len(pending)} samples returned"
+                    log(f"{get_job_tag(job)}: Error: {job['error']}")
+                    statuses[id(job)] = "error"
+                    continue
+                finish_review(job, review_texts[index], document, reviewer_guidance, response_cache,
+                              result_store, preprocessor,
+                              metadata={"num_samples": len(pending), "sample_index": index,
+                                        "latency": first["latency"]})
+                log(f"{get_job_tag(job)}: Done (sample {index + 1} of {len(pending)}).")
+                statuses[id(job)] = "done"
+
+    except CallTimeout as e:
+        for job in pending:
+            job["error"] = str(e)
+            job["timeouts"] += 1
+            log(f"{get_job_tag(job)}: {e}")
+            statuses[id(job)] = "timeout"
+
+    except Exception as e:
+        for job in pending:
+            job["error"] = str(e)
+            log(f"{get_job_tag(job)}: Error: {e}")
+            statuses[id(job)] = "error"
+
+    return [(job, statuses[id(job)]) for job in members]
+
+
+def group_sample_jobs(jobs: list, samples_per_request: dict) -> list:
+    """
+    Combine the attempts of each (provider, model, paper) into multi-sample requests.
+
+    Args:
+        jobs: Job dicts
+        samples_per_request: Mapping from api_name to the number of samples one request
+            may return; providers not in it get one request per attempt
+
+    Returns:
+        The units to run, in order of their first job: single jobs, and group jobs
+        whose "members" are the jobs of up to samples_per_request attempts
+    """
+    groups = {}
+    for job in jobs:
+        groups.setdefault((job["api_name"], job["model_name"], job["pdf_name"]), []).append(job)
+    
+    units = []
+    for (api_name, _, _), group_jobs in groups.items():
+        size = max(1, samples_per_request.get(api_name, 1))
+        for start in range(0, len(group_jobs), size):
+            chunk = group_jobs[start:start + size]
+            if len(chunk) == 1:
+                units.append(chunk[0])
+            else:
+                units.append({**{key: chunk[0][key] for key in ("api_name", "model_name", "pdf_name")},
+                              "members": chunk})
+    return units
+
+
+def run_jobs(jobs: list, reviewer_guidance: str, user_prompt: str, api_configs: list,
+             max_workers: int = 8, provider_concurrency: dict = None, review_kwargs: dict = None,
+             on_job_finished=None, rate_limiters: dict = None, max_retries: int = 5,
+             response_cache: ResponseCache = None, result_store: ResultStore = None,
+             metrics: MetricsRecorder = None, preprocessor: PdfPreprocessor = None,
+             sampler: AdaptiveSampler = None, samples_per_request: dict = None,
+             hedging: HedgingPolicy = None) -> list:
+    """
+    Run review jobs concurrently on a thread pool.
+
+    Args:
+        jobs: Job dicts from build_paper_jobs (or the job queue)
+        reviewer_guidance: System guidance for the reviewer
+        user_prompt: User prompt for the review
+        api_configs: Provider configs from get_api_configs
+        max_workers: Maximum number of concurrent API calls across all providers
+        provider_concurrency: Optional mapping from api_name to its maximum number of concurrent calls
+        review_kwargs: Extra keyword arguments for every review function call
+        on_job_finished: Optional callback (job, status) called as each job finishes
+        rate_limiters: Optional mapping from api_name to its ProviderRateLimiter, shared
+            across calls to run_jobs (default: built from provider_concurrency)
+        max_retries: Number of retries on rate-limit and transient errors (default: 5)
+        response_cache: Optional content-addressed ResponseCache shared by all jobs
+        result_store: Optional ResultStore that receives the reviews instead of output files
+        metrics: Optional MetricsRecorder that records every finished job
+        preprocessor: Optional PdfPreprocessor applied to every job's PDF
+        sampler: Optional AdaptiveSampler that releases each (model, paper)'s attempts
+            one by one until its score estimate converges
+        samples_per_request: Optional mapping from api_name to the number of attempts one
+            multi-sample request may cover (see group_sample_jobs); ignored when streaming
+        hedging: Optional HedgingPolicy shared by all jobs; jobs whose call hits its hard
+            timeout are requeued behind the jobs already submitted, up to max_requeues times
+
+    Returns:
+        The status of every job, in order; "converged" for attempts the sampler did not need
+    """
+    functions = {api_config["api_name"]: api_config["function"] for api_config in api_configs}
+    if rate_limiters is None:
+        rate_limiters = build_rate_limiters(functions, max_workers, provider_concurrency)
+    
+    # Create output directories
+    for api_config in api_configs:
+        os.makedirs(api_config["output_dir"], exist_ok=True)
+    
+    # Size the shared clients' connection pools to the run's concurrency
+    configure_client_pool(max_workers)
+    
+    for job in jobs:
+        job["function"] = functions[job["api_name"]]
+        job["review_kwargs"] = review_kwargs or {}
+        job["usage"] = {}
+        job["latency"] = None
+        job["samples"] = 1
+        job["error"] = None
+        job["retries"] = 0
+        job["timeouts"] = 0
+        job["hedged"] = False
+        job["preprocess"] = preprocessor.variant if preprocessor is not None else None
+    
+    # Streamed reviews are written one output file per request
+    if (review_kwargs or {}).get("stream"):
+        samples_per_request = None
+    
+    def run(unit):
+        if "members" in unit:
+            results = run_sample_group(unit, reviewer_guidance, user_prompt, rate_limiters, max_retries,
+                                       response_cache, result_store, preprocessor, hedging)
+        else:
+            results = [(unit, run_review_job(unit, reviewer_guidance, user_prompt, rate_limiters, max_retries,
+                                             response_cache, result_store, preprocessor, hedging))]
+        finished = []
+        for job, status in results:
+            if status == "timeout" and job["timeouts"] > hedging.max_requeues:
+                status = "error"
+            if metrics is not None:
+                metrics.record_call(job, status)
+            if status == "timeout":
+                log(f"{get_job_tag(job)}: Requeued ({job['timeouts']}/{hedging.max_requeues}).")
+            elif on_job_finished is not None:
+                on_job_finished(job, status)
+            finished.append((job, status))
+        return finished
+    
+    def units_of(jobs_to_run):
+        return group_sample_jobs(jobs_to_run, samples_per_request) if samples_per_request else jobs_to_run
+    
+    # Units wait here until their provider has a free slot, so pool threads never block on
+    # a capped provider while other providers' units are queued behind them
+    waiting = {api_name: deque() for api_name in functions}
+    in_flight = Counter()
+    
+    def submit_ready(executor, futures):
+        # Round-robin across providers; each gets at most its concurrency cap of threads
+        while len(futures) < max_workers:
+            submitted = False
+            for api_name, units in waiting.items():
+                if units and len(futures) < max_workers \
+                        and in_flight[api_name] < rate_limiters[api_name].concurrency.max_limit:
+                    futures[executor.submit(run, units.popleft())] = api_name
+                    in_flight[api_name] += 1
+                    submitted = True
+            if not submitted:
+                break
+    
+    # Run all jobs concurrently; each job isolates its own errors. Requeued jobs and
+    # the attempts the sampler releases are submitted from this thread only
+    statuses = {id(job): "converged" for job in jobs}
+    initial_jobs = sampler.initial_jobs(jobs) if sampler is not None else jobs
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for unit in units_of(initial_jobs):
+            waiting[unit["api_name"]].append(unit)
+        submit_ready(executor, futures)
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            next_jobs = []
+            for future in done:
+                in_flight[futures.pop(future)] -= 1
+                for job, status in future.result():
+                    statuses[id(job)] = status
+                    if status == "timeout":
+                        # The requeued attempt reports its own call only
+                        job["error"] = None
+                        job["latency"] = None
+                        job["samples"] = 1
+                        job["usage"] = {}
+                        job["hedged"] = False
+                        next_jobs.append(job)
+                    elif sampler is not None:
+                        next_jobs.extend(sampler.on_finished(job, status))
+            for unit in units_of(next_jobs):
+                waiting[unit["api_name"]].append(unit)
+            submit_ready(executor, futures)
+        return [statuses[id(job)] for job in jobs]
 
 
 def generate_reviews_for_paper(pdf_file_path: str, reviewer_guidance_path: str = "reviewer_guidance.txt", 
-                                total_tries: int = 10, output_base_dir: str = "output"):
+                                total_tries: int = 10, output_base_dir: str = "output",
+                                max_workers: int = 8, provider_concurrency: dict = None,
+                                use_file_upload: bool = False, cache_prompt: bool = False,
+                                requests_per_minute: dict = None, tokens_per_minute: dict = None,
+                                max_retries: int = 5, stream: bool = False, stop_when_scored: bool = False,
+                                response_cache_dir: str = None, response_cache_max_mb: int = 2048,
+                                providers: list = None, models: list = None, result_store_dir: str = None,
+                                metrics_path: str = None, preprocess_options: dict = None,
+                                adaptive_options: dict = None, samples_per_request: int = None,
+                                hedging_options: dict = None):
     """
     Generate reviews for a single paper using all three APIs (OpenAI, Claude, Gemini).
-    Each API is called 10 times.
+    Each model is called 10 times. Jobs run concurrently on a thread pool, with a global
+    cap (max_workers) and an optional per-provider cap (provider_concurrency).
     
     Args:
         pdf_file_path: Path to the PDF file to review
         reviewer_guidance_path: Path to the reviewer guidance text file
         total_tries: Number of times to call each API (default: 10)
         output_base_dir: Base directory for all outputs (default: "output")
+        max_workers: Maximum number of concurrent API calls across all providers (default: 8)
+        provider_concurrency: Optional mapping from api_name to its maximum number of
+            concurrent calls, e.g. {"openai": 4, "gemini": 2} (default: max_workers each)
+        use_file_upload: Upload the PDF once per provider to its files endpoint and reference
+            it by id, instead of inlining the encoded PDF in every request (default: False)
+        cache_prompt: Mark the guidance + PDF prefix as cacheable with each provider, so
+            repeated samples hit the provider-side prompt cache (default: False)
+        requests_per_minute: Optional mapping from api_name to its request-per-minute budget
+        tokens_per_minute: Optional mapping from api_name to its token-per-minute budget
+        max_retries: Retries per call on rate-limit and transient errors, with exponential
+            backoff honoring Retry-After (default: 5)
+        stream: Stream each response to its output file as it is generated, atomically
+            renamed on completion, and record time-to-first-token (default: False)
+        stop_when_scored: When streaming, cut each generation short once all score fields
+            have arrived, for score-only experiments (default: False)
+        response_cache_dir: Optional directory of a content-addressed response cache keyed
+            on PDF bytes, guidance, model, parameters and attempt; calls whose inputs are
+            unchanged are served from it, and outputs written from other inputs are regenerated
+        response_cache_max_mb: Size bound of the response cache in MB (default: 2048)
+        providers: Provider names to run, e.g. ["openai", "gemini"] (default: all); only
+            the selected providers' SDKs are imported
+        models: Models to run, e.g. ["gpt-5", "gemini-2.5-flash"] (default: all models of
+            the selected providers); unregistered models as "api_name:model_name"
+        result_store_dir: Optional directory of a sharded ResultStore that holds review texts,
+            scores and call metadata instead of one .txt file per review
+        metrics_path: Optional JSONL file receiving one metrics record per call; a
+            Prometheus text export is written next to it with a .prom extension
+        preprocess_options: Optional PdfPreprocessor options, e.g. {"max_image_px": 1024,
+            "drop_appendix": True}; the processed variants are cached under
+            "{output_base_dir}/preprocessed" and their sizes reported at the end
+        adaptive_options: Optional AdaptiveSampler options, e.g. {"min_tries": 3, "ci_width": 1.0};
+            each model then stops sampling once the confidence interval of its mean Rating
+            is narrower than ci_width, with total_tries as the maximum
+        samples_per_request: Maximum number of attempts generated by one multi-sample request
+            for providers that support it, e.g. Gemini's candidate_count (default: the
+            provider's maximum; 1 sends one request per attempt)
+        hedging_options: Optional HedgingPolicy options, e.g. {"quantile": 0.95, "timeout": 600};
+            calls slower than their model's latency budget get a duplicate request, and
+            jobs whose call hits the hard timeout are requeued
     """
     # Read reviewer guidance from file
     with open(reviewer_guidance_path, "r") as f:
@@ -23,96 +675,609 @@ def generate_reviews_for_paper(pdf_file_path: str, reviewer_guidance_path: str =
     
     user_prompt = "Please provide a detailed review of this paper following the guidance above."
     
-    # Extract PDF name without extension
-    pdf_name = os.path.basename(pdf_file_path).rstrip(".pdf")
-    
-    # Define models for each API
-    api_configs = [
-        {
-            "api_name": "openai",
-            "models": ["gpt-5", "gpt-5-mini"],
-            "function": review_paper_openai,
-            "output_dir": os.path.join(output_base_dir, "output_openai")
-        },
-        {
-            "api_name": "claude",
-            "models": ["claude-sonnet-4-5", "claude-haiku-4-5"],
-            "function": review_paper_claude,
-            "output_dir": os.path.join(output_base_dir, "output_claude")
-        },
-        {
-            "api_name": "gemini",
-            "models": ["gemini-2.5-flash", "gemini-2.5-flash-lite"],
-            "function": review_paper_gemini,
-            "output_dir": os.path.join(output_base_dir, "output_gemini")
-        }
-    ]
-    
-    # Process each API
-    for api_config in api_configs:
-        api_name = api_config["api_name"]
-        models = api_config["models"]
-        review_function = api_config["function"]
-        output_dir = api_config["output_dir"]
+    api_configs = get_api_configs(output_base_dir, providers, models)
+    preprocessor = build_preprocessor(output_base_dir, preprocess_options)
+    jobs = build_paper_jobs(pdf_file_path, total_tries, api_configs,
+                            preprocessor.variant if preprocessor is not None else None)
+    review_kwargs = {"use_file_upload": use_file_upload, "cache_prompt": cache_prompt,
+                     "stream": stream, "stop_when_scored": stop_when_scored}
+    
+    print(f"\n{'='*60}")
+    print(f"Running {len(jobs)} jobs with up to {max_workers} concurrent calls")
+    print(f"{'='*60}")
+    
+    rate_limiters = build_rate_limiters([api_config["api_name"] for api_config in api_configs], max_workers,
+                                        provider_concurrency, requests_per_minute, tokens_per_minute)
+    response_cache = ResponseCache(response_cache_dir, response_cache_max_mb * 1024 ** 2) if response_cache_dir else None
+    result_store = ResultStore(result_store_dir) if result_store_dir else None
+    sampler = AdaptiveSampler(total_tries, result_store=result_store, **adaptive_options) if adaptive_options else None
+    hedging = build_hedging_policy(hedging_options, review_kwargs)
+    metrics = MetricsRecorder(metrics_path)
+    try:
+        statuses = run_jobs(jobs, reviewer_guidance, user_prompt, api_configs, max_workers=max_workers,
+                            review_kwargs=review_kwargs, rate_limiters=rate_limiters, max_retries=max_retries,
+                            response_cache=response_cache, result_store=result_store, metrics=metrics,
+                            preprocessor=preprocessor, sampler=sampler, hedging=hedging,
+                            samples_per_request=get_samples_per_request(api_configs, samples_per_request))
+    finally:
+        # Provider-side resources of the run, e.g. Gemini context caches
+        cleanup_providers()
+        if response_cache is not None:
+            response_cache.close()
+    if result_store is not None:
+        result_store.close()
+    
+    status_counts = Counter(statuses)
+    
+    print_usage_summary(jobs)
+    finish_metrics(metrics)
+    if preprocessor is not None:
+        preprocessor.print_report()
+    if sampler is not None:
+        sampler.print_summary()
+    if hedging is not None:
+        hedging.print_summary()
+    
+    print(f"\n{'='*60}")
+    print(f"All reviews generated: {status_counts['done']} done, {status_counts['cached']} from cache, "
+          f"{status_counts['skipped']} skipped, {status_counts['error']} failed"
+          + (f", {status_counts['converged']} not needed" if sampler is not None else ""))
+    print(f"{'='*60}\n")
+
+
+def list_corpus_pdfs(corpus_path: str) -> list:
+    """
+    List the PDFs of a corpus.
+    
+    Args:
+        corpus_path: Directory of PDF files, or a manifest text file with one PDF path
+            per line (relative paths are resolved against the manifest's directory)
+    
+    Returns:
+        Sorted list of PDF paths
+    """
+    if os.path.isdir(corpus_path):
+        return sorted(os.path.join(corpus_path, f) for f in os.listdir(corpus_path) if f.endswith(".pdf"))
+    
+    manifest_dir = os.path.dirname(corpus_path)
+    pdf_paths = []
+    with open(corpus_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                pdf_paths.append(os.path.join(manifest_dir, line))
+    return pdf_paths
+
+
+def generate_reviews_for_corpus(corpus_path: str, reviewer_guidance_path: str = "reviewer_guidance.txt",
+                                total_tries: int = 10, output_base_dir: str = "output",
+                                max_workers: int = 8, provider_concurrency: dict = None,
+                                use_file_upload: bool = False, cache_prompt: bool = False,
+                                queue_path: str = None, retry_failed: bool = False,
+                                requests_per_minute: dict = None, tokens_per_minute: dict = None,
+                                max_retries: int = 5, stream: bool = False, stop_when_scored: bool = False,
+                                response_cache_dir: str = None, response_cache_max_mb: int = 2048,
+                                providers: list = None, models: list = None, result_store_dir: str = None,
+                                metrics_path: str = None, preprocess_options: dict = None,
+                                adaptive_options: dict = None, samples_per_request: int = None,
+                                worker_id: str = None, lease_seconds: float = 600,
+                                hedging_options: dict = None):
+    """
+    Generate reviews for every paper of a corpus through a persistent job queue.
+    
+    The corpus is expanded into a SQLite table of (paper, model, attempt) jobs. Jobs
+    are claimed in batches and marked done or failed as they finish, so an interrupted
+    run resumes exactly where it stopped on the next invocation.
+    
+    With a worker_id, the run is one of several workers, on one host or on several
+    hosts sharing the output directory, that work through the same table. Jobs are
+    claimed under leases renewed by a heartbeat; the jobs of a worker that dies are
+    taken over by the others once their leases expire. Each worker is assigned a slot
+    that picks its API key from the providers' key pools (see get_api_key_pool).
+    
+    Args:
+        corpus_path: Directory of PDFs or manifest file (see list_corpus_pdfs)
+        reviewer_guidance_path: Path to the reviewer guidance text file
+        total_tries: Number of times to call each model per paper (default: 10)
+        output_base_dir: Base directory for all outputs (default: "output")
+        max_workers: Maximum number of concurrent API calls across all providers (default: 8)
+        provider_concurrency: Optional mapping from api_name to its maximum number of concurrent calls
+        use_file_upload: Upload each PDF once per provider to its files endpoint (default: False)
+        cache_prompt: Enable provider-side prompt caching (default: False)
+        queue_path: Path to the SQLite job table (default: "{output_base_dir}/jobs.sqlite")
+        retry_failed: Put failed jobs back to pending before running (default: False)
+        requests_per_minute: Optional mapping from api_name to its request-per-minute budget
+        tokens_per_minute: Optional mapping from api_name to its token-per-minute budget
+        max_retries: Retries per call on rate-limit and transient errors (default: 5)
+        stream: Stream each response to its output file as it is generated (default: False)
+        stop_when_scored: When streaming, stop once all score fields have arrived (default: False)
+        response_cache_dir: Optional directory of a content-addressed response cache
+        response_cache_max_mb: Size bound of the response cache in MB (default: 2048)
+        providers: Provider names to run (default: all)
+        models: Models to run (default: all models of the selected providers); pending
+            jobs of other models stay in the queue for a later run
+        result_store_dir: Optional directory of a sharded ResultStore used instead of .txt files
+        metrics_path: Optional JSONL file of per-call metrics (plus a .prom export next to it)
+        preprocess_options: Optional PdfPreprocessor options applied to every PDF
+        adaptive_options: Optional AdaptiveSampler options; attempts a (model, paper) does
+            not need are marked "converged" in the queue
+        samples_per_request: Maximum number of attempts per multi-sample request where the
+            provider supports it (default: the provider's maximum; 1 disables)
+        hedging_options: Optional HedgingPolicy options, as for generate_reviews_for_paper
+        worker_id: Optional unique name of this worker, e.g. "host-pid", to run as one of
+            several workers sharing the queue; not combinable with result_store_dir
+        lease_seconds: Lease on the jobs a worker claims, renewed every third of it while
+            the worker is alive (default: 600)
+    """
+    if worker_id is not None and result_store_dir:
+        raise ValueError("The result store has a single writer; run workers with .txt outputs")
+    
+    with open(reviewer_guidance_path, "r") as f:
+        reviewer_guidance = f.read()
+    
+    user_prompt = "Please provide a detailed review of this paper following the guidance above."
+    
+    api_configs = get_api_configs(output_base_dir, providers, models)
+    selected_models = [model_name for api_config in api_configs for model_name in api_config["models"]]
+    review_kwargs = {"use_file_upload": use_file_upload, "cache_prompt": cache_prompt,
+                     "stream": stream, "stop_when_scored": stop_when_scored}
+    
+    os.makedirs(output_base_dir, exist_ok=True)
+    # WAL only works within one host, so workers use the rollback journal
+    queue = JobQueue(queue_path or os.path.join(output_base_dir, "jobs.sqlite"), wal=worker_id is None)
+    
+    result_store = ResultStore(result_store_dir) if result_store_dir else None
+    
+    # Outputs written before the queue existed count as done; one listdir per directory
+    # (or one index scan of the result store)
+    existing_outputs = set()
+    stored_keys = result_store.keys() if result_store is not None else None
+    if stored_keys is None:
+        for api_config in api_configs:
+            output_dir = api_config["output_dir"]
+            if os.path.isdir(output_dir):
+                existing_outputs.update(os.path.join(output_dir, f) for f in os.listdir(output_dir))
+    
+    pdf_paths = list_corpus_pdfs(corpus_path)
+    preprocessor = build_preprocessor(output_base_dir, preprocess_options)
+    variant = preprocessor.variant if preprocessor is not None else None
+    new_jobs = 0
+    for pdf_file_path in pdf_paths:
+        paper_jobs = build_paper_jobs(pdf_file_path, total_tries, api_configs, variant)
+        if stored_keys is not None:
+            existing_outputs = {job["output_file_path"] for job in paper_jobs
+                                if (job["model_name"], job["pdf_name"], job["attempt"]) in stored_keys}
+        new_jobs += queue.add_jobs(paper_jobs, existing_outputs)
+    
+    if worker_id is None:
+        # Jobs left running by an interrupted run go back to pending, as do attempts an earlier
+        # adaptive run did not need; the sampler skips them again if their estimate still holds
+        reset_jobs = queue.reset_running(include_failed=retry_failed, include_converged=True)
+    else:
+        # Running jobs may belong to live workers; those of dead workers are reclaimed
+        # through their expired leases instead
+        reset_jobs = 0
+        slot = queue.register_worker(worker_id, lease_seconds)
+        assign_worker_api_keys(api_configs, slot)
+        stop_heartbeat = threading.Event()
         
-        # Create output directory
-        os.makedirs(output_dir, exist_ok=True)
+        def heartbeat():
+            while not stop_heartbeat.wait(lease_seconds / 3):
+                queue.heartbeat(worker_id, lease_seconds)
         
-        print(f"\n{'='*60}")
-        print(f"Processing {api_name.upper()} API")
-        print(f"{'='*60}")
+        threading.Thread(target=heartbeat, daemon=True).start()
+    
+    print(f"\n{'='*60}")
+    print(f"Corpus: {len(pdf_paths)} papers, {new_jobs} new jobs, {reset_jobs} resumed")
+    if worker_id is not None:
+        print(f"Worker {worker_id} (slot {slot}), lease {lease_seconds:.0f}s")
+    print(f"Job status: {queue.status_counts()}")
+    print(f"{'='*60}")
+    
+    def on_job_finished(job, status):
+        if not queue.mark(job["id"], "failed" if status == "error" else "done", job["error"], worker_id):
+            log(f"{get_job_tag(job)}: Lease lost to another worker, result not recorded in the queue.")
+    
+    # One set of limiters for the whole corpus, so budgets carry over between batches
+    rate_limiters = build_rate_limiters([api_config["api_name"] for api_config in api_configs], max_workers,
+                                        provider_concurrency, requests_per_minute, tokens_per_minute)
+    
+    response_cache = ResponseCache(response_cache_dir, response_cache_max_mb * 1024 ** 2) if response_cache_dir else None
+    sampler = AdaptiveSampler(total_tries, result_store=result_store, **adaptive_options) if adaptive_options else None
+    hedging = build_hedging_policy(hedging_options, review_kwargs)
+    metrics = MetricsRecorder(metrics_path)
+    
+    all_jobs = []
+    try:
+        while True:
+            # Adaptive sampling runs few attempts per (model, paper) at a time, so claim
+            # whole papers' worth of jobs to keep enough groups in flight
+            claim_size = max_workers * 4 * (total_tries if sampler is not None else 1)
+            jobs = queue.claim_jobs(claim_size, model_names=selected_models, worker_id=worker_id,
+                                    lease_seconds=lease_seconds if worker_id is not None else None)
+            if not jobs:
+                if worker_id is None or not queue.count_leased(selected_models):
+                    break
+                # Other workers are still running jobs; stay to take over those whose lease expires
+                time.sleep(min(lease_seconds / 3, 30))
+                continue
+            statuses = run_jobs(jobs, reviewer_guidance, user_prompt, api_configs, max_workers=max_workers,
+                                review_kwargs=review_kwargs, on_job_finished=on_job_finished,
+                                rate_limiters=rate_limiters, max_retries=max_retries, response_cache=response_cache,
+                                result_store=result_store, metrics=metrics, preprocessor=preprocessor,
+                                sampler=sampler, hedging=hedging,
+                                samples_per_request=get_samples_per_request(api_configs, samples_per_request))
+            for job, status in zip(jobs, statuses):
+                if status == "converged":
+                    queue.mark(job["id"], "converged", worker_id=worker_id)
+            # Keep only what the usage summary needs
+            all_jobs.extend({"model_name": job["model_name"], "usage": job["usage"]} for job in jobs)
+    finally:
+        if worker_id is not None:
+            # Hand unfinished jobs back right away instead of waiting for their leases
+            stop_heartbeat.set()
+            queue.release_jobs(worker_id)
+            queue.unregister_worker(worker_id)
+        # Provider-side resources of the run, e.g. Gemini context caches
+        cleanup_providers()
+        if response_cache is not None:
+            response_cache.close()
+    
+    print_usage_summary(all_jobs)
+    finish_metrics(metrics)
+    if preprocessor is not None:
+        preprocessor.print_report()
+    if sampler is not None:
+        sampler.print_summary()
+    if hedging is not None:
+        hedging.print_summary()
+    
+    print(f"\n{'='*60}")
+    print(f"Corpus finished. Job status: {queue.status_counts()}")
+    print(f"{'='*60}\n")
+    queue.close()
+    if result_store is not None:
+        result_store.close()
+
+
+def generate_reviews_batch(pdf_paths: list, stage: str, reviewer_guidance_path: str = "reviewer_guidance.txt",
+                           total_tries: int = 10, output_base_dir: str = "output", batch_dir: str = None,
+                           poll_interval: float = 60, providers: list = None, models: list = None,
+                           preprocess_options: dict = None):
+    """
+    Generate reviews through the providers' offline batch APIs.
+    
+    Stages: "build" writes batch request files from the same prompts the review_paper_*
+    functions send, "submit" submits them, "collect" polls and writes finished results
+    into the usual output layout, and "all" runs the three stages in order.
+    
+    Args:
+        pdf_paths: PDF files to review
+        stage: One of "build", "submit", "collect" or "all"
+        reviewer_guidance_path: Path to the reviewer guidance text file
+        total_tries: Number of reviews per model and paper (default: 10)
+        output_base_dir: Base directory for all outputs (default: "output")
+        batch_dir: Directory for batch files and state (default: "{output_base_dir}/batches")
+        poll_interval: Seconds between status polls in the collect stage (default: 60)
+        providers: Provider names to build batches for (default: all)
+        models: Models to build batches for (default: all models of the selected providers)
+        preprocess_options: Optional PdfPreprocessor options applied to every PDF in the
+            build stage
+    """
+    batch_dir = batch_dir or os.path.join(output_base_dir, "batches")
+    
+    if stage in ("build", "all"):
+        with open(reviewer_guidance_path, "r") as f:
+            reviewer_guidance = f.read()
         
-        # Process each model
-        for model_name in models:
-            print(f"\n[{api_name.upper()}] Using model: {model_name}")
-            
-            # Generate reviews (10 times per model)
-            for attempt in range(total_tries):
-                try:
-                    print(f"  Attempt {attempt + 1}/{total_tries}...", end=" ")
-                    
-                    output_file_path = os.path.join(output_dir, f"{model_name}_{pdf_name}_{attempt}.txt")
-                    
-                    # Skip if file already exists
-                    if os.path.exists(output_file_path):
-                        print("Already exists, skipping.")
-                        continue
-                    
-                    # Call the review function
-                    review_text = review_function(pdf_file_path, reviewer_guidance, user_prompt, model_name=model_name)
-                    
-                    # Save to text file
-                    with open(output_file_path, "w") as f:
-                        f.write(review_text)
-                    
-                    print("Done.")
-                    
-                except Exception as e:
-                    print(f"Error: {e}")
-                    continue
+        user_prompt = "Please provide a detailed review of this paper following the guidance above."
         
-        print(f"\n[{api_name.upper()}] Completed!")
+        api_configs = get_api_configs(output_base_dir, providers, models)
+        preprocessor = build_preprocessor(output_base_dir, preprocess_options)
+        variant = preprocessor.variant if preprocessor is not None else None
+        jobs = []
+        for pdf_file_path in pdf_paths:
+            jobs.extend(build_paper_jobs(pdf_file_path, total_tries, api_configs, variant))
+        
+        # Batch requests embed the processed variant, which the output names record
+        if preprocessor is not None:
+            for job in jobs:
+                job["pdf_file_path"] = preprocessor.process(job["pdf_file_path"])
+        build_batches(jobs, reviewer_guidance, user_prompt, batch_dir)
+        if preprocessor is not None:
+            preprocessor.print_report()
+    
+    if stage in ("submit", "all"):
+        submit_batches(batch_dir)
+    
+    if stage in ("collect", "all"):
+        collect_batches(batch_dir, poll_interval=poll_interval)
+
+
+def get_samples_per_request(api_configs: list, samples_per_request: int = None) -> dict:
+    """
+    Get the number of attempts one request may cover for each provider that supports multi-sample requests.
+
+    Args:
+        api_configs: Provider configs from get_api_configs
+        samples_per_request: Optional cap below the providers' maximum
+
+    Returns:
+        Mapping from api_name to its samples per request, for providers above one
+    """
+    limits = {}
+    for api_config in api_configs:
+        limit = api_config["max_samples_per_request"]
+        if samples_per_request:
+            limit = min(limit, samples_per_request)
+        if limit > 1:
+            limits[api_config["api_name"]] = limit
+    return limits
+
+
+def assign_worker_api_keys(api_configs: list, slot: int):
+    """
+    Give a worker the API key of its slot from each selected provider's key pool.
+
+    Worker slot i uses key i modulo the pool size; providers without a pool keep the
+    SDK's environment variable.
+    """
+    for api_config in api_configs:
+        api_name = api_config["api_name"]
+        pool = get_api_key_pool(api_name)
+        if pool:
+            set_api_key(api_name, pool[slot % len(pool)])
+            print(f"[{api_name.upper()}] Using API key {slot % len(pool) + 1} of {len(pool)}")
+
+
+def get_default_worker_id() -> str:
+    """
+    Get a worker name that is unique across hosts: "{hostname}-{pid}".
+    """
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def build_hedging_policy(hedging_options: dict, review_kwargs: dict):
+    """
+    Build the HedgingPolicy of a run, or None without hedging options.
+
+    The hard timeout is also passed to the review functions as their per-request SDK
+    timeout, which ends abandoned attempts.
+    """
+    if not hedging_options:
+        return None
+    hedging = HedgingPolicy(**hedging_options)
+    if hedging.timeout:
+        review_kwargs["timeout"] = hedging.timeout
+    return hedging
+
+
+def build_preprocessor(output_base_dir: str, preprocess_options: dict = None):
+    """
+    Create the run's PdfPreprocessor, caching under "{output_base_dir}/preprocessed",
+    or None when no preprocessing options are given.
+    """
+    if not preprocess_options:
+        return None
+    return PdfPreprocessor(os.path.join(output_base_dir, "preprocessed"), **preprocess_options)
+
+
+def print_usage_summary(jobs: list):
+    """
+    Print input, cached and output token totals per model for the jobs that ran,
+    and the mean time-to-first-token of streamed calls.
+    """
+    totals = defaultdict(Counter)
+    streamed_calls = Counter()
+    for job in jobs:
+        # Streams that produced no text have a time-to-first-token of None
+        usage = {key: value for key, value in job["usage"].items() if value is not None}
+        if "time_to_first_token" in usage:
+            streamed_calls[job["model_name"]] += 1
+        if usage:
+            totals[job["model_name"]].update(usage)
+    
+    if not totals:
+        return
     
     print(f"\n{'='*60}")
-    print("All reviews generated successfully!")
-    print(f"{'='*60}\n")
+    print("TOKEN USAGE")
+    print(f"{'='*60}")
+    for model_name, usage in totals.items():
+        cache_hit_rate = usage["cached_tokens"] / usage["input_tokens"] if usage["input_tokens"] else 0.0
+        line = (f"  {model_name}: input={usage['input_tokens']}, cached={usage['cached_tokens']} "
+                f"({cache_hit_rate:.1%}), output={usage['output_tokens']}")
+        if streamed_calls[model_name]:
+            line += f", mean TTFT={usage['time_to_first_token'] / streamed_calls[model_name]:.2f}s"
+        print(line)
+
+
+def finish_metrics(metrics: MetricsRecorder):
+    """
+    Print the run's call metrics summary, write the Prometheus export next to the
+    metrics file if there is one, and close the recorder.
+    """
+    metrics.print_summary()
+    if metrics.metrics_path:
+        prometheus_path = os.path.splitext(metrics.metrics_path)[0] + ".prom"
+        metrics.write_prometheus(prometheus_path)
+        print(f"Metrics written to {metrics.metrics_path} and {prometheus_path}")
+    metrics.close()
+
+
+def parse_provider_limits(value: str) -> dict:
+    """
+    Parse a per-provider limit spec such as "openai=4,claude=2,gemini=4".
+    """
+    provider_limits = {}
+    if not value:
+        return provider_limits
+    for item in value.split(","):
+        api_name, limit = item.split("=")
+        provider_limits[api_name.strip()] = int(limit)
+    return provider_limits
+
+
+def parse_name_list(value: str) -> list:
+    """
+    Parse a comma-separated list such as "openai,gemini"; empty means no selection.
+    """
+    return [name.strip() for name in value.split(",") if name.strip()] or None
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate reviews for a paper using multiple AI models")
     parser.add_argument("--pdf_path", type=str, help="Path to the PDF file")
+    parser.add_argument("--corpus", type=str,
+                        help="Directory of PDFs or manifest file with one PDF path per line (corpus mode)")
+    parser.add_argument("--queue_path", type=str, default=None,
+                        help="SQLite job table for corpus mode (default: <output>/jobs.sqlite)")
+    parser.add_argument("--retry_failed", action="store_true",
+                        help="In corpus mode, retry jobs that failed in previous runs")
+    parser.add_argument("--worker", action="store_true",
+                        help="In corpus mode, run as one of several workers (processes or hosts) sharing the job "
+                             "queue through expiring leases")
+    parser.add_argument("--worker_id", type=str, default=None,
+                        help="With --worker, unique worker name (default: <hostname>-<pid>)")
+    parser.add_argument("--lease_seconds", type=float, default=600,
+                        help="With --worker, lease on claimed jobs, renewed while the worker is alive (default: 600)")
+    parser.add_argument("--batch_stage", type=str, choices=["build", "submit", "collect", "all"], default=None,
+                        help="Use the providers' offline batch APIs instead of synchronous calls")
+    parser.add_argument("--batch_dir", type=str, default=None,
+                        help="Directory for batch request files and state (default: <output>/batches)")
+    parser.add_argument("--poll_interval", type=float, default=60,
+                        help="Seconds between batch status polls (default: 60)")
     parser.add_argument("--guidance", type=str, default="reviewer_guidance.txt", 
                         help="Path to reviewer guidance file (default: reviewer_guidance.txt)")
+    parser.add_argument("--providers", type=str, default="",
+                        help="Comma-separated providers to run, e.g. openai,gemini (default: all)")
+    parser.add_argument("--models", type=str, default="",
+                        help="Comma-separated models to run, e.g. gpt-5,gemini-2.5-flash; "
+                             "unregistered models as provider:model (default: all models of the selected providers)")
     parser.add_argument("--tries", type=int, default=10, 
                         help="Number of times to call each model (default: 10)")
     parser.add_argument("--output", type=str, default="output", 
                         help="Base output directory (default: output)")
+    parser.add_argument("--max_workers", type=int, default=8,
+                        help="Maximum number of concurrent API calls (default: 8)")
+    parser.add_argument("--provider_concurrency", type=str, default="",
+                        help="Per-provider concurrency caps, e.g. openai=4,claude=2,gemini=4 (default: max_workers)")
+    parser.add_argument("--rpm", type=str, default="",
+                        help="Per-provider request-per-minute budgets, e.g. openai=500,claude=50")
+    parser.add_argument("--tpm", type=str, default="",
+                        help="Per-provider token-per-minute budgets, e.g. openai=800000,claude=80000")
+    parser.add_argument("--max_retries", type=int, default=5,
+                        help="Retries per call on rate-limit and transient errors (default: 5)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream responses to disk incrementally and record time-to-first-token")
+    parser.add_argument("--stop_when_scored", action="store_true",
+                        help="With --stream, stop each generation once all score fields have arrived")
+    parser.add_argument("--response_cache", type=str, default=None,
+                        help="Directory of a content-addressed response cache (default: disabled)")
+    parser.add_argument("--response_cache_max_mb", type=int, default=2048,
+                        help="Size bound of the response cache in MB (default: 2048)")
+    parser.add_argument("--result_store", type=str, default=None,
+                        help="Directory of a sharded result store holding reviews, scores and call metadata "
+                             "instead of one .txt file per review (default: disabled)")
+    parser.add_argument("--metrics", type=str, default=None,
+                        help="JSONL file of per-call metrics; a Prometheus text export is written next to it "
+                             "as .prom (default: summary only)")
+    parser.add_argument("--upload_files", action="store_true",
+                        help="Upload the PDF once to each provider's files endpoint instead of inlining it")
+    parser.add_argument("--cache_prompt", action="store_true",
+                        help="Enable provider-side prompt caching of the guidance + PDF prefix")
+    parser.add_argument("--samples_per_request", type=int, default=None,
+                        help="Maximum attempts generated by one multi-sample request where the provider supports "
+                             "it, e.g. Gemini candidate_count; 1 disables (default: the provider's maximum)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Stop sampling a model on a paper once the confidence interval of its mean Rating "
+                             "is narrower than --ci_width; --tries becomes the maximum")
+    parser.add_argument("--min_tries", type=int, default=3,
+                        help="With --adaptive, attempts per model and paper before stopping is considered (default: 3)")
+    parser.add_argument("--ci_width", type=float, default=1.0,
+                        help="With --adaptive, width of the Rating confidence interval to stop at (default: 1.0)")
+    parser.add_argument("--confidence", type=float, default=0.95,
+                        help="With --adaptive, confidence level of the Rating interval (default: 0.95)")
+    parser.add_argument("--hedge", action="store_true",
+                        help="Send a duplicate request when a call runs longer than its model's latency budget "
+                             "and keep whichever finishes first")
+    parser.add_argument("--hedge_quantile", type=float, default=0.95,
+                        help="With --hedge, latency quantile of recent calls used as each model's budget "
+                             "(default: 0.95)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Hard timeout in seconds per call; timed-out jobs are requeued (default: none)")
+    parser.add_argument("--max_requeues", type=int, default=2,
+                        help="With --timeout, times a timed-out job is requeued before it fails (default: 2)")
+    parser.add_argument("--max_image_px", type=int, default=None,
+                        help="Preprocess PDFs by down-sampling embedded images to this many pixels on the "
+                             "long side (default: keep)")
+    parser.add_argument("--image_quality", type=int, default=75,
+                        help="JPEG quality of down-sampled images (default: 75)")
+    parser.add_argument("--max_pages", type=int, default=None,
+                        help="Preprocess PDFs by keeping at most this many pages (default: all)")
+    parser.add_argument("--drop_appendix", action="store_true",
+                        help="Preprocess PDFs by dropping the pages from the appendix on")
+    parser.add_argument("--extract_text", action="store_true",
+                        help="Send the PDFs' extracted text instead of the PDFs")
     
     args = parser.parse_args()
     
-    # Check if PDF file exists
-    if not os.path.exists(args.pdf_path):
-        print(f"Error: PDF file not found: {args.pdf_path}")
+    preprocess_options = {key: value for key, value in dict(
+        max_image_px=args.max_image_px,
+        max_pages=args.max_pages,
+        drop_appendix=args.drop_appendix,
+        extract_text=args.extract_text,
+    ).items() if value}
+    if args.max_image_px:
+        preprocess_options["image_quality"] = args.image_quality
+    
+    selection_kwargs = dict(
+        providers=parse_name_list(args.providers),
+        models=parse_name_list(args.models),
+        preprocess_options=preprocess_options or None,
+    )
+    common_kwargs = dict(
+        **selection_kwargs,
+        max_workers=args.max_workers,
+        provider_concurrency=parse_provider_limits(args.provider_concurrency),
+        requests_per_minute=parse_provider_limits(args.rpm),
+        tokens_per_minute=parse_provider_limits(args.tpm),
+        max_retries=args.max_retries,
+        stream=args.stream,
+        stop_when_scored=args.stop_when_scored,
+        response_cache_dir=args.response_cache,
+        response_cache_max_mb=args.response_cache_max_mb,
+        result_store_dir=args.result_store,
+        metrics_path=args.metrics,
+        adaptive_options=dict(min_tries=args.min_tries, ci_width=args.ci_width,
+                              confidence=args.confidence) if args.adaptive else None,
+        use_file_upload=args.upload_files,
+        cache_prompt=args.cache_prompt,
+        samples_per_request=args.samples_per_request,
+        hedging_options=dict(hedge=args.hedge, quantile=args.hedge_quantile, timeout=args.timeout,
+                             max_requeues=args.max_requeues) if args.hedge or args.timeout else None,
+    )
+    
+    input_path = args.pdf_path or args.corpus
+    if args.pdf_path and args.corpus:
+        print("Error: Provide only one of --pdf_path or --corpus")
+        exit(1)
+    if args.worker and not args.corpus:
+        print("Error: --worker requires --corpus")
+        exit(1)
+    
+    # The submit and collect batch stages only need the batch state
+    if args.batch_stage in ("submit", "collect"):
+        generate_reviews_batch([], args.batch_stage, args.guidance, args.tries, args.output,
+                               batch_dir=args.batch_dir, poll_interval=args.poll_interval)
+        exit(0)
+    
+    # Check if PDF file or corpus exists
+    if not input_path:
+        print("Error: Provide one of --pdf_path or --corpus")
+        exit(1)
+    if not os.path.exists(input_path):
+        print(f"Error: {'PDF file' if args.pdf_path else 'Corpus'} not found: {input_path}")
         exit(1)
     
     # Check if guidance file exists
@@ -120,15 +1285,23 @@ if __name__ == "__main__":
         print(f"Error: Reviewer guidance file not found: {args.guidance}")
         exit(1)
     
-    print(f"Starting review generation for: {args.pdf_path}")
+    print(f"Starting review generation for: {input_path}")
     print(f"Reviewer guidance: {args.guidance}")
     print(f"Attempts per model: {args.tries}")
     print(f"Output directory: {args.output}")
+    print(f"Max concurrent calls: {args.max_workers}")
     
-    generate_reviews_for_paper(args.pdf_path, args.guidance, args.tries, args.output)
-
-
-
-
-
-
+    if args.batch_stage:
+        pdf_paths = list_corpus_pdfs(args.corpus) if args.corpus else [args.pdf_path]
+        generate_reviews_batch(pdf_paths, args.batch_stage, args.guidance, args.tries, args.output,
+                               batch_dir=args.batch_dir, poll_interval=args.poll_interval, **selection_kwargs)
+    elif args.corpus:
+        worker_kwargs = {}
+        if args.worker:
+            worker_kwargs = dict(worker_id=args.worker_id or get_default_worker_id(),
+                                 lease_seconds=args.lease_seconds)
+        generate_reviews_for_corpus(args.corpus, args.guidance, args.tries, args.output,
+                                    queue_path=args.queue_path, retry_failed=args.retry_failed,
+                                    **common_kwargs, **worker_kwargs)
+    else:
+        generate_reviews_for_paper(args.pdf_path, args.guidance, args.tries, args.output, **common_kwargs)
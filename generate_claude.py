@@ -1,7 +1,8 @@
 
-import anthropic
-import base64
 import os
+from clients import get_client
+from documents import PreparedDocument, add_bytes_uploaded, prepare_document
+from streaming import StreamingReviewWriter
 
 # initi client
 
@@ -13,43 +14,86 @@ import os
 #     print(model_data)
 # breakpoint()
 
-def review_paper_claude(pdf_file_path: str, reviewer_guidance: str, user_prompt: str, model_name: str = "claude-sonnet-4-5") -> str:
+# Beta flag required to reference uploaded files in messages
+FILES_API_BETA = "files-api-2025-04-14"
+
+
+def upload_pdf_claude(client, document: PreparedDocument) -> str:
     """
-    Review a PDF paper using Claude API with base64 encoding.
+    Upload a PDF to the Anthropic files endpoint and return its file id.
+    """
+    uploaded = client.beta.files.upload(
+        file=(document.filename, document.data, document.mime_type),
+    )
+    return uploaded.id
+
+
+def extract_usage_claude(message) -> dict:
+    """
+    Extract token usage from a Claude message, including prompt cache reads and writes.
+    """
+    usage = message.usage
+    cached_tokens = getattr(usage, "cache_read_input_tokens", None) or 0
+    cache_write_tokens = getattr(usage, "cache_creation_input_tokens", None) or 0
+    return {
+        # Claude reports cache reads and writes separately from input_tokens;
+        # count them in, to match OpenAI and Gemini where input includes cached tokens
+        "input_tokens": usage.input_tokens + cached_tokens + cache_write_tokens,
+        "output_tokens": usage.output_tokens,
+        "cached_tokens": cached_tokens,
+        "cache_write_tokens": cache_write_tokens,
+    }
+
+
+def build_review_request_claude(document: PreparedDocument, reviewer_guidance: str, user_prompt: str,
+                                model_name: str, source: dict = None, cache_prompt: bool = False) -> dict:
+    """
+    Build the Messages API request parameters for a review.
+    
+    The same parameters are sent by review_paper_claude and written to batch request files.
     
     Args:
-        pdf_file_path: Path to the PDF file to review
+        document: Prepared PDF to review
         reviewer_guidance: System guidance for the reviewer
         user_prompt: User prompt for the review
-        model_name: Claude model to use (default: "claude-sonnet-4-5")
+        model_name: Claude model to use
+        source: Optional document source; defaults to the inlined base64 PDF, or the
+            plain text of a text document
+        cache_prompt: Mark the guidance + PDF prefix with cache_control
     
     Returns:
-        The review text from the model
+        Keyword arguments for client.messages.create
     """
+    if source is None and document.is_text:
+        source = {
+            "type": "text",
+            "media_type": "text/plain",
+            "data": document.text
+        }
+    elif source is None:
+        source = {
+            "type": "base64",
+            "media_type": "application/pdf",
+            "data": document.base64
+        }
     
-    client = anthropic.Anthropic()
+    document_block = {
+        "type": "document",
+        "source": source
+    }
+    if cache_prompt:
+        # A breakpoint on the document caches the whole system + document prefix
+        document_block["cache_control"] = {"type": "ephemeral"}
     
-    # Load and encode PDF file to base64
-    with open(pdf_file_path, "rb") as f:
-        pdf_data = base64.standard_b64encode(f.read()).decode("utf-8")
-    
-    # Send to Claude using base64 encoding
-    message = client.messages.create(
-        model=model_name,
-        max_tokens=int(10 * 1024),
-        system=reviewer_guidance,
-        messages=[
+    return {
+        "model": model_name,
+        "max_tokens": int(10 * 1024),
+        "system": reviewer_guidance,
+        "messages": [
             {
                 "role": "user",
                 "content": [
-                    {
-                        "type": "document",
-                        "source": {
-                            "type": "base64",
-                            "media_type": "application/pdf",
-                            "data": pdf_data
-                        }
-                    },
+                    document_block,
                     {
                         "type": "text",
                         "text": user_prompt
@@ -57,7 +101,78 @@ def review_paper_claude(pdf_file_path: str, reviewer_guidance: str, user_prompt:
                 ]
             }
         ],
-    )
+    }
+
+
+def review_paper_claude(pdf_file_path: str, reviewer_guidance: str, user_prompt: str, model_name: str = "claude-sonnet-4-5",
+                        client=None, use_file_upload: bool = False, cache_prompt: bool = False,
+                        usage: dict = None, stream_to: str = None, stop_when_scored: bool = False,
+                        timeout: float = None) -> str:
+    """
+    Review a PDF paper using Claude API with base64 encoding.
+    
+    Args:
+        pdf_file_path: Path to the PDF file to review, or a PreparedDocument
+        reviewer_guidance: System guidance for the reviewer
+        user_prompt: User prompt for the review
+        model_name: Claude model to use (default: "claude-sonnet-4-5")
+        client: Optional SDK client; defaults to the shared pooled client from clients.py
+        use_file_upload: Upload the PDF once to the files endpoint and send its file id
+            instead of inlining base64 data (default: False)
+        cache_prompt: Mark the guidance + PDF prefix with cache_control so repeated
+            samples read it from the prompt cache (default: False)
+        usage: Optional dict that is filled with the call's token usage
+        stream_to: Optional output path; if given, the response is streamed and written
+            to it incrementally, and usage also gets "time_to_first_token" in seconds
+        stop_when_scored: When streaming, stop the generation as soon as all score
+            fields have arrived (default: False)
+        timeout: Optional per-request timeout in seconds passed to the SDK
+    
+    Returns:
+        The review text from the model
+    """
+    
+    client = client or get_client("claude")
+    
+    # Read and encode the PDF once per run; later calls reuse the prepared payload
+    document = prepare_document(pdf_file_path)
+    
+    source = None
+    messages_api = client.messages
+    extra_args = {}
+    if use_file_upload:
+        source = {
+            "type": "file",
+            "file_id": document.get_file_ref("claude", client, upload_pdf_claude, usage),
+        }
+        messages_api = client.beta.messages
+        extra_args["betas"] = [FILES_API_BETA]
+    else:
+        add_bytes_uploaded(usage, document.size if document.is_text else len(document.base64))
+    if timeout:
+        extra_args["timeout"] = timeout
+    
+    # Send to Claude
+    request = build_review_request_claude(document, reviewer_guidance, user_prompt, model_name,
+                                          source=source, cache_prompt=cache_prompt)
+    
+    if stream_to is not None:
+        writer = StreamingReviewWriter(stream_to, stop_when_scored=stop_when_scored)
+        with messages_api.stream(**request, **extra_args) as stream:
+            review_text = writer.consume(stream.text_stream)
+            # The final message (and its usage) only exists if the stream ran to the end
+            final_message = None if writer.stopped_early else stream.get_final_message()
+        
+        if usage is not None:
+            if final_message is not None:
+                usage.update(extract_usage_claude(final_message))
+            usage["time_to_first_token"] = writer.time_to_first_token
+        return review_text
+    
+    message = messages_api.create(**request, **extra_args)
+    
+    if usage is not None:
+        usage.update(extract_usage_claude(message))
     
     return message.content[0].text
 
@@ -75,7 +190,7 @@ if __name__ == "__main__":
 
     # model_name = "claude-sonnet-4-5"
     model_name = "claude-haiku-4-5"
-    pdf_name = pdf_file_path.split("/")[-1].rstrip(".pdf")
+    pdf_name = os.path.splitext(os.path.basename(pdf_file_path))[0]
     output_dir = "output_claude"
     os.makedirs(output_dir, exist_ok=True)
 
@@ -1,44 +1,281 @@
 
+import hashlib
 import os
-from google import genai
-from google.genai import types
+import threading
+from datetime import datetime, timedelta, timezone
+from google.genai import errors, types
+from clients import get_client
+from documents import PreparedDocument, add_bytes_uploaded, prepare_document
+from streaming import StreamingReviewWriter
 
 
-def review_paper_gemini(pdf_file_path: str, reviewer_guidance: str, user_prompt: str, model_name: str = "gemini-2.5-flash-lite") -> str:
+def upload_pdf_gemini(client, document: PreparedDocument):
+    """
+    Upload a PDF to the Gemini files endpoint and return the uploaded file.
+    """
+    return client.files.upload(
+        file=document.path,
+        config=types.UploadFileConfig(mime_type=document.mime_type, display_name=document.filename),
+    )
+
+
+# Lifetime of explicit Gemini context caches, and the time before expiry at which a
+# cache still in use is extended by another CACHE_TTL
+CACHE_TTL = "3600s"
+CACHE_REFRESH_MARGIN = timedelta(minutes=10)
+
+# Context caches created by this process, by (client, model, guidance, PDF), each with
+# the client that created it, so they can be extended while in use and deleted at the end
+_prompt_caches = {}
+_prompt_caches_lock = threading.Lock()
+_prompt_cache_locks = {}
+
+
+def create_prompt_cache_gemini(client, model_name: str, reviewer_guidance: str, pdf_part):
+    """
+    Create an explicit Gemini context cache holding the guidance and the PDF.
+    """
+    return client.caches.create(
+        model=model_name,
+        config=types.CreateCachedContentConfig(
+            system_instruction=reviewer_guidance,
+            contents=[pdf_part],
+            ttl=CACHE_TTL,
+        )
+    )
+
+
+def get_prompt_cache_gemini(client, model_name: str, reviewer_guidance: str, document: PreparedDocument,
+                            pdf_part, usage: dict = None):
+    """
+    Get the context cache of a (model, guidance, PDF), creating it on first use.
+
+    A cache that expires within CACHE_REFRESH_MARGIN is extended by CACHE_TTL, and
+    one that has already expired (or was deleted) is created again.
+
+    Args:
+        client: SDK client the cache belongs to
+        model_name: Gemini model of the cache
+        reviewer_guidance: System guidance stored in the cache
+        document: PreparedDocument whose PDF the cache holds
+        pdf_part: PDF part stored in the cache (inline bytes or file reference)
+        usage: Optional usage dict; the PDF size is added to its "bytes_uploaded" if
+            this call creates the cache
+
+    Returns:
+        The CachedContent to reference in requests
+    """
+    key = (id(client), model_name, hashlib.sha256(reviewer_guidance.encode()).hexdigest(), document.sha256)
+    with _prompt_caches_lock:
+        lock = _prompt_cache_locks.setdefault(key, threading.Lock())
+
+    with lock:
+        cache = _prompt_caches[key][1] if key in _prompt_caches else None
+        if cache is not None and cache.expire_time is not None and \
+                cache.expire_time - datetime.now(timezone.utc) < CACHE_REFRESH_MARGIN:
+            try:
+                cache = client.caches.update(name=cache.name, config=types.UpdateCachedContentConfig(ttl=CACHE_TTL))
+            except errors.APIError:
+                cache = None
+            else:
+                _prompt_caches[key] = (client, cache)
+        if cache is None:
+            cache = create_prompt_cache_gemini(client, model_name, reviewer_guidance, pdf_part)
+            add_bytes_uploaded(usage, document.size)
+            _prompt_caches[key] = (client, cache)
+        return cache
+
+
+def delete_prompt_caches_gemini() -> int:
+    """
+    Delete every context cache this process created, instead of leaving them to expire.
+
+    Returns:
+        The number of caches deleted
+    """
+    with _prompt_caches_lock:
+        caches = list(_prompt_caches.values())
+        _prompt_caches.clear()
+        _prompt_cache_locks.clear()
+
+    deleted = 0
+    for client, cache in caches:
+        try:
+            client.caches.delete(name=cache.name)
+            deleted += 1
+        except errors.APIError:
+            # Already expired; nothing is billed for it any more
+            pass
+    return deleted
+
+
+def extract_usage_gemini(response) -> dict:
+    """
+    Extract token usage from a Gemini response, including cached content tokens.
+    """
+    usage = response.usage_metadata
+    return {
+        "input_tokens": usage.prompt_token_count or 0,
+        # Thinking tokens are billed as output but not counted in candidates_token_count;
+        # count them in, to match OpenAI and Claude where output includes reasoning
+        "output_tokens": (usage.candidates_token_count or 0) + (usage.thoughts_token_count or 0),
+        "cached_tokens": usage.cached_content_token_count or 0,
+    }
+
+
+# Sampling temperature for every review request
+TEMPERATURE = 1.0
+
+
+def extract_candidate_texts_gemini(response) -> list:
+    """
+    Extract the text of every candidate of a Gemini response, skipping candidates without content.
+    """
+    texts = []
+    for candidate in response.candidates or []:
+        if candidate.content is None or not candidate.content.parts:
+            continue
+        texts.append("".join(part.text for part in candidate.content.parts if part.text and not part.thought))
+    return texts
+
+
+def build_batch_request_gemini(document: PreparedDocument, reviewer_guidance: str, user_prompt: str) -> dict:
+    """
+    Build the REST GenerateContentRequest for a review, for batch request files.
+    
+    Mirrors the contents and config that review_paper_gemini sends through the SDK.
+    """
+    return {
+        "contents": [
+            {
+                "role": "user",
+                "parts": [
+                    {"inline_data": {"mime_type": document.mime_type, "data": document.base64}},
+                    {"text": user_prompt},
+                ],
+            }
+        ],
+        "system_instruction": {"parts": [{"text": reviewer_guidance}]},
+        "generation_config": {"temperature": TEMPERATURE},
+    }
+
+
+def extract_output_text_gemini(response_body: dict) -> str:
+    """
+    Extract the text of the first candidate from a raw GenerateContentResponse body.
+    """
+    candidates = response_body.get("candidates") or [{}]
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+
+def review_paper_gemini(pdf_file_path: str, reviewer_guidance: str, user_prompt: str, model_name: str = "gemini-2.5-flash-lite",
+                        client=None, use_file_upload: bool = False, cache_prompt: bool = False,
+                        usage: dict = None, stream_to: str = None, stop_when_scored: bool = False,
+                        num_samples: int = None, timeout: float = None):
     """
     Review a PDF paper using Google Gemini API.
     
     Args:
-        pdf_file_path: Path to the PDF file to review
+        pdf_file_path: Path to the PDF file to review, or a PreparedDocument
         reviewer_guidance: System guidance for the reviewer
         user_prompt: User prompt for the review
         model_name: Gemini model to use (default: "gemini-2.0-flash-exp")
+        client: Optional SDK client; defaults to the shared pooled client from clients.py
+        use_file_upload: Upload the PDF once to the files endpoint and send the file
+            reference instead of inlining the bytes (default: False)
+        cache_prompt: Put the guidance + PDF prefix in an explicit context cache, created
+            once per model and reused by every later sample; delete_prompt_caches_gemini
+            removes the caches at the end of a run (default: False)
+        usage: Optional dict that is filled with the call's token usage
+        stream_to: Optional output path; if given, the response is streamed and written
+            to it incrementally, and usage also gets "time_to_first_token" in seconds
+        stop_when_scored: When streaming, stop the generation as soon as all score
+            fields have arrived (default: False)
+        num_samples: Optional number of independent reviews to generate in one request
+            with candidate_count (at most 8); not supported when streaming
+        timeout: Optional per-request timeout in seconds passed to the SDK
     
     Returns:
-        The review text from the model
+        The review text from the model, or the list of candidate reviews if num_samples is given
     """
-    client = genai.Client()
+    if num_samples is not None and stream_to is not None:
+        raise ValueError("num_samples is not supported with stream_to")
     
-    # Read PDF file as bytes
-    with open(pdf_file_path, "rb") as f:
-        pdf_data = f.read()
+    client = client or get_client("gemini")
     
-    # Create content with system instruction, PDF, and user prompt
-    response = client.models.generate_content(
-        model=model_name,
-        contents=[
-            types.Part.from_bytes(
-                data=pdf_data,
-                mime_type='application/pdf',
-            ),
+    # Read the PDF once per run; later calls reuse the prepared payload
+    document = prepare_document(pdf_file_path)
+    
+    if use_file_upload:
+        pdf_part = document.get_file_ref("gemini", client, upload_pdf_gemini, usage)
+    else:
+        pdf_part = types.Part.from_bytes(
+            data=document.data,
+            mime_type=document.mime_type,
+        )
+    
+    http_options = types.HttpOptions(timeout=int(timeout * 1000)) if timeout else None
+    
+    if cache_prompt:
+        # The cache is created once per (model, guidance, PDF) and extended while in use
+        cache = get_prompt_cache_gemini(client, model_name, reviewer_guidance, document, pdf_part,
+                                        None if use_file_upload else usage)
+        
+        # Only the user prompt is sent; the guidance and PDF come from the cache
+        contents = [user_prompt]
+        config = types.GenerateContentConfig(
+            cached_content=cache.name,
+            temperature=TEMPERATURE,
+            candidate_count=num_samples,
+            http_options=http_options,
+        )
+    else:
+        if not use_file_upload:
+            # The SDK sends inline bytes base64-encoded
+            add_bytes_uploaded(usage, 4 * ((document.size + 2) // 3))
+        
+        # Create content with system instruction, PDF, and user prompt
+        contents = [
+            pdf_part,
             user_prompt
-        ],
-        config=types.GenerateContentConfig(
+        ]
+        config = types.GenerateContentConfig(
             system_instruction=reviewer_guidance,
-            temperature=1.0,
+            temperature=TEMPERATURE,
+            candidate_count=num_samples,
+            http_options=http_options,
         )
-    )
     
+    if stream_to is not None:
+        writer = StreamingReviewWriter(stream_to, stop_when_scored=stop_when_scored)
+        stream = client.models.generate_content_stream(model=model_name, contents=contents, config=config)
+        last_chunk = {}
+        
+        def text_chunks():
+            for chunk in stream:
+                # Usage metadata is complete on the last chunk
+                last_chunk["chunk"] = chunk
+                yield chunk.text
+        
+        try:
+            review_text = writer.consume(text_chunks())
+        finally:
+            stream.close()
+        
+        if usage is not None:
+            if "chunk" in last_chunk and last_chunk["chunk"].usage_metadata is not None:
+                usage.update(extract_usage_gemini(last_chunk["chunk"]))
+            usage["time_to_first_token"] = writer.time_to_first_token
+        return review_text
+    
+    response = client.models.generate_content(model=model_name, contents=contents, config=config)
+    
+    if usage is not None:
+        usage.update(extract_usage_gemini(response))
+    
+    if num_samples is not None:
+        return extract_candidate_texts_gemini(response)
     return response.text
 
 
@@ -56,7 +293,7 @@ if __name__ == "__main__":
     
     model_name = "gemini-2.5-flash"
     
-    pdf_name = pdf_file_path.split("/")[-1].rstrip(".pdf")
+    pdf_name = os.path.splitext(os.path.basename(pdf_file_path))[0]
     output_dir = "output_gemini"
     os.makedirs(output_dir, exist_ok=True)
 
@@ -1,35 +1,67 @@
-import base64
 import os
-from openai import OpenAI
+from clients import get_client
+from documents import PreparedDocument, add_bytes_uploaded, prepare_document
+from streaming import StreamingReviewWriter
 
 
-def review_paper_openai(pdf_file_path: str, reviewer_guidance: str, user_prompt: str, model_name: str = "gpt-5-mini") -> str:
+def upload_pdf_openai(client, document: PreparedDocument) -> str:
     """
-    Review a PDF paper using OpenAI API with base64 encoding.
+    Upload a PDF to the OpenAI files endpoint and return its file id.
+    """
+    uploaded = client.files.create(
+        file=(document.filename, document.data, document.mime_type),
+        purpose="user_data",
+    )
+    return uploaded.id
+
+
+def extract_usage_openai(response) -> dict:
+    """
+    Extract token usage from an OpenAI response, including prompt cache hits.
+    """
+    usage = response.usage
+    details = getattr(usage, "input_tokens_details", None)
+    return {
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+    }
+
+
+def build_review_request_openai(document: PreparedDocument, reviewer_guidance: str, user_prompt: str,
+                                model_name: str, file_input: dict = None, cache_prompt: bool = False) -> dict:
+    """
+    Build the Responses API request body for a review.
+    
+    The same body is sent by review_paper_openai and written to batch request files.
     
     Args:
-        pdf_file_path: Path to the PDF file to review
+        document: Prepared PDF to review
         reviewer_guidance: System guidance for the reviewer
         user_prompt: User prompt for the review
-        model_name: OpenAI model to use (default: "gpt-5-mini")
+        model_name: OpenAI model to use
+        file_input: Optional input_file part; defaults to the inlined base64 PDF, or the
+            text itself for a text document
+        cache_prompt: Add a prompt_cache_key for the guidance + PDF prefix
     
     Returns:
-        The review text from the model
+        Keyword arguments for client.responses.create
     """
-    client = OpenAI()
-    
-    # Extract pdf name from pdf file path
-    pdf_paper_name = pdf_file_path.split("/")[-1]
+    if file_input is None and document.is_text:
+        file_input = {
+            "type": "input_text",
+            "text": document.text,
+        }
+    elif file_input is None:
+        file_input = {
+            "type": "input_file",
+            "filename": document.filename,
+            "file_data": f"data:application/pdf;base64,{document.base64}",
+        }
     
-    # Read and encode PDF file to base64
-    with open(pdf_file_path, "rb") as f:
-        data = f.read()
-    
-    base64_string = base64.b64encode(data).decode("utf-8")
-    
-    response = client.responses.create(
-        model=model_name,
-        input=[
+    request = {
+        "model": model_name,
+        "input": [
             {
                 "role": "system",
                 "content": [
@@ -42,11 +74,7 @@ def review_paper_openai(pdf_file_path: str, reviewer_guidance: str, user_prompt:
             {
                 "role": "user",
                 "content": [
-                    {
-                        "type": "input_file",
-                        "filename": pdf_paper_name,
-                        "file_data": f"data:application/pdf;base64,{base64_string}",
-                    },
+                    file_input,
                     {
                         "type": "input_text",
                         "text": user_prompt,
@@ -54,7 +82,101 @@ def review_paper_openai(pdf_file_path: str, reviewer_guidance: str, user_prompt:
                 ]
             }
         ]
-    )
+    }
+    
+    # OpenAI caches long prefixes automatically; a stable key keeps the
+    # repeated samples of this paper on the same cache
+    if cache_prompt:
+        request["prompt_cache_key"] = f"review-{document.filename}"
+    
+    return request
+
+
+def extract_output_text_openai(response_body: dict) -> str:
+    """
+    Extract the output text from a raw Responses API body, e.g. a batch result line.
+    """
+    texts = []
+    for item in response_body.get("output", []):
+        if item.get("type") == "message":
+            texts.extend(part["text"] for part in item.get("content", []) if part.get("type") == "output_text")
+    return "".join(texts)
+
+
+def review_paper_openai(pdf_file_path: str, reviewer_guidance: str, user_prompt: str, model_name: str = "gpt-5-mini",
+                        client=None, use_file_upload: bool = False, cache_prompt: bool = False,
+                        usage: dict = None, stream_to: str = None, stop_when_scored: bool = False,
+                        timeout: float = None) -> str:
+    """
+    Review a PDF paper using OpenAI API with base64 encoding.
+    
+    Args:
+        pdf_file_path: Path to the PDF file to review, or a PreparedDocument
+        reviewer_guidance: System guidance for the reviewer
+        user_prompt: User prompt for the review
+        model_name: OpenAI model to use (default: "gpt-5-mini")
+        client: Optional SDK client; defaults to the shared pooled client from clients.py
+        use_file_upload: Upload the PDF once to the files endpoint and send its file id
+            instead of inlining base64 data (default: False)
+        cache_prompt: Route repeated samples of the same guidance + PDF prefix to the
+            same prompt cache with a prompt_cache_key (default: False)
+        usage: Optional dict that is filled with the call's token usage
+        stream_to: Optional output path; if given, the response is streamed and written
+            to it incrementally, and usage also gets "time_to_first_token" in seconds
+        stop_when_scored: When streaming, stop the generation as soon as all score
+            fields have arrived (default: False)
+        timeout: Optional per-request timeout in seconds passed to the SDK
+    
+    Returns:
+        The review text from the model
+    """
+    client = client or get_client("openai")
+    
+    # Read and encode the PDF once per run; later calls reuse the prepared payload
+    document = prepare_document(pdf_file_path)
+    
+    file_input = None
+    # Text documents are always sent inline; the files endpoint only takes PDFs as input
+    if use_file_upload and not document.is_text:
+        file_input = {
+            "type": "input_file",
+            "file_id": document.get_file_ref("openai", client, upload_pdf_openai, usage),
+        }
+    else:
+        add_bytes_uploaded(usage, document.size if document.is_text else len(document.base64))
+    
+    request = build_review_request_openai(document, reviewer_guidance, user_prompt, model_name,
+                                          file_input=file_input, cache_prompt=cache_prompt)
+    # The SDK reads an explicit None as no timeout at all, so only pass one when set
+    extra_args = {"timeout": timeout} if timeout else {}
+    
+    if stream_to is not None:
+        writer = StreamingReviewWriter(stream_to, stop_when_scored=stop_when_scored)
+        stream = client.responses.create(**request, stream=True, **extra_args)
+        completed = {}
+        
+        def text_chunks():
+            for event in stream:
+                if event.type == "response.output_text.delta":
+                    yield event.delta
+                elif event.type == "response.completed":
+                    completed["response"] = event.response
+        
+        try:
+            review_text = writer.consume(text_chunks())
+        finally:
+            stream.close()
+        
+        if usage is not None:
+            if "response" in completed:
+                usage.update(extract_usage_openai(completed["response"]))
+            usage["time_to_first_token"] = writer.time_to_first_token
+        return review_text
+    
+    response = client.responses.create(**request, **extra_args)
+    
+    if usage is not None:
+        usage.update(extract_usage_openai(response))
     
     return response.output_text
 
@@ -73,7 +195,7 @@ if __name__ == "__main__":
     # model_name = "gpt-5-mini"
     
     model_name = "gpt-5"
-    pdf_name = pdf_file_path.split("/")[-1].rstrip(".pdf")
+    pdf_name = os.path.splitext(os.path.basename(pdf_file_path))[0]
     output_dir = "output_openai"
     os.makedirs(output_dir, exist_ok=True)
 
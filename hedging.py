@@ -0,0 +1,196 @@
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextlib import nullcontext
+from metrics import percentile
+
+
+class CallTimeout(TimeoutError):
+    """
+    A review call got no response within the hard timeout; its job is requeued.
+    """
+
+
+class HedgingPolicy:
+    """
+    Per-model latency budgets, hedged requests and hard timeouts for review calls.
+
+    The latencies of recent successful calls are kept per (provider, model, samples
+    per request). Once min_samples have been seen, a call still running after the
+    budget (the quantile of those latencies, p95 by default) gets a duplicate request;
+    whichever finishes first is kept and the other is abandoned. With a timeout, a
+    call (hedged or not) that has no response after that many seconds raises
+    CallTimeout, and run_jobs requeues its job up to max_requeues times.
+
+    Every attempt runs on its own daemon thread and holds its own rate limiter slot
+    while it runs, so duplicates are budgeted like any other request. A blocking SDK
+    call cannot be interrupted from another thread, so an abandoned attempt runs (and
+    keeps its slot) until it returns or the per-request SDK timeout (the same hard
+    timeout) ends it; its result is discarded. The budget and the hard timeout are
+    counted from the moment the first attempt gets its slot.
+
+    Streamed calls write their output as it arrives and are not run through the
+    policy: an abandoned stream would keep writing next to its replacement.
+    """
+
+    def __init__(self, hedge: bool = True, quantile: float = 0.95, min_samples: int = 5,
+                 timeout: float = None, max_requeues: int = 2, window: int = 200):
+        """
+        Args:
+            hedge: Send a duplicate request for calls slower than the budget (default: True)
+            quantile: Latency quantile used as each model's budget (default: 0.95)
+            min_samples: Successful calls of a model before it is hedged (default: 5)
+            timeout: Optional hard timeout in seconds per call
+            max_requeues: Times a timed-out job is requeued before it fails (default: 2)
+            window: Number of recent latencies kept per model (default: 200)
+        """
+        self.hedge = hedge
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.timeout = timeout
+        self.max_requeues = max_requeues
+
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def observe(self, key: tuple, latency: float):
+        """
+        Record the latency of a successful call.
+        """
+        with self._lock:
+            self._latencies[key].append(latency)
+
+    def budget(self, key: tuple):
+        """
+        Latency budget of a model in seconds, or None until min_samples calls have finished.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies[key])
+        if len(latencies) < self.min_samples:
+            return None
+        return percentile(latencies, self.quantile)
+
+    def _start(self, key: tuple, call, slot=None):
+        # Run one attempt on a daemon thread, so an abandoned call never blocks exit
+        future = Future()
+        started = threading.Event()
+        usage = {}
+
+        def target():
+            try:
+                with slot() if slot is not None else nullcontext():
+                    started.set()
+                    started_at = time.perf_counter()
+                    result = call(usage)
+                    self.observe(key, time.perf_counter() - started_at)
+            except BaseException as e:
+                started.set()
+                future.set_exception(e)
+            else:
+                future.set_result((result, usage))
+
+        threading.Thread(target=target, daemon=True).start()
+        return future, started
+
+    def call(self, key: tuple, call, usage: dict = None, on_hedge=None, slot=None):
+        """
+        Run a call under the latency budget and hard timeout of its model.
+
+        Args:
+            key: Budget key, e.g. (api_name, model_name, samples per request)
+            call: Callable taking a usage dict, which performs the provider call
+            usage: Optional dict updated with the usage of the attempt that is kept
+            on_hedge: Optional callback (budget) run when the duplicate is sent
+            slot: Optional callable returning the context manager each attempt runs in,
+                e.g. a ProviderRateLimiter slot
+
+        Returns:
+            The result of the first attempt that succeeds
+        """
+        first, started = self._start(key, call, slot)
+        started.wait()
+        started_at = time.perf_counter()
+        deadline = started_at + self.timeout if self.timeout else None
+        budget = self.budget(key) if self.hedge else None
+        if budget is not None and deadline is not None and started_at + budget >= deadline:
+            budget = None
+
+        pending = {first}
+        errors = []
+        hedged = False
+        while pending:
+            wait_until = started_at + budget if budget is not None and not hedged else deadline
+            wait_for = None if wait_until is None else max(0.0, wait_until - time.perf_counter())
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    errors.append(future.exception())
+                    continue
+                result, attempt_usage = future.result()
+                if usage is not None:
+                    usage.update(attempt_usage)
+                if future is not first:
+                    self._count(key, "hedge_won")
+                self._count(key, "calls")
+                return result
+            if done:
+                # One attempt failed; keep waiting for the other, if any
+                continue
+            if budget is not None and not hedged:
+                hedged = True
+                self._count(key, "hedged")
+                if on_hedge is not None:
+                    on_hedge(budget)
+                pending.add(self._start(key, call, slot)[0])
+                continue
+            self._count(key, "timeouts")
+            raise CallTimeout(f"No response after {self.timeout:g}s")
+        raise errors[0]
+
+    def _count(self, key: tuple, name: str):
+        with self._lock:
+            self._counts[key][name] += 1
+
+    def summary(self) -> dict:
+        """
+        Summarize the budgets and hedging per (api_name, model_name, samples per request).
+
+        Returns:
+            Mapping from key to a dict with the current budget, successful calls, hedged
+            calls, calls won by the duplicate and hard timeouts
+        """
+        with self._lock:
+            keys = sorted(set(self._counts) | set(self._latencies))
+        summary = {}
+        for key in keys:
+            with self._lock:
+                counts = Counter(self._counts[key])
+            summary[key] = {
+                "budget": self.budget(key),
+                "calls": counts["calls"],
+                "hedged": counts["hedged"],
+                "hedge_won": counts["hedge_won"],
+                "timeouts": counts["timeouts"],
+            }
+        return summary
+
+    def print_summary(self):
+        """
+        Print the latency budget, hedges and timeouts of every model.
+        """
+        summary = self.summary()
+        if not summary:
+            return
+
+        print(f"\n{'='*60}")
+        timeout = f"{self.timeout:g}s" if self.timeout else "none"
+        print(f"HEDGING (budget p{self.quantile * 100:g}, hard timeout {timeout})")
+        print(f"{'='*60}")
+        for (api_name, model_name, samples), stats in summary.items():
+            budget = "-" if stats["budget"] is None else f"{stats['budget']:.2f}s"
+            label = model_name if samples == 1 else f"{model_name} x{samples}"
+            print(f"  [{api_name.upper()}] {label}: budget={budget}, {stats['calls']} calls, "
+                  f"{stats['hedged']} hedged ({stats['hedge_won']} won by the duplicate), "
+                  f"{stats['timeouts']} timed out")
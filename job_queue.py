@@ -0,0 +1,279 @@
+import sqlite3
+import threading
+import time
+
+
+# Columns added after the first release of the job table, with their definitions
+LEASE_COLUMNS = {
+    "worker_id": "TEXT",
+    "lease_expires": "REAL",
+    "claims": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+class JobQueue:
+    """
+    Persistent (paper, model, attempt) job table backed by SQLite.
+
+    Every job is in one of five states: pending, running, done, failed or
+    converged (an attempt adaptive sampling did not need). An interrupted run
+    leaves its in-flight jobs as running; they are put back to pending on the
+    next start, so the run resumes exactly where it stopped without looking at
+    the output files.
+
+    Several worker processes can share one table: each claims jobs under a lease
+    that it renews while they run. Jobs whose lease expired, because their worker
+    crashed or lost its storage, can be claimed again by any other worker, as can
+    jobs an interrupted single-process run left running without a lease.
+    """
+
+    def __init__(self, db_path: str, wal: bool = True):
+        """
+        Args:
+            db_path: Path to the SQLite database
+            wal: Use write-ahead logging (default: True). WAL needs all processes on one
+                host; workers on several hosts sharing the table over a network file
+                system need the rollback journal (wal=False) and POSIX file locks.
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=60)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                pdf_name TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                attempt INTEGER NOT NULL,
+                api_name TEXT NOT NULL,
+                pdf_file_path TEXT NOT NULL,
+                output_file_path TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                error TEXT,
+                updated_at REAL,
+                UNIQUE (pdf_name, model_name, attempt)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, definition in LEASE_COLUMNS.items():
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS workers (
+                slot INTEGER PRIMARY KEY,
+                worker_id TEXT NOT NULL UNIQUE,
+                expires REAL NOT NULL
+            )
+        """)
+
+    def add_jobs(self, jobs: list, existing_outputs: set = None) -> int:
+        """
+        Insert jobs that are not in the table yet.
+
+        Args:
+            jobs: Job dicts with pdf_name, model_name, attempt, api_name, pdf_file_path
+                and output_file_path
+            existing_outputs: Optional set of output paths already on disk; their jobs
+                are inserted as done
+
+        Returns:
+            Number of newly inserted jobs
+        """
+        existing_outputs = existing_outputs or set()
+        now = time.time()
+        rows = [
+            (job["pdf_name"], job["model_name"], job["attempt"], job["api_name"],
+             job["pdf_file_path"], job["output_file_path"],
+             "done" if job["output_file_path"] in existing_outputs else "pending", now)
+            for job in jobs
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany("""
+                INSERT OR IGNORE INTO jobs
+                    (pdf_name, model_name, attempt, api_name, pdf_file_path, output_file_path, status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            self._conn.execute("COMMIT")
+            return self._conn.total_changes - before
+
+    def reset_running(self, include_failed: bool = False, include_converged: bool = False) -> int:
+        """
+        Put jobs left running by an interrupted run (and optionally failed and converged jobs) back to pending.
+
+        Returns:
+            Number of jobs reset
+        """
+        statuses = ("running",) + (("failed",) if include_failed else ()) + (("converged",) if include_converged else ())
+        placeholders = ",".join("?" * len(statuses))
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET status = 'pending', worker_id = NULL, lease_expires = NULL, updated_at = ? "
+                f"WHERE status IN ({placeholders})",
+                (time.time(), *statuses))
+            return cursor.rowcount
+
+    def claim_jobs(self, limit: int, model_names: list = None, worker_id: str = None,
+                   lease_seconds: float = None) -> list:
+        """
+        Atomically move up to limit pending jobs to running and return them.
+
+        Args:
+            limit: Maximum number of jobs to claim
+            model_names: Optional models to claim jobs of; other pending jobs are left alone
+            worker_id: Optional name of the claiming worker
+            lease_seconds: Optional lease on the claimed jobs; with a lease, running jobs
+                whose lease has expired are claimed as well, and so are running jobs
+                without a lease, which an interrupted single-process run left behind
+
+        Returns:
+            List of job dicts, empty when no pending jobs are left
+        """
+        model_filter, params = "", ()
+        if model_names is not None:
+            model_filter = f"AND model_name IN ({','.join('?' * len(model_names))})"
+            params = tuple(model_names)
+        now = time.time()
+        claimable = "status = 'pending'"
+        if lease_seconds is not None:
+            # Jobs claimed without a lease were left by a single-process run, which does not
+            # share the table with workers, so nobody is running them any more
+            claimable = ("(status = 'pending' OR "
+                         "(status = 'running' AND (lease_expires IS NULL OR lease_expires < ?)))")
+            params = (now, *params)
+        lease_expires = now + lease_seconds if lease_seconds is not None else None
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE {claimable} {model_filter} ORDER BY id LIMIT ?",
+                (*params, limit)).fetchall()
+            if rows:
+                ids = [row["id"] for row in rows]
+                self._conn.execute(
+                    f"UPDATE jobs SET status = 'running', worker_id = ?, lease_expires = ?, claims = claims + 1, "
+                    f"updated_at = ? WHERE id IN ({','.join('?' * len(ids))})",
+                    (worker_id, lease_expires, now, *ids))
+            self._conn.execute("COMMIT")
+        return [dict(row) for row in rows]
+
+    def renew_leases(self, worker_id: str, lease_seconds: float) -> int:
+        """
+        Extend the leases of every job a worker is running.
+
+        Returns:
+            Number of leases renewed
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE status = 'running' AND worker_id = ?",
+                (now + lease_seconds, worker_id))
+            return cursor.rowcount
+
+    def release_jobs(self, worker_id: str) -> int:
+        """
+        Put the jobs a worker is still running back to pending, e.g. when it shuts down.
+
+        Returns:
+            Number of jobs released
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'pending', worker_id = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE status = 'running' AND worker_id = ?",
+                (time.time(), worker_id))
+            return cursor.rowcount
+
+    def register_worker(self, worker_id: str, lease_seconds: float) -> int:
+        """
+        Register a worker and assign it the lowest free slot number.
+
+        Slots of workers whose registration expired are reused, so a restarted fleet of
+        N workers always holds slots 0 to N-1, e.g. for assigning API keys.
+
+        Returns:
+            The worker's slot
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM workers WHERE expires < ? OR worker_id = ?", (now, worker_id))
+            taken = {row[0] for row in self._conn.execute("SELECT slot FROM workers")}
+            slot = next(slot for slot in range(len(taken) + 1) if slot not in taken)
+            self._conn.execute("INSERT INTO workers (slot, worker_id, expires) VALUES (?, ?, ?)",
+                               (slot, worker_id, now + lease_seconds))
+            self._conn.execute("COMMIT")
+        return slot
+
+    def heartbeat(self, worker_id: str, lease_seconds: float) -> int:
+        """
+        Keep a worker's registration and job leases alive.
+
+        Returns:
+            Number of job leases renewed
+        """
+        with self._lock:
+            self._conn.execute("UPDATE workers SET expires = ? WHERE worker_id = ?",
+                               (time.time() + lease_seconds, worker_id))
+        return self.renew_leases(worker_id, lease_seconds)
+
+    def unregister_worker(self, worker_id: str):
+        """
+        Remove a worker's registration, freeing its slot.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+
+    def mark(self, job_id: int, status: str, error: str = None, worker_id: str = None) -> bool:
+        """
+        Record the final status ("done", "failed" or "converged") of a job.
+
+        Only the current owner can mark a job: a worker whose lease expired and whose
+        job was claimed by another worker (or released) no longer owns it.
+
+        Args:
+            job_id: Job id
+            status: Final status
+            error: Optional error message
+            worker_id: The worker that claimed the job (None without workers)
+
+        Returns:
+            Whether the job was marked; False for a stale update
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND worker_id IS ?",
+                (status, error, time.time(), job_id, worker_id))
+        return cursor.rowcount > 0
+
+    def count_leased(self, model_names: list = None) -> int:
+        """
+        Count running jobs whose lease is still live, i.e. jobs other workers are running.
+
+        Args:
+            model_names: Optional models to count jobs of
+        """
+        model_filter, params = "", ()
+        if model_names is not None:
+            model_filter = f"AND model_name IN ({','.join('?' * len(model_names))})"
+            params = tuple(model_names)
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE status = 'running' AND lease_expires >= ? {model_filter}",
+                (time.time(), *params)).fetchone()[0]
+
+    def status_counts(self) -> dict:
+        """
+        Count jobs per status.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
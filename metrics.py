@@ -0,0 +1,198 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+
+# Latency quantiles reported in the summary and the Prometheus export
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Usage fields counted per call, as reported by the review functions
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cached_tokens", "bytes_uploaded")
+
+
+def percentile(sorted_values: list, quantile: float):
+    """
+    Nearest-rank percentile of an ascending list, or None if it is empty.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(quantile * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class MetricsRecorder:
+    """
+    Per-call performance metrics of a run.
+
+    record_call() is the hook run after every review job. It appends one JSON line
+    (latency, time-to-first-token, token counts, bytes uploaded, retries, status,
+    error, whether the call was hedged, preprocessing variant and the number of samples
+    its request returned) to the metrics file, if any, and folds the
+    call into per (provider, model) aggregates. The aggregates back the end-of-run summary and
+    the Prometheus text export, so memory stays bounded by the latency samples.
+    """
+
+    def __init__(self, metrics_path: str = None):
+        self.metrics_path = metrics_path
+        self.started_at = time.time()
+        self._file = None
+        if metrics_path:
+            os.makedirs(os.path.dirname(metrics_path) or ".", exist_ok=True)
+            self._file = open(metrics_path, "a")
+        self._latencies = defaultdict(list)
+        self._ttfts = defaultdict(list)
+        self._statuses = defaultdict(Counter)
+        self._totals = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def record_call(self, job: dict, status: str):
+        """
+        Record a finished job.
+
+        Args:
+            job: Job dict after run_review_job, with usage, latency, retries and error; the
+                other attempts of a multi-sample request have no latency of their own
+            status: Job status ("done", "cached", "skipped", "timeout" for a requeued
+                timeout, or "error")
+        """
+        usage = job.get("usage") or {}
+        record = {
+            "timestamp": time.time(),
+            "api_name": job["api_name"],
+            "model_name": job["model_name"],
+            "pdf_name": job["pdf_name"],
+            "attempt": job["attempt"],
+            "status": status,
+            "latency": job.get("latency"),
+            "time_to_first_token": usage.get("time_to_first_token"),
+            "retries": job.get("retries", 0),
+            "error": job.get("error"),
+            "hedged": job.get("hedged", False),
+            "preprocess": job.get("preprocess"),
+            "samples": job.get("samples", 1),
+        }
+        record.update({field: usage.get(field, 0) for field in USAGE_FIELDS})
+
+        key = (job["api_name"], job["model_name"])
+        with self._lock:
+            self._statuses[key][status] += 1
+            self._totals[key]["retries"] += record["retries"]
+            self._totals[key].update({field: record[field] or 0 for field in USAGE_FIELDS})
+            if status == "done" and record["latency"] is not None:
+                self._latencies[key].append(record["latency"])
+            if status == "done" and record["time_to_first_token"] is not None:
+                self._ttfts[key].append(record["time_to_first_token"])
+            if self._file is not None:
+                self._file.write(json.dumps(record) + "\n")
+                self._file.flush()
+
+    def summary(self) -> dict:
+        """
+        Summarize the run per (api_name, model_name).
+
+        Returns:
+            Mapping from (api_name, model_name) to a dict with status counts, latency
+            quantiles, mean time-to-first-token, token and byte totals, and throughput
+            in calls and output tokens per second of run time
+        """
+        elapsed = max(time.time() - self.started_at, 1e-9)
+        summary = {}
+        with self._lock:
+            for key in sorted(self._statuses):
+                latencies = sorted(self._latencies[key])
+                ttfts = self._ttfts[key]
+                summary[key] = {
+                    "statuses": dict(self._statuses[key]),
+                    "latency": {quantile: percentile(latencies, quantile) for quantile in QUANTILES},
+                    "latency_sum": sum(latencies),
+                    "latency_count": len(latencies),
+                    "mean_ttft": sum(ttfts) / len(ttfts) if ttfts else None,
+                    "totals": dict(self._totals[key]),
+                    "calls_per_second": len(latencies) / elapsed,
+                    "output_tokens_per_second": self._totals[key]["output_tokens"] / elapsed,
+                }
+        return summary
+
+    def print_summary(self):
+        """
+        Print latency quantiles and throughput per provider and model.
+        """
+        summary = self.summary()
+        if not summary:
+            return
+
+        print(f"\n{'='*60}")
+        print(f"CALL METRICS ({time.time() - self.started_at:.1f}s)")
+        print(f"{'='*60}")
+        for (api_name, model_name), stats in summary.items():
+            latency = "/".join("-" if value is None else f"{value:.2f}" for value in stats["latency"].values())
+            statuses = ", ".join(f"{status}={count}" for status, count in sorted(stats["statuses"].items()))
+            line = (f"  [{api_name.upper()}] {model_name}: p50/p95/p99={latency}s, "
+                    f"{stats['calls_per_second'] * 60:.1f} calls/min, "
+                    f"{stats['output_tokens_per_second']:.0f} output tokens/s, "
+                    f"retries={stats['totals'].get('retries', 0)}, {statuses}")
+            if stats["mean_ttft"] is not None:
+                line += f", mean TTFT={stats['mean_ttft']:.2f}s"
+            print(line)
+
+    def to_prometheus(self) -> str:
+        """
+        Render the run's metrics in the Prometheus text exposition format.
+        """
+        summary = self.summary()
+        lines = [
+            "# HELP review_calls_total Review jobs by final status.",
+            "# TYPE review_calls_total counter",
+        ]
+        for (api_name, model_name), stats in summary.items():
+            for status, count in sorted(stats["statuses"].items()):
+                lines.append(f'review_calls_total{{api="{api_name}",model="{model_name}",status="{status}"}} {count}')
+
+        lines += [
+            "# HELP review_call_latency_seconds Wall-clock latency of successful review calls.",
+            "# TYPE review_call_latency_seconds summary",
+        ]
+        for (api_name, model_name), stats in summary.items():
+            labels = f'api="{api_name}",model="{model_name}"'
+            for quantile, value in stats["latency"].items():
+                if value is not None:
+                    lines.append(f'review_call_latency_seconds{{{labels},quantile="{quantile}"}} {value}')
+            lines.append(f"review_call_latency_seconds_sum{{{labels}}} {stats['latency_sum']}")
+            lines.append(f"review_call_latency_seconds_count{{{labels}}} {stats['latency_count']}")
+
+        lines += [
+            "# HELP review_time_to_first_token_seconds Mean time to first token of streamed calls.",
+            "# TYPE review_time_to_first_token_seconds gauge",
+        ]
+        for (api_name, model_name), stats in summary.items():
+            if stats["mean_ttft"] is not None:
+                lines.append(f'review_time_to_first_token_seconds{{api="{api_name}",model="{model_name}"}} '
+                             f'{stats["mean_ttft"]}')
+
+        for field, help_text in (("retries", "Retries after rate-limit and transient errors."),
+                                 ("input_tokens", "Input tokens, including cached tokens."),
+                                 ("cached_tokens", "Input tokens served from the provider prompt cache."),
+                                 ("output_tokens", "Output tokens."),
+                                 ("bytes_uploaded", "PDF bytes sent inline or uploaded.")):
+            lines += [f"# HELP review_{field}_total {help_text}", f"# TYPE review_{field}_total counter"]
+            for (api_name, model_name), stats in summary.items():
+                lines.append(f'review_{field}_total{{api="{api_name}",model="{model_name}"}} '
+                             f'{stats["totals"].get(field, 0)}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """
+        Atomically write the Prometheus text export to a file.
+        """
+        with open(path + ".tmp", "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(path + ".tmp", path)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,336 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+
+
+# Bump when the processing changes, so cached variants are rebuilt
+PREPROCESS_VERSION = 1
+
+# Rough characters per token of English text, for token estimates
+CHARS_PER_TOKEN = 4
+
+# Heading that starts the bibliography
+REFERENCES_HEADING = re.compile(r"^\s*(?:\d+\.?\s*)?(?:references|bibliography)\s*$", re.IGNORECASE)
+
+# Heading that starts the appendix: "Appendix ...", "Supplementary Material ..." or a
+# lettered section in capitals ("A COMPLETE DERIVATION", as extracted from ICLR papers)
+APPENDIX_HEADING = re.compile(r"^\s*(?:[A-Z][.:]?\s+)?(?i:appendix|appendices|supplementary materials?)\b"
+                              r"|^\s*A\.?\s+[A-Z][A-Z0-9 ,:()'&\-]{3,}$")
+
+
+def estimate_text_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text from its length.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def find_appendix_page(page_texts: list):
+    """
+    Find the first page of a paper's appendix.
+
+    The appendix is the first appendix heading after the references heading. If it
+    starts on the page where the references end, that page is kept.
+
+    Args:
+        page_texts: Extracted text of every page
+
+    Returns:
+        Index of the first page to drop, or None if no appendix was found
+    """
+    in_references = False
+    for page_index, text in enumerate(page_texts):
+        references_on_page = False
+        for line in text.splitlines():
+            if REFERENCES_HEADING.match(line):
+                in_references = references_on_page = True
+            elif in_references and len(line) <= 80 and APPENDIX_HEADING.match(line):
+                return page_index + 1 if references_on_page else page_index
+    return None
+
+
+def _import_pypdf():
+    try:
+        import pypdf
+    except ImportError as e:
+        raise ImportError("PDF preprocessing requires pypdf: pip install pypdf") from e
+    return pypdf
+
+
+def _downsample_images(page, max_image_px: int, image_quality: int) -> tuple:
+    # Re-encode every image larger than max_image_px on its long side as a smaller JPEG;
+    # returns the numbers of images replaced and skipped
+    from PIL import Image
+    from pypdf.errors import PyPdfError
+
+    replaced = skipped = 0
+    for image_file in page.images:
+        try:
+            image = image_file.image
+            if max(image.size) <= max_image_px:
+                continue
+            image = image.copy()
+            image.thumbnail((max_image_px, max_image_px), Image.LANCZOS)
+            if image.mode not in ("RGB", "L"):
+                # JPEG has no alpha channel; flatten transparent figures onto white
+                background = Image.new("RGB", image.size, "white")
+                background.paste(image, mask=image.getchannel("A") if "A" in image.getbands() else None)
+                image = background
+            image_file.replace(image, quality=image_quality)
+            replaced += 1
+        except (PyPdfError, NotImplementedError, KeyError, ValueError, OSError):
+            # Leave images pypdf or PIL cannot decode or rewrite untouched: unsupported
+            # filters, malformed image dictionaries, unknown or truncated image data
+            skipped += 1
+    return replaced, skipped
+
+
+class PdfPreprocessor:
+    """
+    Optional preprocessing of PDFs ahead of the review calls.
+
+    A variant can down-sample embedded images, drop pages past a fixed cutoff or
+    from the appendix on, or replace the PDF with its extracted text. Each variant
+    of a PDF is built once and cached on disk under its content hash and options,
+    so later runs and concurrent jobs reuse it. The sizes, page counts and estimated
+    text tokens of the original and processed files are kept for the report.
+    """
+
+    def __init__(self, cache_dir: str, max_image_px: int = None, image_quality: int = 75,
+                 max_pages: int = None, drop_appendix: bool = False, extract_text: bool = False):
+        """
+        Args:
+            cache_dir: Directory of the processed files
+            max_image_px: Down-sample embedded images to at most this many pixels on
+                their long side (default: keep images)
+            image_quality: JPEG quality of down-sampled images (default: 75)
+            max_pages: Keep at most this many pages (default: all)
+            drop_appendix: Drop the pages from the appendix heading after the references on
+                (default: False)
+            extract_text: Send the extracted text of the kept pages instead of a PDF (default: False)
+        """
+        self.cache_dir = cache_dir
+        self.options = {
+            "max_image_px": max_image_px,
+            "image_quality": image_quality if max_image_px else None,
+            "max_pages": max_pages,
+            "drop_appendix": drop_appendix,
+            "extract_text": extract_text,
+        }
+        self.options_hash = hashlib.sha256(
+            json.dumps([PREPROCESS_VERSION, self.options], sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+        self._processed = {}
+        self._stats = {}
+        self._path_locks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def variant(self) -> str:
+        """Short name of the configured variant, e.g. "img1024q75-noappendix"."""
+        parts = []
+        if self.options["max_image_px"]:
+            parts.append(f"img{self.options['max_image_px']}q{self.options['image_quality']}")
+        if self.options["max_pages"]:
+            parts.append(f"pages{self.options['max_pages']}")
+        if self.options["drop_appendix"]:
+            parts.append("noappendix")
+        if self.options["extract_text"]:
+            parts.append("text")
+        return "-".join(parts) or "original"
+
+    def _path_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._path_locks.setdefault(key, threading.Lock())
+
+    def process(self, pdf_file_path: str) -> str:
+        """
+        Get the path of a PDF's processed variant, building it on first use.
+
+        Args:
+            pdf_file_path: Path to the original PDF
+
+        Returns:
+            Path to the processed .pdf (or .txt with extract_text) in the cache directory
+        """
+        stat = os.stat(pdf_file_path)
+        key = (os.path.abspath(pdf_file_path), stat.st_mtime_ns)
+        # Concurrent jobs of the same PDF wait for one build instead of repeating it
+        with self._path_lock(key):
+            if key not in self._processed:
+                with open(pdf_file_path, "rb") as f:
+                    source_sha256 = hashlib.sha256(f.read()).hexdigest()
+                variant_dir = os.path.join(self.cache_dir, source_sha256[:2], source_sha256, self.options_hash)
+                stem = os.path.splitext(os.path.basename(pdf_file_path))[0]
+                output_path = os.path.join(variant_dir, stem + (".txt" if self.options["extract_text"] else ".pdf"))
+                stats_path = os.path.join(variant_dir, "stats.json")
+
+                if os.path.exists(output_path) and os.path.exists(stats_path):
+                    with open(stats_path, "r") as f:
+                        stats = json.load(f)
+                else:
+                    os.makedirs(variant_dir, exist_ok=True)
+                    stats = self._build(pdf_file_path, output_path)
+                    with open(stats_path + ".tmp", "w") as f:
+                        json.dump(stats, f)
+                    os.replace(stats_path + ".tmp", stats_path)
+
+                stats["pdf_name"] = stem
+                with self._lock:
+                    self._stats[key] = stats
+                self._processed[key] = output_path
+            return self._processed[key]
+
+    def _build(self, pdf_file_path: str, output_path: str) -> dict:
+        pypdf = _import_pypdf()
+        reader = pypdf.PdfReader(pdf_file_path)
+        page_texts = [page.extract_text() or "" for page in reader.pages]
+
+        keep_pages = len(page_texts)
+        if self.options["max_pages"]:
+            keep_pages = min(keep_pages, self.options["max_pages"])
+        if self.options["drop_appendix"]:
+            appendix_page = find_appendix_page(page_texts)
+            if appendix_page is not None:
+                keep_pages = min(keep_pages, appendix_page)
+
+        images_replaced = images_skipped = 0
+        if self.options["extract_text"]:
+            text = "\n\n".join(f"[Page {page_index + 1}]\n{page_text}"
+                               for page_index, page_text in enumerate(page_texts[:keep_pages]))
+            data = text.encode("utf-8")
+        else:
+            data = None
+            writer = pypdf.PdfWriter()
+            for page in reader.pages[:keep_pages]:
+                writer.add_page(page)
+            if self.options["max_image_px"]:
+                for page in writer.pages:
+                    replaced, skipped = _downsample_images(page, self.options["max_image_px"],
+                                                           self.options["image_quality"])
+                    images_replaced += replaced
+                    images_skipped += skipped
+            if keep_pages < len(page_texts) or images_replaced:
+                for page in writer.pages:
+                    page.compress_content_streams()
+                # Dropped pages leave their resources behind until orphans are removed
+                writer.compress_identical_objects(remove_duplicates=True, remove_unreferenced=True)
+                buffer = io.BytesIO()
+                writer.write(buffer)
+                data = buffer.getvalue()
+
+        if data is None:
+            # Nothing changed; a rewritten PDF would only differ in size
+            with open(pdf_file_path, "rb") as f:
+                data = f.read()
+
+        with open(output_path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(output_path + ".tmp", output_path)
+
+        return {
+            "variant": self.variant,
+            "source_size": os.path.getsize(pdf_file_path),
+            "size": len(data),
+            "source_pages": len(page_texts),
+            "pages": keep_pages,
+            "images_replaced": images_replaced,
+            "images_skipped": images_skipped,
+            "source_text_tokens": sum(estimate_text_tokens(text) for text in page_texts),
+            "text_tokens": sum(estimate_text_tokens(text) for text in page_texts[:keep_pages]),
+        }
+
+    def stats(self) -> list:
+        """
+        Get the size and token statistics of every PDF processed in this run.
+
+        Returns:
+            List of dicts with pdf_name, variant, source_size, size, source_pages,
+            pages, images_replaced, images_skipped (images that could not be decoded or
+            rewritten), source_text_tokens and text_tokens (token counts
+            are estimated from the extracted text, not counted by a provider)
+        """
+        with self._lock:
+            return [dict(stats) for stats in self._stats.values()]
+
+    def print_report(self):
+        """
+        Print the size, page and estimated token reduction of every processed PDF.
+        """
+        stats = self.stats()
+        if not stats:
+            return
+        print_preprocess_report(stats)
+
+
+def print_preprocess_report(stats: list):
+    """
+    Print preprocessing statistics from PdfPreprocessor.stats as a table.
+    """
+    print(f"\n{'='*60}")
+    print("PDF PREPROCESSING")
+    print(f"{'='*60}")
+    print(f"  {'pdf':<16}{'variant':<28}{'size (MB)':>16}{'pages':>10}{'~text tokens':>18}"
+          f"{'images replaced/skipped':>26}")
+    for row in sorted(stats, key=lambda row: (row["pdf_name"], row["variant"])):
+        size = f"{row['source_size'] / 1024 ** 2:.2f}->{row['size'] / 1024 ** 2:.2f}"
+        pages = f"{row['source_pages']}->{row['pages']}"
+        tokens = f"{row['source_text_tokens']}->{row['text_tokens']}"
+        # Variants cached before skipped images were counted have no images_skipped
+        images = f"{row['images_replaced']}/{row.get('images_skipped', 0)}"
+        print(f"  {row['pdf_name']:<16}{row['variant']:<28}{size:>16}{pages:>10}{tokens:>18}{images:>26}")
+    source_size = sum(row["source_size"] for row in stats)
+    size = sum(row["size"] for row in stats)
+    print(f"  Total: {source_size / 1024 ** 2:.2f} MB -> {size / 1024 ** 2:.2f} MB "
+          f"({100.0 * size / max(source_size, 1):.0f}%)")
+
+
+# Variants compared by the --compare report
+COMPARE_VARIANTS = [
+    {},
+    {"max_image_px": 1024},
+    {"drop_appendix": True},
+    {"max_image_px": 1024, "drop_appendix": True},
+    {"extract_text": True},
+    {"extract_text": True, "drop_appendix": True},
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess PDFs and report their size and token reduction")
+    parser.add_argument("pdf_paths", type=str, nargs="+", help="PDF files to preprocess")
+    parser.add_argument("--cache_dir", type=str, default="output/preprocessed",
+                        help="Directory of the processed files (default: output/preprocessed)")
+    parser.add_argument("--max_image_px", type=int, default=None,
+                        help="Down-sample embedded images to this many pixels on the long side (default: keep)")
+    parser.add_argument("--image_quality", type=int, default=75,
+                        help="JPEG quality of down-sampled images (default: 75)")
+    parser.add_argument("--max_pages", type=int, default=None,
+                        help="Keep at most this many pages (default: all)")
+    parser.add_argument("--drop_appendix", action="store_true",
+                        help="Drop the pages from the appendix on")
+    parser.add_argument("--extract_text", action="store_true",
+                        help="Produce the extracted text instead of a PDF")
+    parser.add_argument("--compare", action="store_true",
+                        help="Build and report a fixed set of variants instead of the one given by the options")
+
+    args = parser.parse_args()
+
+    if args.compare:
+        variants = COMPARE_VARIANTS
+    else:
+        variants = [{"max_image_px": args.max_image_px, "image_quality": args.image_quality,
+                     "max_pages": args.max_pages, "drop_appendix": args.drop_appendix,
+                     "extract_text": args.extract_text}]
+
+    all_stats = []
+    for options in variants:
+        preprocessor = PdfPreprocessor(args.cache_dir, **options)
+        for pdf_path in args.pdf_paths:
+            print(f"{preprocessor.variant}: {preprocessor.process(pdf_path)}")
+        all_stats.extend(preprocessor.stats())
+    print_preprocess_report(all_stats)
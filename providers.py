@@ -0,0 +1,164 @@
+import importlib
+import os
+import sys
+
+
+# Provider registry. Each provider names its review function by module and attribute
+# instead of importing it, so a run only loads the SDKs of the providers it selects.
+# max_samples_per_request is the number of independent reviews one request can return
+# through the review function's num_samples argument; 1 means no multi-sample support
+# (neither the OpenAI Responses API nor the Anthropic Messages API has one).
+# api_key_env names the SDK's API key variable; "<api_key_env>S" may hold a
+# comma-separated pool of keys that distributed workers divide among themselves.
+# cleanup optionally names a function of the module that releases provider-side
+# resources (e.g. context caches) at the end of a run.
+PROVIDERS = {
+    "openai": {
+        "module": "generate_openai",
+        "function": "review_paper_openai",
+        "models": ["gpt-5", "gpt-5-mini"],
+        "output_dir": "output_openai",
+        "api_key_env": "OPENAI_API_KEY",
+        "max_samples_per_request": 1,
+    },
+    "claude": {
+        "module": "generate_claude",
+        "function": "review_paper_claude",
+        "models": ["claude-sonnet-4-5", "claude-haiku-4-5"],
+        "output_dir": "output_claude",
+        "api_key_env": "ANTHROPIC_API_KEY",
+        "max_samples_per_request": 1,
+    },
+    "gemini": {
+        "module": "generate_gemini",
+        "function": "review_paper_gemini",
+        "models": ["gemini-2.5-flash", "gemini-2.5-flash-lite"],
+        "output_dir": "output_gemini",
+        "api_key_env": "GEMINI_API_KEY",
+        # candidate_count
+        "max_samples_per_request": 8,
+        "cleanup": "delete_prompt_caches_gemini",
+    },
+}
+
+
+def register_provider(api_name: str, module: str, function: str, models: list, output_dir: str = None,
+                      max_samples_per_request: int = 1, api_key_env: str = None, cleanup: str = None):
+    """
+    Add a provider to the registry, or replace an existing one.
+
+    Args:
+        api_name: Provider name used in job tags, limits and the client pool
+        module: Module holding the review function; imported only when the provider is selected
+        function: Name of the review function, with the review_paper_* signature
+        models: Default models of the provider
+        output_dir: Output directory name under the base output directory (default: "output_{api_name}")
+        max_samples_per_request: Number of reviews one call can return with num_samples (default: 1)
+        api_key_env: Environment variable of the provider's API key (default: none)
+        cleanup: Optional name of a function of the module, run by cleanup_providers
+    """
+    PROVIDERS[api_name] = {
+        "module": module,
+        "function": function,
+        "models": list(models),
+        "output_dir": output_dir or f"output_{api_name}",
+        "max_samples_per_request": max_samples_per_request,
+        "api_key_env": api_key_env,
+        "cleanup": cleanup,
+    }
+
+
+def get_review_function(api_name: str):
+    """
+    Import a provider's module and return its review function.
+    """
+    if api_name not in PROVIDERS:
+        raise ValueError(f"Unknown provider: {api_name}")
+    provider = PROVIDERS[api_name]
+    return getattr(importlib.import_module(provider["module"]), provider["function"])
+
+
+def cleanup_providers():
+    """
+    Run the cleanup function of every provider whose module this run has imported.
+    """
+    for provider in PROVIDERS.values():
+        module = sys.modules.get(provider["module"])
+        if provider.get("cleanup") and module is not None:
+            getattr(module, provider["cleanup"])()
+
+
+def get_api_key_pool(api_name: str) -> list:
+    """
+    Get the pool of API keys of a provider from its "<api_key_env>S" variable,
+    e.g. OPENAI_API_KEYS="sk-a,sk-b"; empty if the provider has no pool.
+    """
+    api_key_env = PROVIDERS.get(api_name, {}).get("api_key_env")
+    if not api_key_env:
+        return []
+    return [key.strip() for key in os.environ.get(api_key_env + "S", "").split(",") if key.strip()]
+
+
+def select_models(providers: list = None, models: list = None) -> dict:
+    """
+    Resolve a provider/model selection against the registry.
+
+    Args:
+        providers: Provider names to run (default: all registered providers)
+        models: Models to run (default: every model of the selected providers). A model
+            outside the registry can be given as "api_name:model_name".
+
+    Returns:
+        Mapping from api_name to the list of models to run, in registry order
+    """
+    for api_name in providers or []:
+        if api_name not in PROVIDERS:
+            raise ValueError(f"Unknown provider: {api_name} (registered: {', '.join(PROVIDERS)})")
+    selected_providers = providers or list(PROVIDERS)
+
+    if not models:
+        return {api_name: list(PROVIDERS[api_name]["models"])
+                for api_name in PROVIDERS if api_name in selected_providers}
+
+    selection = {}
+    for model_spec in models:
+        if ":" in model_spec:
+            api_name, model_name = model_spec.split(":", 1)
+            if api_name not in PROVIDERS:
+                raise ValueError(f"Unknown provider: {api_name} (registered: {', '.join(PROVIDERS)})")
+        else:
+            model_name = model_spec
+            api_name = next((name for name, provider in PROVIDERS.items() if model_name in provider["models"]), None)
+            if api_name is None:
+                raise ValueError(f"Unknown model: {model_name} (use api_name:model_name for unregistered models)")
+        if "_" in model_name:
+            # Output file names are split on underscores, so model names must not contain any
+            raise ValueError(f"Model names must not contain underscores: {model_name}")
+        if api_name in selected_providers and model_name not in selection.get(api_name, []):
+            selection.setdefault(api_name, []).append(model_name)
+    if not selection:
+        raise ValueError(f"No models selected from providers {selected_providers}: {models}")
+    return {api_name: selection[api_name] for api_name in PROVIDERS if api_name in selection}
+
+
+def get_api_configs(output_base_dir: str = "output", providers: list = None, models: list = None) -> list:
+    """
+    Get the providers, models, review functions and output directories to run.
+
+    Only the selected providers' modules (and so their SDKs) are imported.
+
+    Args:
+        output_base_dir: Base directory for all outputs (default: "output")
+        providers: Provider names to run (default: all)
+        models: Models to run (default: all models of the selected providers)
+    """
+    return [
+        {
+            "api_name": api_name,
+            "models": model_names,
+            "function": get_review_function(api_name),
+            "output_dir": os.path.join(output_base_dir, PROVIDERS[api_name]["output_dir"]),
+            "max_samples_per_request": PROVIDERS[api_name].get("max_samples_per_request", 1),
+        }
+        for api_name, model_names in select_models(providers, models).items()
+    ]
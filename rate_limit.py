@@ -0,0 +1,263 @@
+import email.utils
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+
+# HTTP status codes worth retrying; 429 and 529 mean the provider is rate limiting or overloaded
+RATE_LIMIT_STATUS_CODES = (429, 529)
+TRANSIENT_STATUS_CODES = (408, 500, 502, 503, 504)
+
+# Token estimate for a review call before any usage has been observed for the model
+DEFAULT_TOKEN_ESTIMATE = 30000
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate_per_minute, holding up to one minute's budget.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def acquire(self, amount: float = 1):
+        """
+        Block until amount tokens are available, then take them.
+        """
+        # A single request larger than the bucket waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate_per_second
+            time.sleep(wait)
+
+    def adjust(self, amount: float):
+        """
+        Take (or give back, if negative) tokens without waiting; the balance may go negative.
+        """
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    Concurrency limit adjusted with AIMD: each success raises the limit by 1/limit
+    (about +1 per round of calls), and each rate-limit response halves it.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max(min_limit, max_limit)
+        self.min_limit = min_limit
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        with self._condition:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+    def on_overload(self):
+        with self._condition:
+            self.limit = max(self.min_limit, self.limit / 2.0)
+
+
+class ProviderRateLimiter:
+    """
+    Per-provider rate limiting: request-per-minute and token-per-minute buckets,
+    an AIMD concurrency limit, and a shared pause honoring Retry-After, so one
+    rate-limit response slows down every call to that provider instead of each
+    call retrying on its own.
+    """
+
+    def __init__(self, max_concurrency: int, requests_per_minute: float = None, tokens_per_minute: float = None):
+        self.concurrency = AdaptiveConcurrencyLimit(max_concurrency)
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.paused_until = 0.0
+        self._token_estimates = {}
+        self._lock = threading.Lock()
+
+    def estimate_tokens(self, model_name: str) -> float:
+        """
+        Estimate the tokens of the next call from the running average for the model.
+        """
+        with self._lock:
+            return self._token_estimates.get(model_name, DEFAULT_TOKEN_ESTIMATE)
+
+    @contextmanager
+    def slot(self, estimated_tokens: float = 0):
+        """
+        Wait for the pause, the buckets and a concurrency slot, and hold the slot for the call.
+        """
+        while True:
+            wait = self.paused_until - time.monotonic()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        if self.request_bucket is not None:
+            self.request_bucket.acquire(1)
+        if self.token_bucket is not None and estimated_tokens:
+            self.token_bucket.acquire(estimated_tokens)
+
+        self.concurrency.acquire()
+        try:
+            yield
+        finally:
+            self.concurrency.release()
+
+    def on_success(self, model_name: str, estimated_tokens: float, usage: dict = None):
+        """
+        Grow the concurrency limit and settle the token bucket with the actual usage.
+        """
+        self.concurrency.on_success()
+        if usage:
+            actual_tokens = usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+            if self.token_bucket is not None:
+                self.token_bucket.adjust(actual_tokens - estimated_tokens)
+            with self._lock:
+                previous = self._token_estimates.get(model_name, actual_tokens)
+                self._token_estimates[model_name] = 0.8 * previous + 0.2 * actual_tokens
+
+    def on_rate_limited(self, retry_after: float = None):
+        """
+        Halve the concurrency limit and pause the provider for Retry-After seconds if given.
+        """
+        self.concurrency.on_overload()
+        if retry_after:
+            with self._lock:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+
+def get_status_code(error: Exception):
+    """
+    Get the HTTP status code of an SDK error (openai, anthropic or google-genai), if any.
+    """
+    for attribute in ("status_code", "code", "status"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    Whether an error means the provider is rate limiting or overloaded.
+    """
+    return get_status_code(error) in RATE_LIMIT_STATUS_CODES or "overloaded" in str(error).lower()
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Whether an error is a rate limit or a transient server/connection failure.
+    """
+    if is_rate_limit_error(error) or get_status_code(error) in TRANSIENT_STATUS_CODES:
+        return True
+    # Connection errors and timeouts carry no status code; match them by class name
+    # so this module does not have to import every SDK
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def get_retry_after(error: Exception):
+    """
+    Get the Retry-After delay in seconds from an SDK error's response headers, if present.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    # HTTP-date form
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def backoff_delay(retry: int, base_delay: float = 2.0, max_delay: float = 120.0, retry_after: float = None) -> float:
+    """
+    Exponential backoff with full jitter, never shorter than Retry-After.
+
+    Args:
+        retry: Zero-based retry number
+        base_delay: Delay scale of the first retry in seconds
+        max_delay: Cap on the exponential delay in seconds
+        retry_after: Delay requested by the provider, if any
+
+    Returns:
+        Seconds to wait before the next attempt
+    """
+    delay = random.uniform(0, min(max_delay, base_delay * (2 ** retry)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def build_rate_limiters(api_names, max_workers: int, provider_concurrency: dict = None,
+                        requests_per_minute: dict = None, tokens_per_minute: dict = None) -> dict:
+    """
+    Build one ProviderRateLimiter per provider.
+
+    Args:
+        api_names: Provider names
+        max_workers: Default concurrency cap per provider
+        provider_concurrency: Optional mapping from api_name to its concurrency cap
+        requests_per_minute: Optional mapping from api_name to its request-per-minute budget
+        tokens_per_minute: Optional mapping from api_name to its token-per-minute budget
+
+    Returns:
+        Mapping from api_name to its ProviderRateLimiter
+    """
+    provider_concurrency = provider_concurrency or {}
+    requests_per_minute = requests_per_minute or {}
+    tokens_per_minute = tokens_per_minute or {}
+    return {
+        api_name: ProviderRateLimiter(
+            provider_concurrency.get(api_name, max_workers),
+            requests_per_minute=requests_per_minute.get(api_name),
+            tokens_per_minute=tokens_per_minute.get(api_name),
+        )
+        for api_name in api_names
+    }
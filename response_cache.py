@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    Content-addressed cache of review responses.
+
+    Responses are keyed on the PDF bytes hash, the guidance text hash, the model,
+    the generation parameters and the sample index, so renaming a PDF reuses its
+    reviews while editing the guidance invalidates them. Response texts are stored
+    as files under objects/, and a SQLite manifest records each entry's size and last
+    access for least-recently-used eviction beyond max_bytes; triggers keep the total
+    size in a one-row table, so a put never sums the manifest. The manifest also
+    records which cache key produced each output file, so stale outputs written
+    with different inputs can be detected.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "manifest.sqlite"),
+                                     check_same_thread=False, isolation_level=None, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                model_name TEXT,
+                pdf_sha256 TEXT,
+                sample_index INTEGER,
+                size INTEGER NOT NULL,
+                created_at REAL,
+                last_access REAL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        # Running total of the entry sizes, seeded from the manifest once and kept up to
+        # date by every process writing to the cache
+        self._conn.execute("BEGIN IMMEDIATE")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY, total_bytes INTEGER NOT NULL)")
+        self._conn.execute("INSERT OR IGNORE INTO totals SELECT 0, COALESCE(SUM(size), 0) FROM entries")
+        self._conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries
+            BEGIN UPDATE totals SET total_bytes = total_bytes + NEW.size; END
+        """)
+        self._conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries
+            BEGIN UPDATE totals SET total_bytes = total_bytes + NEW.size - OLD.size; END
+        """)
+        self._conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries
+            BEGIN UPDATE totals SET total_bytes = total_bytes - OLD.size; END
+        """)
+        self._conn.execute("COMMIT")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outputs (
+                output_file_path TEXT PRIMARY KEY,
+                key TEXT NOT NULL
+            )
+        """)
+
+    @staticmethod
+    def make_key(pdf_sha256: str, guidance_sha256: str, model_name: str, params: dict, sample_index: int) -> str:
+        """
+        Build the cache key of one review call.
+
+        Args:
+            pdf_sha256: Hash of the PDF bytes
+            guidance_sha256: Hash of the reviewer guidance text
+            model_name: Model the review is generated with
+            params: Generation parameters that affect the response (JSON-serializable)
+            sample_index: Index of the sample (attempt) for this input
+
+        Returns:
+            SHA-256 hex digest identifying the call
+        """
+        payload = json.dumps([pdf_sha256, guidance_sha256, model_name, params, sample_index], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _object_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, "objects", key[:2], key + ".txt")
+
+    def get(self, key: str):
+        """
+        Get the cached response text for a key, or None on a miss.
+        """
+        object_path = self._object_path(key)
+        try:
+            with open(object_path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        return text
+
+    def put(self, key: str, text: str, model_name: str = None, pdf_sha256: str = None, sample_index: int = None):
+        """
+        Store a response text and evict least recently used entries beyond max_bytes.
+        """
+        object_path = self._object_path(key)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        data = text.encode("utf-8")
+        with open(object_path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(object_path + ".tmp", object_path)
+
+        now = time.time()
+        with self._lock:
+            # An upsert, not INSERT OR REPLACE: the rows REPLACE deletes fire no delete trigger
+            self._conn.execute(
+                "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                "model_name = excluded.model_name, pdf_sha256 = excluded.pdf_sha256, "
+                "sample_index = excluded.sample_index, size = excluded.size, "
+                "created_at = excluded.created_at, last_access = excluded.last_access",
+                (key, model_name, pdf_sha256, sample_index, len(data), now, now))
+            self._evict()
+
+    def total_bytes(self) -> int:
+        """
+        Total size of the cached responses.
+        """
+        with self._lock:
+            return self._total_bytes()
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute("SELECT total_bytes FROM totals").fetchone()[0]
+
+    def _evict(self, batch_size: int = 64):
+        # Walk the last_access index from the oldest entry, a batch at a time, so a cache
+        # at its limit only reads the few entries each put displaces
+        while self._total_bytes() > self.max_bytes:
+            rows = self._conn.execute("SELECT key FROM entries ORDER BY last_access LIMIT ?",
+                                      (batch_size,)).fetchall()
+            if not rows:
+                break
+            for (key,) in rows:
+                try:
+                    os.remove(self._object_path(key))
+                except FileNotFoundError:
+                    pass
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                if self._total_bytes() <= self.max_bytes:
+                    break
+
+    def record_output(self, output_file_path: str, key: str):
+        """
+        Record that an output file holds the response for key.
+        """
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO outputs VALUES (?, ?)",
+                               (os.path.abspath(output_file_path), key))
+
+    def output_key(self, output_file_path: str):
+        """
+        Get the cache key an output file was written from, or None if unknown.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT key FROM outputs WHERE output_file_path = ?",
+                                     (os.path.abspath(output_file_path),)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
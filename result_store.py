@@ -0,0 +1,357 @@
+import argparse
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from providers import PROVIDERS
+from review_scores import SCORE_TYPES, extract_scores_from_text
+
+
+# Number of JSONL shard files new results are spread over
+DEFAULT_NUM_SHARDS = 16
+
+
+def _truncate_torn_line(path: str, block_size: int = 65536) -> int:
+    # Cut a file back to its last complete line, scanning backwards from the end
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        lines_end = 0
+        while position > 0:
+            start = max(0, position - block_size)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline != -1:
+                lines_end = start + newline + 1
+                break
+            position = start
+        if lines_end != end:
+            f.truncate(lines_end)
+        return lines_end
+
+
+class ResultStore:
+    """
+    Append-only sharded store of review results.
+
+    Each result is one JSON line holding the review text, its extracted scores and
+    the call metadata (latency, token usage, retries, generation parameters). Lines
+    are appended to one of num_shards JSONL files chosen by (model, paper), so a
+    corpus of any size stays a handful of files. A SQLite index maps each
+    (model, paper, attempt) to its latest line and carries the scores, so lookups
+    and score queries never scan the shards. Writing the same key again appends a
+    new line that supersedes the old one.
+
+    The store has a single writer, which holds an exclusive lock on writer.lock while
+    it is open. A crash can at most leave a torn last line or lines missing from the
+    index; the writer repairs both when it opens the store. Read-only stores take no
+    lock, never touch the shards and see the results indexed so far.
+    """
+
+    def __init__(self, store_dir: str, num_shards: int = DEFAULT_NUM_SHARDS, read_only: bool = False):
+        """
+        Args:
+            store_dir: Store directory, created if missing (unless read_only)
+            num_shards: Number of JSONL shards new results are spread over (default: 16)
+            read_only: Open for queries and exports only, alongside a running writer (default: False)
+        """
+        self.store_dir = store_dir
+        self.num_shards = num_shards
+        self.read_only = read_only
+
+        self._lock = threading.Lock()
+        self._shard_locks = [threading.Lock() for _ in range(num_shards)]
+        self._shard_files = {}
+        self._writer_lock = None
+        index_path = os.path.join(store_dir, "index.sqlite")
+        if read_only:
+            if not os.path.exists(index_path):
+                raise FileNotFoundError(f"No result store index at {index_path}")
+            self._conn = sqlite3.connect(index_path, check_same_thread=False, isolation_level=None, timeout=60)
+            self._conn.execute("PRAGMA query_only=ON")
+            return
+
+        os.makedirs(store_dir, exist_ok=True)
+        self._writer_lock = open(os.path.join(store_dir, "writer.lock"), "a")
+        try:
+            fcntl.flock(self._writer_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._writer_lock.close()
+            raise RuntimeError(f"Another process is writing to the result store {store_dir}") from None
+        self._conn = sqlite3.connect(index_path, check_same_thread=False, isolation_level=None, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        score_columns = ", ".join(f"{score_type} INTEGER" for score_type in SCORE_TYPES)
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS results (
+                model_name TEXT NOT NULL,
+                pdf_name TEXT NOT NULL,
+                attempt INTEGER NOT NULL,
+                api_name TEXT NOT NULL,
+                shard INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                created_at REAL,
+                {score_columns},
+                PRIMARY KEY (model_name, pdf_name, attempt)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_pdf ON results (pdf_name)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_shard ON results (shard, offset)")
+        self._recover()
+
+    def _shard_path(self, shard: int) -> str:
+        return os.path.join(self.store_dir, f"shard-{shard:03d}.jsonl")
+
+    def _shard_of(self, model_name: str, pdf_name: str) -> int:
+        return zlib.crc32(f"{model_name}/{pdf_name}".encode("utf-8")) % self.num_shards
+
+    def _index_rows(self, shard: int, offset: int, length: int, record: dict) -> tuple:
+        scores = record.get("scores") or {}
+        return (record["model_name"], record["pdf_name"], record["attempt"], record["api_name"],
+                shard, offset, length, record.get("created_at"),
+                *(scores.get(score_type) for score_type in SCORE_TYPES))
+
+    def _insert(self, rows: list):
+        placeholders = ", ".join("?" * (8 + len(SCORE_TYPES)))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(f"INSERT OR REPLACE INTO results VALUES ({placeholders})", rows)
+            self._conn.execute("COMMIT")
+
+    def _recover(self):
+        # Drop a torn last line, then index every line past the last indexed one; only the
+        # writer holding writer.lock gets here, so no other append can be in progress
+        for file_name in sorted(os.listdir(self.store_dir)):
+            if not (file_name.startswith("shard-") and file_name.endswith(".jsonl")):
+                continue
+            shard = int(file_name[len("shard-"):-len(".jsonl")])
+            path = os.path.join(self.store_dir, file_name)
+            data_end = _truncate_torn_line(path)
+
+            indexed_end = self._conn.execute(
+                "SELECT MAX(offset + length + 1) FROM results WHERE shard = ?", (shard,)).fetchone()[0] or 0
+            if indexed_end >= data_end:
+                continue
+            rows = []
+            with open(path, "rb") as f:
+                f.seek(indexed_end)
+                offset = indexed_end
+                for line in f:
+                    rows.append(self._index_rows(shard, offset, len(line) - 1, json.loads(line)))
+                    offset += len(line)
+            self._insert(rows)
+
+    def append(self, api_name: str, model_name: str, pdf_name: str, attempt: int, text: str,
+               scores: dict = None, metadata: dict = None):
+        """
+        Append a review result, superseding any earlier result for the same key.
+
+        Args:
+            api_name: Provider the review came from
+            model_name: Model the review was generated with
+            pdf_name: Paper name
+            attempt: Sample index
+            text: Review text
+            scores: Extracted scores (default: parsed from text)
+            metadata: Call metadata such as latency, usage, retries and parameters
+        """
+        record = {
+            "api_name": api_name,
+            "model_name": model_name,
+            "pdf_name": pdf_name,
+            "attempt": attempt,
+            "created_at": time.time(),
+            "scores": scores if scores is not None else extract_scores_from_text(text),
+            "metadata": metadata or {},
+            "text": text,
+        }
+        if self.read_only:
+            raise PermissionError(f"The result store {self.store_dir} is open read-only")
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        shard = self._shard_of(model_name, pdf_name)
+        with self._shard_locks[shard]:
+            f = self._shard_files.get(shard)
+            if f is None:
+                f = self._shard_files[shard] = open(self._shard_path(shard), "ab")
+            offset = f.seek(0, os.SEEK_END)
+            f.write(line + b"\n")
+            f.flush()
+            # Index under the shard lock: recovery only indexes lines past the last indexed
+            # one, so a later line indexed first would hide this one after a crash
+            self._insert([self._index_rows(shard, offset, len(line), record)])
+
+    def contains(self, model_name: str, pdf_name: str, attempt: int) -> bool:
+        """
+        Whether a result is stored for (model, paper, attempt).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM results WHERE model_name = ? AND pdf_name = ? AND attempt = ?",
+                (model_name, pdf_name, attempt)).fetchone()
+        return row is not None
+
+    def keys(self) -> set:
+        """
+        Get every stored (model_name, pdf_name, attempt).
+        """
+        with self._lock:
+            return set(self._conn.execute("SELECT model_name, pdf_name, attempt FROM results"))
+
+    def _read(self, shard: int, offset: int, length: int) -> dict:
+        with open(self._shard_path(shard), "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def get(self, model_name: str, pdf_name: str, attempt: int):
+        """
+        Get the full record (text, scores, metadata) of a result, or None if absent.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT shard, offset, length FROM results WHERE model_name = ? AND pdf_name = ? AND attempt = ?",
+                (model_name, pdf_name, attempt)).fetchone()
+        return self._read(*row) if row else None
+
+    def query(self, model_name: str = None, pdf_name: str = None) -> list:
+        """
+        Get the scores of stored results from the index, optionally filtered by model and paper.
+
+        Returns:
+            Sorted list of (api_name, model_name, pdf_name, attempt, scores) tuples
+        """
+        conditions, params = [], []
+        if model_name:
+            conditions.append("model_name = ?")
+            params.append(model_name)
+        if pdf_name:
+            conditions.append("pdf_name = ?")
+            params.append(pdf_name)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT api_name, model_name, pdf_name, attempt, {', '.join(SCORE_TYPES)} FROM results {where} "
+                f"ORDER BY model_name, pdf_name, attempt", params).fetchall()
+        return [
+            (api_name, row_model, row_pdf, attempt,
+             {score_type: value for score_type, value in zip(SCORE_TYPES, values) if value is not None})
+            for api_name, row_model, row_pdf, attempt, *values in rows
+        ]
+
+    def iter_records(self):
+        """
+        Yield the latest record of every result, reading each shard sequentially.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT shard, offset, length FROM results ORDER BY shard, offset").fetchall()
+        current_shard, f = None, None
+        try:
+            for shard, offset, length in rows:
+                if shard != current_shard:
+                    if f is not None:
+                        f.close()
+                    f = open(self._shard_path(shard), "rb")
+                    current_shard = shard
+                f.seek(offset)
+                yield json.loads(f.read(length))
+        finally:
+            if f is not None:
+                f.close()
+
+    def to_score_table(self) -> dict:
+        """
+        Build a score table (see score_table.make_score_table) from the index.
+        """
+        from score_table import make_score_table
+
+        results = self.query()
+        rows = [(self.store_dir, f"{model_name}_{pdf_name}_{attempt}.txt", model_name, pdf_name, attempt)
+                for _, model_name, pdf_name, attempt, _ in results]
+        return make_score_table(rows, [scores for *_, scores in results])
+
+    def export_txt(self, output_base_dir: str = "output", overwrite: bool = False) -> int:
+        """
+        Write every stored review to the legacy {output_dir}/{model}_{pdf}_{attempt}.txt layout.
+
+        Args:
+            output_base_dir: Base directory holding the per-provider output directories
+            overwrite: Replace review files that already exist (default: False)
+
+        Returns:
+            Number of files written
+        """
+        written = 0
+        for record in self.iter_records():
+            api_name = record["api_name"]
+            output_dir = os.path.join(output_base_dir,
+                                      PROVIDERS.get(api_name, {}).get("output_dir", f"output_{api_name}"))
+            output_file_path = os.path.join(
+                output_dir, f"{record['model_name']}_{record['pdf_name']}_{record['attempt']}.txt")
+            if not overwrite and os.path.exists(output_file_path):
+                continue
+            os.makedirs(output_dir, exist_ok=True)
+            with open(output_file_path + ".tmp", "w") as f:
+                f.write(record["text"])
+            os.replace(output_file_path + ".tmp", output_file_path)
+            written += 1
+        return written
+
+    def import_txt(self, output_base_dir: str = "output") -> int:
+        """
+        Append the legacy review files of the per-provider output directories that are not stored yet.
+
+        Returns:
+            Number of reviews imported
+        """
+        from score_table import parse_review_filename
+
+        stored = self.keys()
+        imported = 0
+        for api_name, provider in PROVIDERS.items():
+            output_dir = os.path.join(output_base_dir, provider["output_dir"])
+            if not os.path.isdir(output_dir):
+                continue
+            for file_name in sorted(os.listdir(output_dir)):
+                parsed = parse_review_filename(file_name)
+                if parsed is None or parsed in stored:
+                    continue
+                with open(os.path.join(output_dir, file_name), "r", encoding="utf-8") as f:
+                    text = f.read()
+                self.append(api_name, *parsed, text, metadata={"imported_from": file_name})
+                imported += 1
+        return imported
+
+    def close(self):
+        for f in self._shard_files.values():
+            f.close()
+        self._shard_files.clear()
+        with self._lock:
+            self._conn.close()
+        if self._writer_lock is not None:
+            self._writer_lock.close()
+            self._writer_lock = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert between a result store and the legacy .txt layout")
+    parser.add_argument("store", type=str, help="Result store directory")
+    parser.add_argument("--export_txt", action="store_true",
+                        help="Write stored reviews as {model}_{pdf}_{attempt}.txt files under --output")
+    parser.add_argument("--import_txt", action="store_true",
+                        help="Add the .txt review files under --output to the store")
+    parser.add_argument("--output", type=str, default="output",
+                        help="Base output directory (default: output)")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="With --export_txt, replace existing review files")
+
+    args = parser.parse_args()
+
+    # Exporting only reads the index, so it can run alongside a generation run
+    store = ResultStore(args.store, read_only=not args.import_txt)
+    if args.import_txt:
+        print(f"Imported {store.import_txt(args.output)} reviews into {args.store}")
+    if args.export_txt:
+        print(f"Exported {store.export_txt(args.output, overwrite=args.overwrite)} reviews to {args.output}")
+    store.close()
@@ -0,0 +1,325 @@
+import argparse
+import os
+import re
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from score_table import CHUNK_SIZE, PARALLEL_THRESHOLD, parse_review_filename
+
+
+# Text sections of the review format in reviewer_guidance.txt that are indexed
+REVIEW_SECTIONS = ("summary", "strengths", "weaknesses", "questions")
+
+# Every field heading of the format, so a section ends where the next field starts.
+# Headings may carry "##" or bold markers, e.g. "## Weaknesses:" or "**Weaknesses:**";
+# a markdown heading on a line of its own ("## Weaknesses") needs no colon.
+SECTION_HEADING_PATTERN = re.compile(
+    r"^[ \t]*(?:(?P<markdown>#+)[ \t]*)?(?:\*\*)?(?P<field>Summary|Soundness|Presentation|Contribution|Strengths"
+    r"|Weaknesses|Questions|Flag For Ethics Review|Rating|Confidence|Code Of Conduct)[ \t]*(?:\*\*)?[ \t]*"
+    r"(?::(?:\*\*)?|(?(markdown)[ \t]*$|(?!)))",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Version of the section parsing; an index built by another version is re-read from scratch
+SECTION_PARSER_VERSION = 2
+
+# Default location of the index, shared by all output directories
+DEFAULT_INDEX_PATH = os.path.join("output", "review_index.sqlite")
+
+# Quoted phrases or single terms of a search query
+QUERY_TERM_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def extract_review_sections(content: str) -> dict:
+    """
+    Split review text into its Summary, Strengths, Weaknesses and Questions sections.
+
+    A section runs from its heading to the next field heading; the first occurrence
+    of each section wins. Markdown headings ("## Strengths") take precedence: in a
+    review that uses them, bold lines such as "**Strengths:**" under "## Soundness: 3"
+    are sub-headings of that section, and only fill in sections without a heading.
+
+    Returns:
+        dict: Section name to its stripped text, for the sections present
+    """
+    sections = {}
+    matches = list(SECTION_HEADING_PATTERN.finditer(content))
+    ends = [match.start() for match in matches[1:]] + [len(content)]
+    for markdown_only in (True, False):
+        for match, end in zip(matches, ends):
+            field = match.group("field").lower()
+            if field not in REVIEW_SECTIONS or field in sections or (markdown_only and not match.group("markdown")):
+                continue
+            sections[field] = content[match.end():end].strip()
+    return sections
+
+
+def _extract_sections_from_files(file_paths: list) -> list:
+    # Worker task: read a chunk of files and split each one into its sections
+    results = []
+    for file_path in file_paths:
+        with open(file_path, "r", encoding="utf-8") as f:
+            results.append(extract_review_sections(f.read()))
+    return results
+
+
+def extract_sections_parallel(file_paths: list, num_workers: int = None) -> list:
+    """
+    Extract the sections of many review files, over a process pool for large inputs.
+
+    Returns:
+        List of section dicts, in the order of file_paths
+    """
+    if len(file_paths) < PARALLEL_THRESHOLD or num_workers == 1:
+        return _extract_sections_from_files(file_paths)
+
+    chunks = [file_paths[i:i + CHUNK_SIZE] for i in range(0, len(file_paths), CHUNK_SIZE)]
+    results = []
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for chunk_results in executor.map(_extract_sections_from_files, chunks):
+            results.extend(chunk_results)
+    return results
+
+
+def build_match_query(query: str, section: str = None) -> str:
+    """
+    Turn a search query into an FTS5 MATCH expression.
+
+    Every term must occur (in any order); "quoted words" must occur as a phrase.
+    Terms are quoted, so punctuation and FTS5 operators in the query are taken literally.
+
+    Args:
+        query: Search words and quoted phrases
+        section: Optional section the terms must occur in
+
+    Returns:
+        The MATCH expression
+    """
+    terms = []
+    for phrase, word in QUERY_TERM_PATTERN.findall(query):
+        text = (phrase or word).replace('"', "")
+        if text.strip():
+            terms.append('"' + text + '"')
+    if not terms:
+        raise ValueError(f"Empty search query: {query!r}")
+    if section is None:
+        return " ".join(terms)
+    if section not in REVIEW_SECTIONS:
+        raise ValueError(f"section must be one of {REVIEW_SECTIONS}, got {section!r}")
+    return f"{{{section}}} : ({' '.join(terms)})"
+
+
+class ReviewIndex:
+    """
+    Persistent full-text index over the text sections of review files.
+
+    The Summary, Strengths, Weaknesses and Questions sections of every review file
+    of the indexed output directories are stored in one SQLite FTS5 table, an
+    on-disk inverted index with one column per section and Porter stemming. Like
+    ScoreIndex, each file is recorded with its mtime and size, and update() only
+    re-reads files that are new or changed and drops files that were deleted.
+
+    search() ranks matching reviews with BM25 and counts the matches per model and
+    per paper, next to the number of reviews each has, so "which papers most often
+    get this weakness, from which models" is one query.
+    """
+
+    def __init__(self, index_path: str = DEFAULT_INDEX_PATH):
+        self.index_path = index_path
+        os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(index_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                file_id INTEGER PRIMARY KEY,
+                output_dir TEXT NOT NULL,
+                file_name TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                pdf_name TEXT NOT NULL,
+                attempt INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                UNIQUE (output_dir, file_name)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_model_pdf ON files (model_name, pdf_name)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_pdf ON files (pdf_name)")
+        # The section texts are the index's own content; rowid is the file_id
+        self._conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS sections USING fts5(
+                {', '.join(REVIEW_SECTIONS)}, tokenize = 'porter unicode61'
+            )
+        """)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SECTION_PARSER_VERSION:
+            with self._conn:
+                self._conn.execute("DELETE FROM files")
+                self._conn.execute("DELETE FROM sections")
+                self._conn.execute(f"PRAGMA user_version = {SECTION_PARSER_VERSION}")
+        # Indexed reviews per model and per paper for the facets, until the next update()
+        self._totals = {}
+
+    def update(self, output_dirs, num_workers: int = None) -> dict:
+        """
+        Bring the index up to date with the review files of the output directories.
+
+        Files of directories not passed are left in the index.
+
+        Args:
+            output_dirs: Output directory or list of directories holding review files
+            num_workers: Number of worker processes for reading changed files (default: CPU count)
+
+        Returns:
+            Counts of "added", "changed", "removed" and "unchanged" files
+        """
+        if isinstance(output_dirs, str):
+            output_dirs = [output_dirs]
+
+        counts = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        changed_files = []
+        removed = []
+        for output_dir in output_dirs:
+            known = {
+                file_name: (file_id, mtime_ns, size)
+                for file_id, file_name, mtime_ns, size in self._conn.execute(
+                    "SELECT file_id, file_name, mtime_ns, size FROM files WHERE output_dir = ?", (output_dir,))
+            }
+            seen = set()
+            if os.path.isdir(output_dir):
+                with os.scandir(output_dir) as entries:
+                    for entry in entries:
+                        parsed = parse_review_filename(entry.name)
+                        if parsed is None or not entry.is_file():
+                            continue
+                        seen.add(entry.name)
+                        stat = entry.stat()
+                        previous = known.get(entry.name)
+                        if previous is not None and previous[1:] == (stat.st_mtime_ns, stat.st_size):
+                            counts["unchanged"] += 1
+                            continue
+                        counts["changed" if previous else "added"] += 1
+                        changed_files.append((output_dir, entry.name, parsed, stat,
+                                              previous[0] if previous else None))
+            removed.extend(file_id for file_name, (file_id, _, _) in known.items() if file_name not in seen)
+        counts["removed"] = len(removed)
+
+        results = extract_sections_parallel(
+            [os.path.join(output_dir, file_name) for output_dir, file_name, _, _, _ in changed_files], num_workers)
+
+        placeholders = ", ".join("?" * len(REVIEW_SECTIONS))
+        self._totals = {}
+        with self._conn:
+            for file_id in removed + [file_id for *_, file_id in changed_files if file_id is not None]:
+                self._conn.execute("DELETE FROM sections WHERE rowid = ?", (file_id,))
+            self._conn.executemany("DELETE FROM files WHERE file_id = ?", [(file_id,) for file_id in removed])
+            for (output_dir, file_name, parsed, stat, file_id), sections in zip(changed_files, results):
+                # Changed files keep their file_id; new ones get the next free one
+                file_id = self._conn.execute(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (file_id, output_dir, file_name, *parsed, stat.st_mtime_ns, stat.st_size)).lastrowid
+                self._conn.execute(
+                    f"INSERT INTO sections (rowid, {', '.join(REVIEW_SECTIONS)}) VALUES (?, {placeholders})",
+                    (file_id, *(sections.get(section, "") for section in REVIEW_SECTIONS)))
+        return counts
+
+    def search(self, query: str, section: str = None, model_name: str = None, pdf_name: str = None,
+               limit: int = 20) -> dict:
+        """
+        Search the indexed reviews.
+
+        Args:
+            query: Search words, all of which must occur; "quoted words" must occur as a phrase
+            section: Optional section to search, one of REVIEW_SECTIONS (default: all)
+            model_name: Optional filter for a specific model
+            pdf_name: Optional filter for a specific PDF
+            limit: Maximum number of hits returned (default: 20)
+
+        Returns:
+            dict with "total" matching reviews, "hits" ranked best first (dicts with
+            output_dir, file_name, model_name, pdf_name, attempt, score and snippet),
+            and "models" and "papers" facets: lists of (name, matching reviews,
+            indexed reviews) sorted by matching reviews
+        """
+        conditions, params = ["sections MATCH ?"], [build_match_query(query, section)]
+        if model_name:
+            conditions.append("files.model_name = ?")
+            params.append(model_name)
+        if pdf_name:
+            conditions.append("files.pdf_name = ?")
+            params.append(pdf_name)
+        matches = f"FROM sections JOIN files ON files.file_id = sections.rowid WHERE {' AND '.join(conditions)}"
+
+        # The snippet comes from the searched section, or from the best-matching one
+        snippet_column = REVIEW_SECTIONS.index(section) if section else -1
+        rows = self._conn.execute(
+            f"SELECT files.output_dir, files.file_name, files.model_name, files.pdf_name, files.attempt, "
+            f"bm25(sections), snippet(sections, {snippet_column}, '[', ']', '...', 16) "
+            f"{matches} ORDER BY bm25(sections) LIMIT ?", params + [limit]).fetchall()
+        hits = [
+            {"output_dir": output_dir, "file_name": file_name, "model_name": row_model, "pdf_name": row_pdf,
+             "attempt": attempt, "score": -rank, "snippet": snippet}
+            for output_dir, file_name, row_model, row_pdf, attempt, rank, snippet in rows
+        ]
+
+        # One pass over the matches for both facets, then the totals of the matched names
+        matched = self._conn.execute(f"SELECT files.model_name, files.pdf_name {matches}", params).fetchall()
+        facets = {}
+        for facet, column, position in (("models", "model_name", 0), ("papers", "pdf_name", 1)):
+            hit_counts = Counter(row[position] for row in matched)
+            totals = self._get_totals(column) if hit_counts else {}
+            facets[facet] = sorted(((name, hits, totals[name]) for name, hits in hit_counts.items()),
+                                   key=lambda item: (-item[1], item[0]))
+        total = len(matched)
+        return {"total": total, "hits": hits, **facets}
+
+    def _get_totals(self, column: str) -> dict:
+        if column not in self._totals:
+            self._totals[column] = dict(self._conn.execute(f"SELECT {column}, COUNT(*) FROM files GROUP BY {column}"))
+        return self._totals[column]
+
+    def close(self):
+        self._conn.close()
+
+
+def print_search_results(results: dict, max_facets: int = 10):
+    """
+    Print the ranked hits and the model and paper facets of a search.
+    """
+    print(f"{results['total']} matching reviews")
+    for rank, hit in enumerate(results["hits"], 1):
+        print(f"{rank:3d}. [{hit['score']:.2f}] {os.path.join(hit['output_dir'], hit['file_name'])}")
+        print(f"     {' '.join(hit['snippet'].split())}")
+    for facet, label in (("models", "By model"), ("papers", "By paper")):
+        if results[facet]:
+            print(f"\n{label}:")
+            for name, hits, indexed in results[facet][:max_facets]:
+                print(f"  {name}: {hits}/{indexed} reviews ({hits / indexed:.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-text search over the sections of generated reviews")
+    parser.add_argument("query", type=str, help='Search words; "quoted words" match a phrase')
+    parser.add_argument("output_dirs", type=str, nargs="*",
+                        default=["output/output_openai", "output/output_claude", "output/output_gemini"],
+                        help="Output directories to index before searching (default: the three output/output_* directories)")
+    parser.add_argument("--index", type=str, default=DEFAULT_INDEX_PATH,
+                        help=f"Index file (default: {DEFAULT_INDEX_PATH})")
+    parser.add_argument("--section", type=str, default=None, choices=REVIEW_SECTIONS,
+                        help="Only search this section (default: all)")
+    parser.add_argument("--model", type=str, default=None, help="Only search reviews of this model")
+    parser.add_argument("--paper", type=str, default=None, help="Only search reviews of this paper")
+    parser.add_argument("--limit", type=int, default=20, help="Number of hits to show (default: 20)")
+
+    args = parser.parse_args()
+
+    index = ReviewIndex(args.index)
+    started_at = time.perf_counter()
+    counts = index.update(args.output_dirs)
+    print(f"Review index: {counts['added']} added, {counts['changed']} changed, "
+          f"{counts['removed']} removed, {counts['unchanged']} unchanged ({time.perf_counter() - started_at:.2f}s)")
+    started_at = time.perf_counter()
+    results = index.search(args.query, section=args.section, model_name=args.model, pdf_name=args.paper,
+                           limit=args.limit)
+    print(f"Search took {(time.perf_counter() - started_at) * 1000:.1f}ms\n")
+    print_search_results(results)
+    index.close()
@@ -0,0 +1,52 @@
+import re
+
+
+# Score fields of the review format in reviewer_guidance.txt
+SCORE_TYPES = ['soundness', 'presentation', 'contribution', 'rating', 'confidence']
+
+# Scale (min, max) of each score field in reviewer_guidance.txt
+SCORE_RANGES = {
+    'soundness': (1, 4),
+    'presentation': (1, 4),
+    'contribution': (1, 4),
+    'rating': (1, 10),
+    'confidence': (1, 5),
+}
+
+# Pattern 1: "## Soundness: 3" (with ##)
+# Pattern 2: "Soundness: 3" (without ##, standalone line)
+# Rating and Confidence may also be bold, e.g. "Rating: **8**"
+# All five fields are matched by one compiled pattern, so each review is scanned once.
+SCORE_PATTERN = re.compile(
+    r"(?:##\s*)?(?:(?P<plain>Soundness|Presentation|Contribution):\s*(?P<plain_value>\d+)"
+    r"|(?P<bold>Rating|Confidence):\s*\*?\*?(?P<bold_value>\d+)\*?\*?)",
+    re.IGNORECASE,
+)
+
+
+def extract_scores_from_text(content: str, complete: bool = True) -> dict:
+    """
+    Extract numerical scores from review text in a single pass.
+    
+    The first occurrence of each field wins, and the scan stops once all fields are found.
+    
+    Args:
+        content: Review text
+        complete: Whether the text is final; for partial (streamed) text, a number at
+            the very end may still grow, e.g. "Rating: 1" of "Rating: 10", so it is skipped
+    
+    Returns:
+        dict: Dictionary with score types and their values
+    """
+    scores = {}
+    for match in SCORE_PATTERN.finditer(content):
+        value_group = "plain_value" if match.group("plain") else "bold_value"
+        score_type = (match.group("plain") or match.group("bold")).lower()
+        if score_type in scores:
+            continue
+        if not complete and match.end(value_group) == len(content):
+            continue
+        scores[score_type] = int(match.group(value_group))
+        if len(scores) == len(SCORE_TYPES):
+            break
+    return scores
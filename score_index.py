@@ -0,0 +1,131 @@
+import hashlib
+import os
+import sqlite3
+from review_scores import SCORE_TYPES
+from score_table import extract_scores_parallel, parse_review_filename
+
+
+# Index file kept inside each output directory
+INDEX_FILE_NAME = ".score_index.sqlite"
+
+
+class ScoreIndex:
+    """
+    Persistent score index of one output directory.
+
+    Each review file is recorded with its mtime, size and content hash next to its
+    parsed scores. update() re-parses only files that are new or whose content
+    changed, and drops files that were deleted. A file whose mtime changed but whose
+    size did not is hashed first, and only re-parsed if its hash differs, so touched
+    or re-copied files cost a read but no parsing. Repeated analysis of a large,
+    growing output directory only pays for the delta. Model and paper filters are
+    answered from the index without opening any review file.
+    """
+
+    def __init__(self, output_dir: str, index_path: str = None):
+        self.output_dir = output_dir
+        self._conn = sqlite3.connect(index_path or os.path.join(output_dir, INDEX_FILE_NAME))
+        score_columns = ", ".join(f"{score_type} INTEGER" for score_type in SCORE_TYPES)
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS files (
+                file_name TEXT PRIMARY KEY,
+                model_name TEXT NOT NULL,
+                pdf_name TEXT NOT NULL,
+                attempt INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                {score_columns}
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_model_pdf ON files (model_name, pdf_name)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_pdf ON files (pdf_name)")
+
+    def update(self, num_workers: int = None) -> dict:
+        """
+        Bring the index up to date with the review files on disk.
+
+        Args:
+            num_workers: Number of worker processes for parsing changed files (default: CPU count)
+
+        Returns:
+            Counts of "added", "changed", "removed" and "unchanged" files
+        """
+        known = {
+            file_name: (mtime_ns, size, sha256)
+            for file_name, mtime_ns, size, sha256 in self._conn.execute(
+                "SELECT file_name, mtime_ns, size, sha256 FROM files")
+        }
+
+        changed_files = []
+        touched = []
+        seen = set()
+        counts = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        with os.scandir(self.output_dir) as entries:
+            for entry in entries:
+                parsed = parse_review_filename(entry.name)
+                if parsed is None or not entry.is_file():
+                    continue
+                seen.add(entry.name)
+                stat = entry.stat()
+                previous = known.get(entry.name)
+                if previous is not None and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+                    counts["unchanged"] += 1
+                    continue
+                if previous is not None and previous[1] == stat.st_size:
+                    # Same size, new mtime: only the hash tells whether the content changed
+                    with open(entry.path, "rb") as f:
+                        if hashlib.sha256(f.read()).hexdigest() == previous[2]:
+                            counts["unchanged"] += 1
+                            touched.append((stat.st_mtime_ns, entry.name))
+                            continue
+                counts["changed" if previous else "added"] += 1
+                changed_files.append((entry.name, parsed, stat))
+
+        removed = [file_name for file_name in known if file_name not in seen]
+        counts["removed"] = len(removed)
+
+        results = extract_scores_parallel(
+            [os.path.join(self.output_dir, file_name) for file_name, _, _ in changed_files],
+            num_workers, with_hash=True)
+
+        placeholders = ", ".join("?" * (7 + len(SCORE_TYPES)))
+        with self._conn:
+            self._conn.executemany("DELETE FROM files WHERE file_name = ?", [(file_name,) for file_name in removed])
+            self._conn.executemany("UPDATE files SET mtime_ns = ? WHERE file_name = ?", touched)
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO files VALUES ({placeholders})",
+                [
+                    (file_name, *parsed, stat.st_mtime_ns, stat.st_size, sha256,
+                     *(scores.get(score_type) for score_type in SCORE_TYPES))
+                    for (file_name, parsed, stat), (scores, sha256) in zip(changed_files, results)
+                ])
+        return counts
+
+    def query(self, model_name: str = None, pdf_name: str = None) -> list:
+        """
+        Get the indexed reviews, optionally filtered by model and PDF name.
+
+        Returns:
+            Sorted list of (file_name, model_name, pdf_name, attempt, scores) tuples
+        """
+        conditions, params = [], []
+        if model_name:
+            conditions.append("model_name = ?")
+            params.append(model_name)
+        if pdf_name:
+            conditions.append("pdf_name = ?")
+            params.append(pdf_name)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        rows = self._conn.execute(
+            f"SELECT file_name, model_name, pdf_name, attempt, {', '.join(SCORE_TYPES)} "
+            f"FROM files {where} ORDER BY file_name", params)
+        return [
+            (file_name, row_model, row_pdf, attempt,
+             {score_type: value for score_type, value in zip(SCORE_TYPES, values) if value is not None})
+            for file_name, row_model, row_pdf, attempt, *values in rows
+        ]
+
+    def close(self):
+        self._conn.close()
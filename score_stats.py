@@ -0,0 +1,140 @@
+import numpy as np
+from review_scores import SCORE_TYPES
+
+
+# Upper bound on resampled values held in memory at once while bootstrapping
+BOOTSTRAP_BATCH_ELEMENTS = 4_000_000
+
+
+def group_rows(table: dict, group_by) -> tuple:
+    """
+    Assign every row of a score table to its group of equal key columns.
+
+    Args:
+        table: Score table from build_score_table
+        group_by: Key columns to group rows by
+
+    Returns:
+        (codes, first_rows): the dense group number of each row, and the index of
+        the first row of each group
+    """
+    group_by = tuple(group_by)
+    if len(table[group_by[0]]) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    # Combine the key columns into one integer code per row, then renumber the codes densely
+    combined = np.zeros(len(table[group_by[0]]), dtype=np.int64)
+    for column in group_by:
+        uniques, inverse = np.unique(table[column], return_inverse=True)
+        combined = combined * len(uniques) + inverse
+    _, first_rows, codes = np.unique(combined, return_index=True, return_inverse=True)
+    return codes.ravel(), first_rows
+
+
+def _bootstrap_means(values: np.ndarray, groups: np.ndarray, starts: np.ndarray, counts: np.ndarray,
+                     n_bootstrap: int, rng) -> np.ndarray:
+    # values are sorted by group; every resample draws each group's values from its own
+    # contiguous slice, and all groups of a batch of resamples are drawn in one array
+    # Scores are small integers, so float32 holds them and their sums exactly and halves
+    # the memory traffic of the resampling arrays
+    values = values.astype(np.float32)
+    group_sizes = counts[groups].astype(np.float32)
+    group_starts = starts[groups]
+    boot_means = np.empty((n_bootstrap, len(counts)))
+    batch_size = max(1, BOOTSTRAP_BATCH_ELEMENTS // max(1, len(values)))
+    for batch_start in range(0, n_bootstrap, batch_size):
+        batch = min(batch_size, n_bootstrap - batch_start)
+        offsets = (rng.random((batch, len(values)), dtype=np.float32) * group_sizes).astype(np.int64)
+        # Guard against float32 rounding a draw just below 1.0 up to the group size
+        np.minimum(offsets, group_sizes.astype(np.int64) - 1, out=offsets)
+        samples = values[group_starts + offsets]
+        boot_means[batch_start:batch_start + batch] = np.add.reduceat(samples, starts, axis=1) / counts
+    return boot_means
+
+
+def grouped_statistics(table: dict, group_by=("model", "paper"), score_types=SCORE_TYPES,
+                       n_bootstrap: int = 1000, confidence: float = 0.95, seed: int = None) -> dict:
+    """
+    Compute statistics for every (group, score field) of a score table in one vectorized pass.
+
+    Args:
+        table: Score table from build_score_table
+        group_by: Key columns to group rows by (default: ("model", "paper"))
+        score_types: Score fields to summarize (default: all)
+        n_bootstrap: Number of bootstrap resamples for the confidence interval of the mean;
+            0 disables bootstrapping (default: 1000)
+        confidence: Confidence level of the bootstrap interval (default: 0.95)
+        seed: Random seed for reproducible intervals (default: None)
+
+    Returns:
+        dict of NumPy columns with one row per (group, field) that has at least one score:
+        the group_by columns, field, count, mean, std, variance (between samples, ddof=1),
+        median, min, max, ci_low and ci_high
+    """
+    group_by = tuple(group_by)
+    codes, first_rows = group_rows(table, group_by)
+    n_groups = len(first_rows)
+    rng = np.random.default_rng(seed)
+    tail = (1.0 - confidence) / 2.0 * 100.0
+
+    parts = []
+    for score_type in score_types:
+        values = table[score_type].astype(np.float64)
+        valid = ~np.isnan(values)
+        order = np.lexsort((values[valid], codes[valid]))
+        values = values[valid][order]
+        groups = codes[valid][order]
+
+        counts = np.bincount(groups, minlength=n_groups)
+        present = np.flatnonzero(counts)
+        if len(present) == 0:
+            continue
+        # Renumber to the groups present for this field so every slice is non-empty
+        counts = counts[present]
+        groups = np.searchsorted(present, groups)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        ends = starts + counts - 1
+
+        means = np.bincount(groups, weights=values) / counts
+        squared_deviations = np.bincount(groups, weights=(values - means[groups]) ** 2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variances = np.where(counts > 1, squared_deviations / (counts - 1), np.nan)
+        medians = (values[starts + (counts - 1) // 2] + values[starts + counts // 2]) / 2.0
+
+        if n_bootstrap:
+            boot_means = _bootstrap_means(values, groups, starts, counts, n_bootstrap, rng)
+            ci_low, ci_high = np.percentile(boot_means, [tail, 100.0 - tail], axis=0)
+        else:
+            ci_low = ci_high = np.full(len(present), np.nan)
+
+        part = {column: table[column][first_rows[present]] for column in group_by}
+        part.update({
+            "field": np.full(len(present), score_type),
+            "count": counts,
+            "mean": means,
+            "std": np.sqrt(variances),
+            "variance": variances,
+            "median": medians,
+            "min": values[starts],
+            "max": values[ends],
+            "ci_low": ci_low,
+            "ci_high": ci_high,
+        })
+        parts.append(part)
+
+    if not parts:
+        return {}
+    return {column: np.concatenate([part[column] for part in parts]) for column in parts[0]}
+
+
+def print_grouped_statistics(stats: dict, group_by=("model", "paper")):
+    """
+    Print grouped statistics from grouped_statistics as a table.
+    """
+    group_by = tuple(group_by)
+    header = "  ".join(f"{column:<24}" for column in group_by)
+    print(f"{header}  {'field':<13}{'count':>6}{'mean':>8}{'std':>8}{'median':>8}  {'CI':<15}")
+    for row in range(len(stats.get("field", []))):
+        keys = "  ".join(f"{str(stats[column][row]):<24}" for column in group_by)
+        ci = f"[{stats['ci_low'][row]:.2f}, {stats['ci_high'][row]:.2f}]"
+        print(f"{keys}  {stats['field'][row]:<13}{stats['count'][row]:>6}{stats['mean'][row]:>8.2f}"
+              f"{stats['std'][row]:>8.2f}{stats['median'][row]:>8.1f}  {ci:<15}")
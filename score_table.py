@@ -0,0 +1,137 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from review_scores import SCORE_TYPES, extract_scores_from_text
+
+
+# Below this many files, parsing in-process is faster than starting a process pool
+PARALLEL_THRESHOLD = 256
+
+# Number of files each worker task reads and parses at once
+CHUNK_SIZE = 256
+
+
+def parse_review_filename(file_name: str):
+    """
+    Split a review file name "{model_name}_{pdf_name}_{attempt}.txt" into its parts.
+
+    Model names contain no underscores, so the model ends at the first underscore
+    and the attempt starts after the last one.
+
+    Returns:
+        (model_name, pdf_name, attempt), or None if the name does not match
+    """
+    if not file_name.endswith(".txt"):
+        return None
+    parts = file_name[:-len(".txt")].split("_")
+    if len(parts) < 3 or not parts[-1].isdigit():
+        return None
+    return parts[0], "_".join(parts[1:-1]), int(parts[-1])
+
+
+def _extract_scores_from_files(file_paths: list, with_hash: bool = False) -> list:
+    # Worker task: read a chunk of files in bulk and scan each one once
+    results = []
+    for file_path in file_paths:
+        with open(file_path, "rb") as f:
+            data = f.read()
+        scores = extract_scores_from_text(data.decode("utf-8"))
+        results.append((scores, hashlib.sha256(data).hexdigest()) if with_hash else scores)
+    return results
+
+
+def extract_scores_parallel(file_paths: list, num_workers: int = None, with_hash: bool = False) -> list:
+    """
+    Extract scores from many review files, over a process pool for large inputs.
+
+    Args:
+        file_paths: Review files to parse
+        num_workers: Number of worker processes (default: CPU count)
+        with_hash: Also return the SHA-256 of each file's content (default: False)
+
+    Returns:
+        List of score dicts (or (scores, sha256) tuples with with_hash), in the order of file_paths
+    """
+    if len(file_paths) < PARALLEL_THRESHOLD or num_workers == 1:
+        return _extract_scores_from_files(file_paths, with_hash)
+
+    chunks = [file_paths[i:i + CHUNK_SIZE] for i in range(0, len(file_paths), CHUNK_SIZE)]
+    results = []
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for chunk_results in executor.map(_extract_scores_from_files, chunks, [with_hash] * len(chunks)):
+            results.extend(chunk_results)
+    return results
+
+
+def build_score_table(output_dirs, num_workers: int = None, use_index: bool = False) -> dict:
+    """
+    Parse every review file of the output directories into a columnar score table.
+
+    Args:
+        output_dirs: Output directory or list of directories holding review files
+        num_workers: Number of worker processes (default: CPU count)
+        use_index: Read scores from each directory's incremental ScoreIndex, parsing
+            only new or changed files (default: False)
+
+    Returns:
+        dict of NumPy columns: output_dir, file_name, model, paper, attempt, and one
+        float column per score type with NaN where the field is missing
+    """
+    if isinstance(output_dirs, str):
+        output_dirs = [output_dirs]
+
+    if use_index:
+        from score_index import ScoreIndex
+
+        rows, scores = [], []
+        for output_dir in output_dirs:
+            index = ScoreIndex(output_dir)
+            index.update(num_workers)
+            for file_name, model_name, pdf_name, attempt, file_scores in index.query():
+                rows.append((output_dir, file_name, model_name, pdf_name, attempt))
+                scores.append(file_scores)
+            index.close()
+        return make_score_table(rows, scores)
+
+    rows = []
+    for output_dir in output_dirs:
+        for file_name in sorted(os.listdir(output_dir)):
+            parsed = parse_review_filename(file_name)
+            if parsed is not None:
+                rows.append((output_dir, file_name) + parsed)
+
+    scores = extract_scores_parallel([os.path.join(row[0], row[1]) for row in rows], num_workers)
+    return make_score_table(rows, scores)
+
+
+def make_score_table(rows: list, scores: list) -> dict:
+    """
+    Assemble a score table from (output_dir, file_name, model, paper, attempt) rows
+    and their score dicts.
+    """
+    table = {
+        "output_dir": np.array([row[0] for row in rows], dtype=str),
+        "file_name": np.array([row[1] for row in rows], dtype=str),
+        "model": np.array([row[2] for row in rows], dtype=str),
+        "paper": np.array([row[3] for row in rows], dtype=str),
+        "attempt": np.array([row[4] for row in rows], dtype=np.int32),
+    }
+    for score_type in SCORE_TYPES:
+        table[score_type] = np.array([s.get(score_type, np.nan) for s in scores], dtype=np.float32)
+    return table
+
+
+def save_score_table(table: dict, path: str):
+    """
+    Save a score table as a compressed .npz file.
+    """
+    np.savez_compressed(path, **table)
+
+
+def load_score_table(path: str) -> dict:
+    """
+    Load a score table saved by save_score_table.
+    """
+    with np.load(path) as data:
+        return {column: data[column] for column in data.files}
@@ -0,0 +1,119 @@
+import glob
+import itertools
+import os
+import time
+from review_scores import SCORE_TYPES, extract_scores_from_text
+
+
+# Characters of earlier text rescanned with each chunk, so a score field split across
+# chunks (e.g. "Rati" + "ng: 8") is still found
+SCAN_OVERLAP = 256
+
+# Numbers the attempts of this process, so every attempt streams to its own partial file
+_attempt_ids = itertools.count()
+
+# Debug switch: keep the partial files of failed attempts for inspection
+KEEP_PARTIAL_FILES = os.environ.get("KEEP_PARTIAL_FILES", "") not in ("", "0")
+
+
+class StreamingReviewWriter:
+    """
+    Writes a streamed review to disk chunk by chunk.
+
+    Chunks are appended to "{output_file_path}.partial.{attempt}" and flushed as they
+    arrive. Each attempt (a retry, a requeued job or another worker process) writes its
+    own partial file, and on completion the file is renamed atomically to
+    output_file_path. A failed attempt deletes its partial file unless keep_partial is
+    set, and a completed one deletes those left behind by killed processes. Score
+    fields are parsed as soon as they appear, and with stop_when_scored the stream is
+    cut short once all have arrived.
+    """
+
+    def __init__(self, output_file_path: str, stop_when_scored: bool = False, keep_partial: bool = None):
+        self.output_file_path = output_file_path
+        self.partial_file_path = f"{output_file_path}.partial.{os.getpid()}-{next(_attempt_ids)}"
+        self.stop_when_scored = stop_when_scored
+        self.keep_partial = KEEP_PARTIAL_FILES if keep_partial is None else keep_partial
+        self.started_at = time.perf_counter()
+        self.time_to_first_token = None
+        self.scores = {}
+        self.stopped_early = False
+        self._chunks = []
+        self._tail = ""
+        # Opened on the first chunk, so a call that fails before streaming leaves no file
+        self._file = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def write(self, chunk: str) -> bool:
+        """
+        Append a chunk of text.
+
+        Returns:
+            False once every score field has arrived and stop_when_scored is set
+        """
+        if not chunk:
+            return True
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.perf_counter() - self.started_at
+
+        self._chunks.append(chunk)
+        if self._file is None:
+            self._file = open(self.partial_file_path, "w")
+        self._file.write(chunk)
+        self._file.flush()
+
+        if len(self.scores) < len(SCORE_TYPES):
+            # Scan only the new chunk plus the end of the text before it, keeping the
+            # first occurrence of each field
+            window = self._tail + chunk
+            for score_type, value in extract_scores_from_text(window, complete=False).items():
+                self.scores.setdefault(score_type, value)
+            self._tail = window[-SCAN_OVERLAP:]
+            if self.stop_when_scored and len(self.scores) == len(SCORE_TYPES):
+                self.stopped_early = True
+                return False
+        return True
+
+    def consume(self, text_chunks) -> str:
+        """
+        Write every chunk of a text stream, stopping early if requested, and finish.
+
+        Args:
+            text_chunks: Iterable of text chunks from a provider stream
+
+        Returns:
+            The full review text
+        """
+        try:
+            for chunk in text_chunks:
+                if not self.write(chunk):
+                    break
+        except BaseException:
+            # The final path stays absent; the retry streams to a partial file of its own
+            if self._file is not None:
+                self._file.close()
+                if not self.keep_partial:
+                    os.remove(self.partial_file_path)
+            raise
+        return self.finish()
+
+    def finish(self) -> str:
+        """
+        Close the partial file, atomically move it to the output path and delete the
+        partial files of earlier attempts at the same output.
+        """
+        if self._file is None:
+            self._file = open(self.partial_file_path, "w")
+        self._file.close()
+        os.replace(self.partial_file_path, self.output_file_path)
+        if not self.keep_partial:
+            for path in glob.glob(glob.escape(self.output_file_path) + ".partial.*"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self.scores = extract_scores_from_text(self.text)
+        return self.text
@@ -0,0 +1,33 @@
+import os
+import sys
+import pytest
+
+# The modules live at the top level of the repository
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+API_NAMES = ["openai", "claude", "gemini"]
+EXAMPLE_PDF = os.path.join(REPO_ROOT, "example_pdfs", "a0kq0tJwwn.pdf")
+GUIDANCE_PATH = os.path.join(REPO_ROOT, "reviewer_guidance.txt")
+
+
+@pytest.fixture
+def mock_server(monkeypatch):
+    """
+    Point every provider's pooled client at a fresh mock server, and yield its base URL.
+    """
+    from benchmark import MOCK_API_KEYS, start_mock_server
+    from clients import close_clients, set_base_url
+
+    process, base_url = start_mock_server(latency_ms=10, latency_sigma=0, response_chars=2000)
+    for name, value in MOCK_API_KEYS.items():
+        monkeypatch.setenv(name, value)
+    set_base_url("openai", f"{base_url}/v1")
+    set_base_url("claude", base_url)
+    set_base_url("gemini", base_url)
+    close_clients()
+    yield base_url
+    for api_name in API_NAMES:
+        set_base_url(api_name, None)
+    close_clients()
+    process.terminate()
@@ -0,0 +1,23 @@
+import pytest
+from adaptive_sampling import mean_confidence_interval, t_quantile
+
+
+# Two-sided 95% and 99% critical values from the standard t table
+T_TABLE = [
+    (1, 0.975, 12.706), (2, 0.975, 4.303), (3, 0.975, 3.182), (4, 0.975, 2.776),
+    (5, 0.975, 2.571), (10, 0.975, 2.228), (30, 0.975, 2.042),
+    (1, 0.995, 63.657), (2, 0.995, 9.925), (4, 0.995, 4.604), (20, 0.995, 2.845),
+]
+
+
+@pytest.mark.parametrize("df, probability, expected", T_TABLE)
+def test_t_quantile_matches_table(df, probability, expected):
+    assert t_quantile(probability, df) == pytest.approx(expected, abs=1e-3)
+    assert t_quantile(1 - probability, df) == pytest.approx(-expected, abs=1e-3)
+
+
+def test_confidence_interval_of_two_values():
+    mean, low, high = mean_confidence_interval([4, 6])
+    assert mean == 5
+    # std 1.414 / sqrt(2) = 1, times t(0.975, 1)
+    assert (low, high) == pytest.approx((5 - 12.706, 5 + 12.706), abs=1e-3)
@@ -0,0 +1,38 @@
+import os
+import shutil
+from conftest import API_NAMES, EXAMPLE_PDF, GUIDANCE_PATH
+from batch_mode import load_batch_state
+from benchmark import get_mock_stats
+from generate_all import generate_reviews_batch
+from providers import PROVIDERS
+from review_scores import SCORE_TYPES, extract_scores_from_text
+
+
+def test_generate_reviews_batch_end_to_end(mock_server, tmp_path):
+    pdf_names = ["paper-a", "paper-b"]
+    pdf_paths = []
+    for pdf_name in pdf_names:
+        pdf_paths.append(str(tmp_path / f"{pdf_name}.pdf"))
+        shutil.copy(EXAMPLE_PDF, pdf_paths[-1])
+    output_base_dir = str(tmp_path / "output")
+
+    generate_reviews_batch(pdf_paths, "all", GUIDANCE_PATH, total_tries=2, output_base_dir=output_base_dir,
+                           poll_interval=0, providers=API_NAMES)
+
+    # One batch per (provider, model), each submitted, polled until finished and collected
+    batches = load_batch_state(os.path.join(output_base_dir, "batches"))
+    assert len(batches) == sum(len(PROVIDERS[api_name]["models"]) for api_name in API_NAMES)
+    assert all(batch["status"] == "collected" for batch in batches)
+    assert {batch["provider_status"] for batch in batches} == {"completed", "ended", "JOB_STATE_SUCCEEDED"}
+
+    expected_files = 0
+    for api_name in API_NAMES:
+        output_dir = os.path.join(output_base_dir, f"output_{api_name}")
+        for model_name in PROVIDERS[api_name]["models"]:
+            for pdf_name in pdf_names:
+                for attempt in range(2):
+                    with open(os.path.join(output_dir, f"{model_name}_{pdf_name}_{attempt}.txt"), "r") as f:
+                        assert set(extract_scores_from_text(f.read())) == set(SCORE_TYPES)
+                    expected_files += 1
+        assert len(os.listdir(output_dir)) == len(PROVIDERS[api_name]["models"]) * len(pdf_names) * 2
+    assert get_mock_stats(mock_server)["batch_requests"] == expected_files
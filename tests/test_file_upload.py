@@ -0,0 +1,20 @@
+import os
+import shutil
+from conftest import API_NAMES, EXAMPLE_PDF, GUIDANCE_PATH
+from benchmark import get_mock_stats
+from generate_all import generate_reviews_for_paper
+
+
+def test_one_upload_per_provider_and_document(mock_server, tmp_path):
+    pdf_names = ["paper-a", "paper-b"]
+    for pdf_name in pdf_names:
+        pdf_file_path = tmp_path / f"{pdf_name}.pdf"
+        shutil.copy(EXAMPLE_PDF, pdf_file_path)
+        generate_reviews_for_paper(str(pdf_file_path), GUIDANCE_PATH, 3, str(tmp_path / "output"),
+                                   max_workers=6, providers=API_NAMES, use_file_upload=True)
+
+    stats = get_mock_stats(mock_server)
+    assert stats["uploads"] == {f"{api_name}:{pdf_name}.pdf": 1 for api_name in API_NAMES for pdf_name in pdf_names}
+    # Every review call went through, each referencing its uploaded file
+    for api_name in API_NAMES:
+        assert len(os.listdir(tmp_path / "output" / f"output_{api_name}")) == 2 * 3 * len(pdf_names)
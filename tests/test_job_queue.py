@@ -0,0 +1,81 @@
+import time
+from job_queue import JobQueue
+
+
+def make_jobs(count: int) -> list:
+    return [{"pdf_name": "paper", "model_name": "gpt-5", "attempt": attempt, "api_name": "openai",
+             "pdf_file_path": "paper.pdf", "output_file_path": f"gpt-5_paper_{attempt}.txt"}
+            for attempt in range(count)]
+
+
+def make_queue(tmp_path, count: int = 2) -> JobQueue:
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"))
+    queue.add_jobs(make_jobs(count))
+    return queue
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = make_queue(tmp_path)
+    claimed = queue.claim_jobs(2, worker_id="a", lease_seconds=60)
+    assert len(claimed) == 2
+    # Live leases are neither claimable nor forgotten
+    assert queue.claim_jobs(2, worker_id="b", lease_seconds=60) == []
+    assert queue.count_leased() == 2
+
+    with queue._lock:
+        queue._conn.execute("UPDATE jobs SET lease_expires = ? WHERE id = ?", (time.time() - 1, claimed[0]["id"]))
+    assert queue.count_leased() == 1
+    reclaimed = queue.claim_jobs(2, worker_id="b", lease_seconds=60)
+    assert [job["id"] for job in reclaimed] == [claimed[0]["id"]]
+    assert reclaimed[0]["claims"] == 1
+
+
+def test_renewed_lease_is_kept(tmp_path):
+    queue = make_queue(tmp_path, 1)
+    queue.claim_jobs(1, worker_id="a", lease_seconds=0.01)
+    assert queue.heartbeat("a", 60) == 1
+    time.sleep(0.02)
+    assert queue.claim_jobs(1, worker_id="b", lease_seconds=60) == []
+
+
+def test_stale_mark_is_ignored(tmp_path):
+    queue = make_queue(tmp_path, 1)
+    job = queue.claim_jobs(1, worker_id="a", lease_seconds=-1)[0]
+    queue.claim_jobs(1, worker_id="b", lease_seconds=60)
+
+    assert not queue.mark(job["id"], "failed", "timed out", worker_id="a")
+    assert queue.mark(job["id"], "done", worker_id="b")
+    assert queue.status_counts() == {"done": 1}
+    # A job that is no longer running cannot be marked again
+    assert not queue.mark(job["id"], "failed", worker_id="b")
+
+
+def test_released_jobs_go_back_to_pending(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.claim_jobs(2, worker_id="a", lease_seconds=60)
+    assert queue.release_jobs("a") == 2
+    assert queue.status_counts() == {"pending": 2}
+
+
+def test_worker_recovers_jobs_of_interrupted_single_process_run(tmp_path):
+    queue = make_queue(tmp_path)
+    # A single-process run claims without a lease and is interrupted before marking
+    queue.claim_jobs(2)
+    assert queue.status_counts() == {"running": 2}
+    queue.close()
+
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"))
+    # Nobody holds a live lease on them, so a worker neither waits for them nor skips them
+    assert queue.count_leased() == 0
+    claimed = queue.claim_jobs(10, worker_id="worker", lease_seconds=60)
+    assert len(claimed) == 2
+    assert all(queue.mark(job["id"], "done", worker_id="worker") for job in claimed)
+    assert queue.status_counts() == {"done": 2}
+
+
+def test_worker_slots_are_reused(tmp_path):
+    queue = make_queue(tmp_path)
+    assert queue.register_worker("a", 60) == 0
+    assert queue.register_worker("b", 60) == 1
+    queue.unregister_worker("a")
+    assert queue.register_worker("c", 60) == 0
@@ -0,0 +1,51 @@
+import pytest
+from PIL import Image
+from conftest import EXAMPLE_PDF
+from preprocessing import PdfPreprocessor, _downsample_images
+
+
+class FakeImageFile:
+    def __init__(self, image=None, error=None):
+        self._image = image
+        self._error = error
+        self.replaced_with = None
+
+    @property
+    def image(self):
+        if self._error is not None:
+            raise self._error
+        return self._image
+
+    def replace(self, image, quality):
+        self.replaced_with = image
+
+
+class FakePage:
+    def __init__(self, images):
+        self.images = images
+
+
+def test_undecodable_images_are_skipped_and_counted():
+    large = FakeImageFile(Image.new("RGB", (400, 200)))
+    small = FakeImageFile(Image.new("RGB", (50, 50)))
+    broken = FakeImageFile(error=OSError("image file is truncated"))
+    unsupported = FakeImageFile(error=NotImplementedError("unsupported filter /JBIG2Decode"))
+
+    replaced, skipped = _downsample_images(FakePage([large, small, broken, unsupported]), 100, 75)
+    assert (replaced, skipped) == (1, 2)
+    assert large.replaced_with.size == (100, 50)
+    assert small.replaced_with is None
+
+
+def test_programming_errors_are_not_skipped():
+    with pytest.raises(AttributeError):
+        _downsample_images(FakePage([FakeImageFile(error=AttributeError("bug"))]), 100, 75)
+
+
+def test_report_counts_images(tmp_path, capsys):
+    preprocessor = PdfPreprocessor(str(tmp_path), max_image_px=64)
+    preprocessor.process(EXAMPLE_PDF)
+    stats, = preprocessor.stats()
+    assert stats["images_replaced"] > 0 and stats["images_skipped"] == 0
+    preprocessor.print_report()
+    assert "images replaced/skipped" in capsys.readouterr().out
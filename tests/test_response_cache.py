@@ -0,0 +1,26 @@
+import os
+from response_cache import ResponseCache
+
+
+def test_total_size_is_tracked_and_lru_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"), max_bytes=250)
+    cache.put("key0", "x" * 100)
+    cache.put("key1", "x" * 100)
+    # key1 is the least recently used once key0 is read
+    assert cache.get("key0") is not None
+    cache.put("key2", "x" * 100)
+    assert cache.get("key1") is None
+    assert cache.total_bytes() == 200
+
+    # Replacing an entry counts its new size only
+    cache.put("key2", "y" * 50)
+    assert cache.total_bytes() == 150
+    cache.put("key3", "z" * 100)
+    assert cache.total_bytes() == 250
+    assert sorted(os.listdir(tmp_path / "cache" / "objects" / "ke")) == ["key0.txt", "key2.txt", "key3.txt"]
+    cache.close()
+
+    # The total survives reopening and matches the manifest
+    cache = ResponseCache(str(tmp_path / "cache"), max_bytes=250)
+    assert cache.total_bytes() == sum(size for size, in cache._conn.execute("SELECT size FROM entries"))
+    cache.close()
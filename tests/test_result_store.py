@@ -0,0 +1,78 @@
+import json
+import os
+import pytest
+from result_store import ResultStore
+
+
+def make_store(tmp_path, **kwargs) -> ResultStore:
+    return ResultStore(str(tmp_path / "results"), num_shards=1, **kwargs)
+
+
+def shard_path(tmp_path) -> str:
+    return str(tmp_path / "results" / "shard-000.jsonl")
+
+
+def test_torn_tail_is_dropped_on_open(tmp_path):
+    store = make_store(tmp_path)
+    store.append("openai", "gpt-5", "paper", 0, "Overall: 6")
+    store.close()
+    with open(shard_path(tmp_path), "ab") as f:
+        f.write(b'{"api_name": "openai", "model_na')
+
+    store = make_store(tmp_path)
+    assert store.keys() == {("gpt-5", "paper", 0)}
+    # The next append starts on a line of its own
+    store.append("openai", "gpt-5", "paper", 1, "Overall: 7")
+    assert store.get("gpt-5", "paper", 1)["text"] == "Overall: 7"
+    store.close()
+    with open(shard_path(tmp_path), "rb") as f:
+        assert [json.loads(line)["attempt"] for line in f] == [0, 1]
+
+
+def test_unindexed_lines_are_indexed_on_open(tmp_path):
+    store = make_store(tmp_path)
+    store.append("openai", "gpt-5", "paper", 0, "Overall: 6")
+    store.close()
+    # A line written before a crash, without its index row
+    record = {"api_name": "claude", "model_name": "claude-sonnet-4-5", "pdf_name": "paper", "attempt": 0,
+              "created_at": 0, "scores": {"rating": 8}, "metadata": {}, "text": "Overall: 8"}
+    with open(shard_path(tmp_path), "ab") as f:
+        f.write(json.dumps(record).encode("utf-8") + b"\n")
+
+    store = make_store(tmp_path)
+    assert store.get("claude-sonnet-4-5", "paper", 0)["text"] == "Overall: 8"
+    assert store.query(model_name="claude-sonnet-4-5") == [("claude", "claude-sonnet-4-5", "paper", 0, {"rating": 8})]
+    store.close()
+
+
+def test_superseded_key_returns_latest(tmp_path):
+    store = make_store(tmp_path)
+    store.append("openai", "gpt-5", "paper", 0, "first", scores={"rating": 3})
+    store.append("openai", "gpt-5", "paper", 0, "second", scores={"rating": 5})
+    store.close()
+
+    # Both lines are on disk; reopening must not resurrect the first
+    store = make_store(tmp_path)
+    assert store.get("gpt-5", "paper", 0)["text"] == "second"
+    assert [record["text"] for record in store.iter_records()] == ["second"]
+    assert store.query() == [("openai", "gpt-5", "paper", 0, {"rating": 5})]
+    store.close()
+
+
+def test_readers_do_not_repair_alongside_the_writer(tmp_path):
+    writer = make_store(tmp_path)
+    writer.append("openai", "gpt-5", "paper", 0, "Overall: 6")
+    with pytest.raises(RuntimeError):
+        make_store(tmp_path)
+
+    # A line the writer is still writing is left alone by readers
+    with open(shard_path(tmp_path), "ab") as f:
+        f.write(b'{"api_name": "openai"')
+    size = os.path.getsize(shard_path(tmp_path))
+    reader = make_store(tmp_path, read_only=True)
+    assert reader.keys() == {("gpt-5", "paper", 0)}
+    with pytest.raises(PermissionError):
+        reader.append("openai", "gpt-5", "paper", 1, "Overall: 7")
+    reader.close()
+    assert os.path.getsize(shard_path(tmp_path)) == size
+    writer.close()
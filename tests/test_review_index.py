@@ -0,0 +1,50 @@
+import os
+import shutil
+from conftest import REPO_ROOT
+from review_index import ReviewIndex, extract_review_sections
+
+
+CLAUDE_REVIEW = os.path.join(REPO_ROOT, "output_claude", "claude-haiku-4-5_a0kq0tJwwn_0.txt")
+
+
+def read_claude_review():
+    with open(CLAUDE_REVIEW, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_markdown_headings_without_colon():
+    sections = extract_review_sections(read_claude_review())
+
+    assert set(sections) == {"summary", "strengths", "weaknesses", "questions"}
+    assert sections["summary"].startswith('This paper identifies and analyzes the "momentum persistence effect,"')
+    assert sections["strengths"].startswith("1. **Empirical rigor:**")
+    assert sections["weaknesses"].startswith("1. **Theoretical fragility:**")
+    assert sections["questions"].startswith("1. **On Assumption 4:**")
+    assert "Flag For Ethics Review" not in sections["questions"]
+
+
+def test_bold_sub_headings_are_not_sections():
+    sections = extract_review_sections(read_claude_review())
+
+    # "**Weaknesses:**" under "## Soundness: 3" belongs to the Soundness section
+    assert "Critical theoretical limitation" not in sections["weaknesses"]
+    assert "Soundness" not in sections["strengths"]
+
+
+def test_colon_headings():
+    content = "Summary: A paper.\n**Strengths:** Clear.\n## Weaknesses:\nSmall.\nQuestions:\nWhy?\nRating: 5\n"
+
+    assert extract_review_sections(content) == {
+        "summary": "A paper.", "strengths": "Clear.", "weaknesses": "Small.", "questions": "Why?"}
+
+
+def test_index_claude_reviews(tmp_path):
+    output_dir = tmp_path / "output_claude"
+    output_dir.mkdir()
+    shutil.copy(CLAUDE_REVIEW, output_dir)
+    index = ReviewIndex(str(tmp_path / "review_index.sqlite"))
+
+    assert index.update([str(output_dir)])["added"] == 1
+    hits = index.search('"theoretical fragility"', section="weaknesses")["hits"]
+    assert [hit["file_name"] for hit in hits] == [os.path.basename(CLAUDE_REVIEW)]
+    assert index.search('"critical theoretical limitation"', section="weaknesses")["total"] == 0
@@ -0,0 +1,72 @@
+import threading
+import time
+from conftest import EXAMPLE_PDF
+from generate_all import build_paper_jobs, run_jobs
+from metrics import MetricsRecorder
+
+
+def make_api_config(tmp_path, api_name: str, delay: float, calls: list) -> dict:
+    def review(document, reviewer_guidance, user_prompt, model_name, usage=None, **kwargs):
+        time.sleep(delay)
+        calls.append((api_name, time.monotonic()))
+        return "Overall: 5"
+
+    return {"api_name": api_name, "function": review, "models": ["model"],
+            "output_dir": str(tmp_path / api_name)}
+
+
+def test_capped_provider_does_not_block_the_others(tmp_path):
+    calls = []
+    api_configs = [make_api_config(tmp_path, "slow", 0.2, calls),
+                   make_api_config(tmp_path, "fast", 0.01, calls)]
+    # The capped provider's jobs come first, so without per-provider admission they
+    # would take every pool thread and leave the other provider's jobs queued
+    jobs = build_paper_jobs(EXAMPLE_PDF, 6, api_configs)
+    active = []
+    max_active = [0]
+    lock = threading.Lock()
+    slow_review = api_configs[0]["function"]
+
+    def counted_review(*args, **kwargs):
+        with lock:
+            active.append(1)
+            max_active[0] = max(max_active[0], len(active))
+        try:
+            return slow_review(*args, **kwargs)
+        finally:
+            with lock:
+                active.pop()
+
+    api_configs[0]["function"] = counted_review
+
+    start = time.monotonic()
+    statuses = run_jobs(jobs, "guidance", "prompt", api_configs, max_workers=4,
+                        provider_concurrency={"slow": 1})
+    assert statuses == ["done"] * len(jobs)
+    assert max_active[0] == 1
+
+    slow_ends = sorted(end - start for api_name, end in calls if api_name == "slow")
+    fast_ends = [end - start for api_name, end in calls if api_name == "fast"]
+    assert len(slow_ends) == 6 and len(fast_ends) == 6
+    # Every fast job finishes while the capped provider is still on its first call
+    assert max(fast_ends) < slow_ends[0]
+
+
+def test_multi_sample_request_is_recorded_once(tmp_path):
+    def review(document, reviewer_guidance, user_prompt, model_name, usage=None, num_samples=1, **kwargs):
+        time.sleep(0.05)
+        return [f"Overall: {index + 3}" for index in range(num_samples)]
+
+    api_configs = [{"api_name": "multi", "function": review, "models": ["model"],
+                    "output_dir": str(tmp_path / "multi")}]
+    jobs = build_paper_jobs(EXAMPLE_PDF, 3, api_configs)
+    metrics = MetricsRecorder()
+    statuses = run_jobs(jobs, "guidance", "prompt", api_configs, metrics=metrics,
+                        samples_per_request={"multi": 3})
+    assert statuses == ["done"] * 3
+
+    stats = metrics.summary()[("multi", "model")]
+    assert stats["statuses"] == {"done": 3}
+    # One request: one latency sample, not one per review it returned
+    assert stats["latency_count"] == 1
+    assert [job["samples"] for job in jobs] == [3, 1, 1]
@@ -0,0 +1,25 @@
+import os
+from score_index import ScoreIndex
+
+
+def write_review(path, text: str, mtime_ns: int):
+    with open(path, "w") as f:
+        f.write(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_touched_files_are_not_reparsed(tmp_path):
+    write_review(tmp_path / "gpt-5_paper_0.txt", "Rating: 6\n", 10 ** 18)
+    write_review(tmp_path / "gpt-5_paper_1.txt", "Rating: 4\n", 10 ** 18)
+    index = ScoreIndex(str(tmp_path))
+    assert index.update(num_workers=1) == {"added": 2, "changed": 0, "removed": 0, "unchanged": 0}
+
+    # Rewritten with the same text, and with different text of the same size
+    write_review(tmp_path / "gpt-5_paper_0.txt", "Rating: 6\n", 2 * 10 ** 18)
+    write_review(tmp_path / "gpt-5_paper_1.txt", "Rating: 8\n", 2 * 10 ** 18)
+    assert index.update(num_workers=1) == {"added": 0, "changed": 1, "removed": 0, "unchanged": 1}
+    assert [scores["rating"] for *_, scores in index.query()] == [6, 8]
+
+    # The touched file's new mtime is recorded
+    assert index.update(num_workers=1)["unchanged"] == 2
+    index.close()
@@ -0,0 +1,42 @@
+import os
+import pytest
+from streaming import StreamingReviewWriter
+
+
+def failing_stream(chunks):
+    yield from chunks
+    raise ConnectionError("stream reset")
+
+
+def partial_files(tmp_path) -> list:
+    return sorted(name for name in os.listdir(tmp_path) if ".partial." in name)
+
+
+def test_failed_attempt_deletes_its_partial_file(tmp_path):
+    output_file_path = str(tmp_path / "review.txt")
+    with pytest.raises(ConnectionError):
+        StreamingReviewWriter(output_file_path).consume(failing_stream(["Summary: ", "good"]))
+    assert partial_files(tmp_path) == []
+    assert not os.path.exists(output_file_path)
+
+
+def test_failed_attempt_keeps_partial_file_when_asked(tmp_path):
+    output_file_path = str(tmp_path / "review.txt")
+    writer = StreamingReviewWriter(output_file_path, keep_partial=True)
+    with pytest.raises(ConnectionError):
+        writer.consume(failing_stream(["Summary: ", "good"]))
+    with open(writer.partial_file_path) as f:
+        assert f.read() == "Summary: good"
+
+
+def test_completed_attempt_deletes_earlier_partial_files(tmp_path):
+    output_file_path = str(tmp_path / "review.txt")
+    # Left behind by a process killed mid-stream
+    with open(output_file_path + ".partial.123-0", "w") as f:
+        f.write("Summary: ")
+
+    text = StreamingReviewWriter(output_file_path).consume(["Summary: good\n", "Rating: 6"])
+    assert text == "Summary: good\nRating: 6"
+    assert partial_files(tmp_path) == []
+    with open(output_file_path) as f:
+        assert f.read() == text
@@ -0,0 +1,9 @@
+from types import SimpleNamespace
+from generate_gemini import extract_usage_gemini
+
+
+def test_gemini_thinking_tokens_count_as_output():
+    response = SimpleNamespace(usage_metadata=SimpleNamespace(
+        prompt_token_count=1000, candidates_token_count=300, thoughts_token_count=700,
+        cached_content_token_count=None))
+    assert extract_usage_gemini(response) == {"input_tokens": 1000, "output_tokens": 1000, "cached_tokens": 0}